@@ -1,25 +1,44 @@
+import json 
+
 import numpy as np 
-import librosa 
-from tensorflow.keras.models import 
-load_model SR = 16000 
-model = 
-load_model("emotion_model.h5") print("n 
-Model loaded!") 
-EMOTIONS = ["neutral", "happy", "sad", 
-"angry"] def extract_features(file_path, sr=SR): 
-audio, sr = librosa.load(file_path, sr=sr) mfccs 
-= librosa.feature.mfcc(y=audio, sr=sr, 
-n_mfcc=40) mfccs = np.mean(mfccs.T, axis=0) 
-return mfccs def predict_emotion(file_path): 
-features = extract_features(file_path) preds = 
-model.predict(features[np.newaxis, ...]) 
-predicted_label = np.argmax(preds) return 
-preds, predicted_label if __name__ == 
-"__main__": test_file = "test_audio/gopi.wav" 
-preds, label = predict_emotion(test_file) 
-print("n Probabilities:", preds) print("n 
-53
-Predicted Emotion:", EMOTIONS[label]) 
-top_indices = preds[0].argsort()[-2:][::-1] 
-print("\nTop 2 emotions:") for i in top_indices: 
-print(f"{EMOTIONS[i]}: {preds[0][i]:.2f}")
\ No newline at end of file
+from tensorflow.keras.models import load_model 
+
+from feature_spec import FeatureSpec
+from feature_store import load_signal
+from mfcc_engine import get_engine
+from model_registry import metadata_path
+
+SR = 16000 
+MODEL_FILE = "emotion_model.h5" 
+model = load_model(MODEL_FILE) 
+print("\n Model loaded!") 
+EMOTIONS = ["neutral", "happy", "sad", "angry"] 
+
+# Extract features exactly as the model was trained (the spec Train.py saved);
+# models saved before sidecars carried a spec fall back to plain 16 kHz MFCCs
+try:
+    with open(metadata_path(MODEL_FILE)) as f: 
+        SPEC = FeatureSpec.from_dict(json.load(f)["feature_spec"]) 
+except (OSError, KeyError): 
+    SPEC = FeatureSpec(sample_rate=SR) 
+
+def extract_features(file_path, spec=SPEC): 
+    audio = load_signal(file_path, spec.to_config()) 
+    return get_engine(sr=spec.sample_rate, n_mfcc=spec.n_mfcc, n_fft=spec.n_fft, 
+                      hop_length=spec.hop_length, n_mels=spec.n_mels).mean_mfcc(audio) 
+
+def predict_emotion(file_path): 
+    features = extract_features(file_path) 
+    preds = model.predict(features[np.newaxis, ...]) 
+    predicted_label = np.argmax(preds) 
+    return preds, predicted_label 
+
+if __name__ == "__main__": 
+    test_file = "test_audio/gopi.wav" 
+    preds, label = predict_emotion(test_file) 
+    print("\n Probabilities:", preds) 
+    print("\n Predicted Emotion:", EMOTIONS[label]) 
+    top_indices = preds[0].argsort()[-2:][::-1] 
+    print("\nTop 2 emotions:") 
+    for i in top_indices: 
+        print(f"{EMOTIONS[i]}: {preds[0][i]:.2f}")
@@ -1,30 +1,35 @@
-import os 
-import numpy as np 
-import librosa SR = 16000 
+from feature_shards import write_shards
+from feature_spec import FeatureSpec
+from feature_store import extract_dataset
+
+SR = 16000 
 N_MFCC = 40 
 FIXED_DURATION = 3 
 DATASET_PATH = "dataset/" 
-X, y = [], [] label_map = {"neutral": 0, "happy": 1, "sad": 2, "angry": 3} for emotion, label in label_map.items():
- folder = os.path.join(DATASET_PATH, emotion) for file in os.listdir(folder): 
-  if file.endswith(".wav"): 
-file_path = os.path.join(folder, 
-file) signal, sr = 
-librosa.load(file_path, sr=SR) 
-signal, _ = 
-librosa.effects.trim(signal) signal 
-= librosa.util.normalize(signal) 
-fixed_length = SR * FIXED_DURATION 
-signal = librosa.util.fix_length(signal, 
-size=fixed_length) mfcc = 
-librosa.feature.mfcc(y=signal, sr=sr, 
-n_mfcc=N_MFCC) 
-mfcc = np.mean(mfcc.T, axis=0) 
-X.append(mfcc) 
-y.append(label) X = 
-np.array(X) y = np.array(y) 
-np.save("X_features.npy", 
-X) np.save("y_labels.npy", 
-y) print("n Preprocessing 
-complete!") print("Features 
-shape:", X.shape) 
-print("Labels shape:", y.shape)
\ No newline at end of file
+FEATURES_DIR = "features/" 
+SHARD_DTYPE = "float32"  # "float16" halves the size on disk
+SHARD_SIZE = 4096 
+SAVE_FRAMES = False  # also keep the (n_frames, n_mfcc) MFCC matrix per clip
+
+label_map = {"neutral": 0, "happy": 1, "sad": 2, "angry": 3} 
+
+if __name__ == "__main__":
+    # Trimmed, normalized, fixed-length clips; only new or changed files are
+    # re-extracted, across a process pool
+    spec = FeatureSpec(sample_rate=SR, n_mfcc=N_MFCC, trim=True, normalize=True, fixed_duration=FIXED_DURATION)
+    config = spec.to_config()
+    frames = None
+    if SAVE_FRAMES:
+        frames, y = extract_dataset(DATASET_PATH, list(label_map), dict(config, pooling="frames"))
+        X = frames.mean(axis=1)
+    else:
+        X, y = extract_dataset(DATASET_PATH, list(label_map), config)
+
+    # Memory-mapped shards + manifest, read by Train.py without loading everything into RAM;
+    # the manifest's feature_config becomes the trained model's feature spec
+    write_shards(FEATURES_DIR, X, y, config, frames=frames, dtype=SHARD_DTYPE, shard_size=SHARD_SIZE)
+    print("\n Preprocessing complete!") 
+    print("Features shape:", X.shape) 
+    print("Labels shape:", y.shape)
+    if frames is not None:
+        print("Frame features shape:", frames.shape)
@@ -1,34 +1,53 @@
-import sounddevice 
-as sd import numpy 
-as np import librosa 
+import argparse
+import json
+
 from tensorflow.keras.models import load_model 
+
+from feature_spec import FeatureSpec
+from model_registry import metadata_path
+from streaming_engine import StreamingEmotionEngine, run_microphone, run_wav_file
+from voice_activity import VoiceActivityDetector
+
 SR = 16000 
-DURATION = 2 
+WINDOW = 2.0  # seconds of audio per prediction
+HOP = 0.5  # a new prediction every half second
 N_MFCC = 40 
 MODEL_PATH = "speech_emotion_model.h5" 
 EMOTIONS = ['neutral', 'happy', 'sad', 'angry'] 
+
+parser = argparse.ArgumentParser(description="Real-time speech emotion detection")
+parser.add_argument("--wav", help="stream this WAV file instead of the microphone")
+parser.add_argument("--window", type=float, default=WINDOW)
+parser.add_argument("--hop", type=float, default=HOP)
+parser.add_argument("--no-vad", action="store_true", help="run the model on silent windows too")
+args = parser.parse_args()
+
 print("Loading model...") 
 model = load_model(MODEL_PATH) 
-print("n Model loaded!") def
-record_audio(duration=DURATION, 
-sr=SR): 
-print("Recording...") 
-audio = sd.rec(int(duration * sr), samplerate=sr, 
-channels=1) sd.wait() audio = audio.flatten() 
-print("Recording complete") 
-return audio def extract_features(y, 
-sr=SR, n_mfcc=N_MFCC): 
-mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc) 
-mfccs = np.mean(mfccs.T, axis=0) return mfccs 
-print("\nStarting real-time emotion detection. Press Ctrl+C 
-to stop.\n") try: while True: 
-audio = record_audio() features = 
-extract_features(audio) features = 
-features.reshape(1, -1) prediction = 
-model.predict(features) predicted_emotion = 
-EMOTIONS[np.argmax(prediction)] 
-50
-print(f"Predicted Emotion: 
-{predicted_emotion}\n") except 
-KeyboardInterrupt: 
-print("\nStopped real-time detection.")
\ No newline at end of file
+print("\n Model loaded!") 
+
+# Window features follow the spec Speech_emotion_project_fixed.py saves beside
+# the model; models from before the sidecar were trained on 16 kHz, 40-MFCC input
+try:
+    with open(metadata_path(MODEL_PATH)) as f: 
+        SPEC = FeatureSpec.from_dict(json.load(f)["feature_spec"]) 
+except (OSError, KeyError): 
+    SPEC = FeatureSpec(sample_rate=SR, n_mfcc=N_MFCC) 
+
+# The microphone callback only fills a ring buffer; feature extraction and
+# inference run on the engine's own thread over overlapping windows
+engine = StreamingEmotionEngine(
+    model.predict_on_batch, EMOTIONS, spec=SPEC,
+    window_seconds=args.window, hop_seconds=args.hop,
+    vad=None if args.no_vad else VoiceActivityDetector(),
+)
+
+if args.wav:
+    print(f"\nStreaming {args.wav} as microphone input...\n")
+    run_wav_file(engine, args.wav)
+else:
+    print("\nStarting real-time emotion detection. Press Ctrl+C to stop.\n") 
+    run_microphone(engine)
+    print("\nStopped real-time detection.")
+
+print(f"Latency: {engine.latency_summary()}")
@@ -1,47 +1,29 @@
-import os 
 import numpy as np 
-import librosa 
 from sklearn.model_selection import train_test_split 
 from sklearn.metrics import confusion_matrix 
 import seaborn as sns 
 import matplotlib.pyplot as plt 
 from tensorflow.keras.models import Sequential 
 from tensorflow.keras.layers import Conv1D, LSTM, Dense, Dropout 
-from tensorflow.keras.utils import to_categorical 
+
+from feature_spec import FeatureSpec
+from feature_store import extract_dataset
+from input_pipeline import ThroughputCallback, array_dataset
+from model_registry import save_model_metadata
 
 # Configuration
 SR = 16000 
 N_MELS = 40 
 EMOTIONS = ["neutral", "happy", "sad", "angry"]
-
-def extract_features(file_path): 
-    """Extract MFCC features from audio file"""
-    audio, sr = librosa.load(file_path, sr=SR) 
-    mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=N_MELS) 
-    return np.mean(mfccs.T, axis=0) 
+MODEL_FILE = "speech_emotion_model.h5"
+# Saved next to the model so Real_time_emotion.py extracts the same features
+FEATURE_SPEC = FeatureSpec(sample_rate=SR, n_mfcc=N_MELS)
 
 def load_data():
     """Load and preprocess data from dataset"""
-    X, y = [], [] 
-    dataset_path = "dataset" 
-    
-    for idx, emotion in enumerate(EMOTIONS): 
-        emotion_path = os.path.join(dataset_path, emotion) 
-        if not os.path.exists(emotion_path):
-            print(f"Warning: {emotion_path} does not exist")
-            continue
-            
-        for file in os.listdir(emotion_path): 
-            if file.endswith(".wav"): 
-                file_path = os.path.join(emotion_path, file) 
-                try:
-                    features = extract_features(file_path) 
-                    X.append(features) 
-                    y.append(idx)
-                except Exception as e:
-                    print(f"Error processing {file_path}: {e}")
-    
-    return np.array(X), np.array(y)
+    # Features are cached per file in features.db; only new or changed clips
+    # are decoded, spread across all cores
+    return extract_dataset("dataset", EMOTIONS, FEATURE_SPEC.to_config())
 
 def create_model(input_shape, num_classes):
     """Create CNN-LSTM model"""
@@ -110,15 +92,17 @@ def main():
     
     print(f"Data loaded: {X.shape[0]} samples")
     
-    # Reshape for CNN input
-    X = X[..., np.newaxis]
-    y_cat = to_categorical(y, num_classes=len(EMOTIONS))
-    
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(
-        X, y_cat, test_size=0.2, random_state=42
+        X, y, test_size=0.2, random_state=42
     )
     
+    # Shuffled, batched and prefetched; the channel axis for the CNN is added in the pipeline
+    batch_size = 16
+    train_ds = array_dataset(X_train, y_train, batch_size, num_classes=len(EMOTIONS), add_channel=True)
+    test_ds = array_dataset(X_test, y_test, batch_size, num_classes=len(EMOTIONS),
+                            shuffle_buffer=0, add_channel=True)
+    
     print(f"Training set: {X_train.shape}")
     print(f"Test set: {X_test.shape}")
     
@@ -127,10 +111,10 @@ def main():
     
     print("Training model...")
     history = model.fit(
-        X_train, y_train, 
-        validation_data=(X_test, y_test), 
+        train_ds, 
+        validation_data=test_ds, 
         epochs=30, 
-        batch_size=16,
+        callbacks=[ThroughputCallback(batch_size, n_samples=len(X_train))],
         verbose=1
     )
     
@@ -138,12 +122,14 @@ def main():
     plot_training_history(history)
     
     # Save model
-    model.save("speech_emotion_model.h5")
-    print("Model saved as speech_emotion_model.h5")
+    model.save(MODEL_FILE)
+    save_model_metadata(MODEL_FILE, EMOTIONS, name="speech_emotion_cnn_lstm",
+                        input_shape=model.input_shape[1:], feature_spec=FEATURE_SPEC)
+    print(f"Model saved as {MODEL_FILE}")
     
     # Evaluate model
-    y_pred = np.argmax(model.predict(X_test), axis=1)
-    y_true = np.argmax(y_test, axis=1)
+    y_pred = np.argmax(model.predict(X_test[..., np.newaxis]), axis=1)
+    y_true = y_test
     
     # Plot confusion matrix
     plot_confusion_matrix(y_true, y_pred, EMOTIONS)
@@ -1,30 +1,53 @@
 import os 
-os.environ["TF_ENABLE_ONEDNN_OPTS"] 
-= "0" 
-os.environ["TF_USE_LEGACY_KERAS"] = 
-"1" import numpy as np 
+os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0" 
+os.environ["TF_USE_LEGACY_KERAS"] = "1" 
+import numpy as np 
 from tensorflow.keras.models import Sequential 
-from tensorflow.keras.layers import Conv1D, MaxPooling1D, LSTM, Dense, 
-Dropout from tensorflow.keras.utils import to_categorical 
-X = 
-52
-np.load("X_features.npy
-") y = 
-np.load("y_labels.npy") 
-print("Data loaded:", X.shape, y.shape) 
-X = X.astype("float32") 
-X = X.reshape(X.shape[0], X.shape[1], 1) y = 
-to_categorical(y, 
-num_classes=4).astype("float32") 
+from tensorflow.keras.layers import Conv1D, MaxPooling1D, LSTM, Dense, Dropout 
+
+from feature_shards import ShardedDataset
+from feature_spec import FeatureSpec
+from input_pipeline import ThroughputCallback, measure_input_throughput, shard_dataset
+from model_registry import save_model_metadata
+from Preprocess import label_map
+
+FEATURES_DIR = "features/" 
+BATCH_SIZE = 32 
+VALIDATION_SPLIT = 0.2 
+SHUFFLE_BUFFER = 10000 
+
+# Shards are memory-mapped; tf.data gathers batches from disk in parallel
+# and prefetches them while the previous step trains
+dataset = ShardedDataset(FEATURES_DIR) 
+print("Data loaded:", (len(dataset), dataset.n_features), dataset.labels.shape) 
+
+# Same split as validation_split=0.2: the last 20% of rows are held out
+n_val = int(len(dataset) * VALIDATION_SPLIT) 
+train_idx = np.arange(len(dataset) - n_val) 
+val_idx = np.arange(len(dataset) - n_val, len(dataset)) 
+
+train_ds = shard_dataset(dataset, train_idx, BATCH_SIZE, num_classes=4,
+                         shuffle_buffer=SHUFFLE_BUFFER, add_channel=True) 
+val_ds = shard_dataset(dataset, val_idx, BATCH_SIZE, num_classes=4,
+                       shuffle_buffer=0, add_channel=True) 
+# A sample of batches is enough for the rate; reading them all would cost a whole epoch before fit
+print(f"Input pipeline alone: {measure_input_throughput(train_ds, max_batches=50):.0f} samples/sec") 
+
 model = Sequential([ 
-Conv1D(64, kernel_size=3, activation='relu', input_shape=(40, 1)), 
-MaxPooling1D(pool_size=2), 
-LSTM(64, return_sequences=False), 
-Dropout(0.3), 
-Dense(64, activation='relu'), 
-Dense(4, activation='softmax') 
+    Conv1D(64, kernel_size=3, activation='relu', input_shape=(40, 1)), 
+    MaxPooling1D(pool_size=2), 
+    LSTM(64, return_sequences=False), 
+    Dropout(0.3), 
+    Dense(64, activation='relu'), 
+    Dense(4, activation='softmax') 
 ]) 
-model.compile(loss='categorical_crossentropy', optimizer='adam', 
-metrics=['accuracy']) history = model.fit(X, y, epochs=30, batch_size=32, 
-validation_split=0.2) model.save("emotion_model.h5") 
-print("n Model training complete! Saved as emotion_model.h5")
\ No newline at end of file
+model.compile(loss='categorical_crossentropy', optimizer='adam', metrics=['accuracy']) 
+history = model.fit(train_ds, validation_data=val_ds, epochs=30,
+                    callbacks=[ThroughputCallback(BATCH_SIZE, n_samples=len(train_idx))]) 
+model.save("emotion_model.h5") 
+# Sidecar with the label order and the features Preprocess.py extracted, so the
+# model is served (and Predict_emotion.py predicts) with the same features
+save_model_metadata("emotion_model.h5", [name.capitalize() for name in sorted(label_map, key=label_map.get)],
+                    name="emotion_cnn", input_shape=model.input_shape[1:],
+                    feature_spec=FeatureSpec.from_config(dataset.feature_config))
+print("\n Model training complete! Saved as emotion_model.h5")
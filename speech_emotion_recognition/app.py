@@ -1,128 +1,172 @@
-from flask import Flask, render_template, request, jsonify
-import librosa
+import os
+import time
+
+STARTUP_BEGAN = time.perf_counter()
+
+# Persist librosa's numba JIT cache across restarts; must be set before librosa is imported
+os.environ.setdefault("NUMBA_CACHE_DIR", os.environ.get(
+    "SER_NUMBA_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".numba_cache")
+))
+
+from flask import Flask, Response, render_template, request, jsonify, send_file
+from flask_sock import Sock
 import numpy as np
-from tensorflow.keras.models import load_model
 import tempfile
-import os
-import subprocess
+import io
+import json
 import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+
+from audio_io import can_decode_in_memory
+import metrics
+from feature_cache import FeatureCache, make_cache_key
+from live_stream import LiveSession
+from metrics import log, stage_timer
+from audio_features import (
+    DURATION, OFFSET, extract_features, extract_features_from_bytes,
+    extract_features_from_upload, get_feature_params, timeline_features, vad, window_seconds,
+)
+from batch_uploads import NDJSON_MIMETYPE, BatchTooLarge, ndjson_line, unpack_uploads
+from mfcc_engine import get_engine
+from model_registry import ModelRegistry
+from request_profiler import ProfilingDenied, RequestProfile, is_admin, profile_path, profiling_requested
+from voice_activity import NoSpeechError
 
 app = Flask(__name__)
+sock = Sock(app)
 
-# load trained model
-model = load_model("model/emotion_model_7class.h5")
+MODEL_PATH = "model/emotion_model_7class.h5"
 
-emotions = ["Neutral", "Happy", "Sad", "Angry", "Fear", "Disgust", "Surprise"]
+# Micro-batching limits for the inference worker
+MAX_BATCH_SIZE = int(os.environ.get("SER_MAX_BATCH_SIZE", "32"))
+MAX_BATCH_WAIT_MS = float(os.environ.get("SER_MAX_BATCH_WAIT_MS", "5"))
 
-def convert_audio_to_wav(input_path, output_path):
-    """Convert audio file to WAV format using ffmpeg if available"""
-    try:
-        # Try using ffmpeg for conversion
-        result = subprocess.run([
-            'ffmpeg', '-i', input_path, '-ar', '22050', '-ac', '1', 
-            '-f', 'wav', output_path, '-y'
-        ], capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            return True
-        else:
-            print(f"FFmpeg conversion failed: {result.stderr}")
-            return False
-    except FileNotFoundError:
-        print("FFmpeg not found, trying direct librosa loading")
-        return False
-
-def extract_features(file_path):
-    """Extract MFCC features from audio file with multiple format support"""
-    try:
-        print(f"Attempting to load audio file: {file_path}")
-        
-        # Get file extension
-        file_ext = os.path.splitext(file_path)[1].lower()
-        print(f"File extension: {file_ext}")
-        
-        # Try different approaches based on file type
-        audio = None
-        sr = None
-        
-        try:
-            # Method 1: Direct librosa loading (works for most formats)
-            print("Trying direct librosa loading...")
-            audio, sr = librosa.load(file_path, duration=3, offset=0.5, sr=22050)
-            print(f"Direct loading successful. Audio length: {len(audio)}, Sample rate: {sr}")
-            
-        except Exception as e1:
-            print(f"Direct loading failed: {e1}")
-            
-            try:
-                # Method 2: Load without duration/offset constraints
-                print("Trying librosa loading without constraints...")
-                audio, sr = librosa.load(file_path, sr=22050)
-                
-                # Apply duration and offset manually if needed
-                if len(audio) > sr * 3:  # If longer than 3 seconds
-                    start_sample = int(0.5 * sr)  # 0.5 second offset
-                    end_sample = start_sample + int(3 * sr)  # 3 seconds duration
-                    audio = audio[start_sample:end_sample]
-                
-                print(f"Constrained loading successful. Audio length: {len(audio)}, Sample rate: {sr}")
-                
-            except Exception as e2:
-                print(f"Constrained loading failed: {e2}")
-                
-                try:
-                    # Method 3: Try loading with different parameters
-                    print("Trying librosa loading with mono conversion...")
-                    audio, sr = librosa.load(file_path, sr=None, mono=True)
-                    
-                    # Resample to 22050 if needed
-                    if sr != 22050:
-                        audio = librosa.resample(audio, orig_sr=sr, target_sr=22050)
-                        sr = 22050
-                    
-                    # Apply duration constraints
-                    if len(audio) > sr * 3:
-                        start_sample = int(0.5 * sr)
-                        end_sample = start_sample + int(3 * sr)
-                        audio = audio[start_sample:end_sample]
-                    
-                    print(f"Mono conversion successful. Audio length: {len(audio)}, Sample rate: {sr}")
-                    
-                except Exception as e3:
-                    print(f"Mono conversion failed: {e3}")
-                    raise Exception(f"Could not load audio file. Tried multiple methods. Last error: {str(e3)}")
-        
-        # Ensure we have audio data
-        if audio is None or len(audio) == 0:
-            raise ValueError("No audio data found in file")
-        
-        # Ensure minimum length
-        if len(audio) < sr * 0.1:  # Less than 0.1 seconds
-            raise ValueError("Audio file too short (minimum 0.1 seconds required)")
-        
-        # Normalize audio
-        audio = librosa.util.normalize(audio)
-        print(f"Audio normalized. Min: {np.min(audio):.3f}, Max: {np.max(audio):.3f}")
-        
-        # Extract MFCC features
-        try:
-            mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=40)
-            features = np.mean(mfcc.T, axis=0)
-            print(f"Successfully extracted MFCC features: {features.shape}")
-            
-            # Validate features
-            if np.any(np.isnan(features)) or np.any(np.isinf(features)):
-                raise ValueError("Invalid MFCC features (NaN or Inf values)")
-            
-            return features
-            
-        except Exception as e:
-            print(f"MFCC extraction failed: {e}")
-            raise Exception(f"Could not extract features from audio. Error: {str(e)}")
-        
-    except Exception as e:
-        print(f"Feature extraction error: {str(e)}")
-        raise Exception(f"Audio processing failed: {str(e)}")
+# Repeated uploads of the same clip are answered from memory
+CACHE_MAX_ENTRIES = int(os.environ.get("SER_CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL_SECONDS = float(os.environ.get("SER_CACHE_TTL_SECONDS", "3600"))
+
+# Live streaming: one update per window while the client is still recording
+LIVE_HOP_SECONDS = float(os.environ.get("SER_LIVE_HOP_SECONDS", "1.0"))
+
+# Timeline mode: overlapping windows over the whole clip, predicted as one batch
+TIMELINE_HOP_SECONDS = float(os.environ.get("SER_TIMELINE_HOP_SECONDS", "1.0"))
+TIMELINE_MAX_SECONDS = float(os.environ.get("SER_TIMELINE_MAX_SECONDS", "60"))
+
+# Inference backend: keras, or tflite/onnx exports of each model (see export_model.py)
+INFERENCE_BACKEND = os.environ.get("SER_INFERENCE_BACKEND", "keras")
+INFERENCE_QUANTIZE = os.environ.get("SER_INFERENCE_QUANTIZE")  # e.g. "int8" or "float16"
+
+# Every model in MODEL_DIR with a JSON sidecar is served; changed files are hot-swapped
+MODEL_DIR = os.environ.get("SER_MODEL_DIR", os.path.dirname(MODEL_PATH))
+DEFAULT_MODEL = os.environ.get("SER_DEFAULT_MODEL", "emotion_7class")
+MODEL_POLL_SECONDS = float(os.environ.get("SER_MODEL_POLL_SECONDS", "5"))
+
+# /predict_batch: the files of one request are decoded on these threads
+BATCH_DECODE_WORKERS = int(os.environ.get("SER_BATCH_DECODE_WORKERS", str(os.cpu_count() or 1)))
+
+# Warm-up: "background" serves at once and flips /ready when warm, "blocking"
+# warms before the import returns, "off" skips it
+WARMUP_MODE = os.environ.get("SER_WARMUP", "background")
+WARMUP_BATCH_SIZES = (1, 2, 4, 8, 16, 32)
+WARMUP_SAMPLE_RATE = 44100  # a typical upload rate, so resampling is warmed as well
+
+startup_report = {"import_s": round(time.perf_counter() - STARTUP_BEGAN, 3)}
+ready = threading.Event()
+
+# trained models; each one batches concurrent requests through its own worker
+registry = ModelRegistry(
+    MODEL_DIR,
+    default_name=DEFAULT_MODEL,
+    backend=INFERENCE_BACKEND,
+    quantize=INFERENCE_QUANTIZE,
+    batcher_kwargs={"max_batch_size": MAX_BATCH_SIZE, "max_wait_ms": MAX_BATCH_WAIT_MS},
+    warmup_batch_sizes=WARMUP_BATCH_SIZES if WARMUP_MODE != "off" else (),
+    num_threads=int(os.environ.get("SER_BACKEND_THREADS", "0")) or None,
+)
+
+feature_cache = FeatureCache(max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS)
+batch_decode_pool = ThreadPoolExecutor(max_workers=BATCH_DECODE_WORKERS, thread_name_prefix="batch-decode")
+
+def build_result(prediction, model):
+    """Build the JSON response for one row of model probabilities"""
+    emotion_idx = np.argmax(prediction)
+    emotion = model.labels[emotion_idx]
+    confidence = float(np.max(prediction)) * 100
+
+    log("Prediction: %s (%.1f%%)", emotion, confidence)
+    if metrics.VERBOSE:
+        log("All probabilities: %s", prediction)
+
+    # Get all probabilities, keyed by the model's own label order
+    probabilities = {label.lower(): float(p) for label, p in zip(model.labels, prediction)}
+
+    return {
+        "success": True,
+        "emotion": emotion,
+        "confidence": f"{confidence:.1f}",
+        "probabilities": probabilities,
+        "model": model.key,
+    }
+
+def build_no_speech_result(vad_info, model):
+    """Fast response for audio the voice-activity gate found silent"""
+    log("No speech detected: %s", vad_info)
+    return {
+        "success": True,
+        "speech": False,
+        "emotion": "No speech",
+        "confidence": "0.0",
+        "probabilities": {label.lower(): 0.0 for label in model.labels},
+        "model": model.key,
+        "vad": vad_info,
+    }
+
+def build_timeline_result(starts, predictions, model, vad_info=None):
+    """Per-window probabilities plus the mean over voiced windows as the overall result.
+
+    Rows of NaN mark windows the voice-activity gate skipped.
+    """
+    voiced = ~np.isnan(predictions).any(axis=1)
+    if not voiced.any():
+        result = build_no_speech_result(vad_info, model)
+    else:
+        result = build_result(np.mean(predictions[voiced], axis=0), model)
+        if vad_info is not None:
+            result["vad"] = vad_info
+    result["aggregation"] = "mean"
+    window = window_seconds(model.feature_spec)
+    result["timeline"] = [
+        {
+            "start": float(start),
+            "end": float(start) + window,
+            "emotion": model.labels[int(np.argmax(row))],
+            "confidence": f"{float(np.max(row)) * 100:.1f}",
+            "probabilities": {label.lower(): float(p) for label, p in zip(model.labels, row)},
+        } if is_voiced else {
+            "start": float(start),
+            "end": float(start) + window,
+            "emotion": "No speech",
+            "confidence": "0.0",
+            "probabilities": {label.lower(): 0.0 for label in model.labels},
+        }
+        for start, row, is_voiced in zip(starts, predictions, voiced)
+    ]
+    return result
+
+def build_live_update(window):
+    """Shape a streaming window result like a /predict response"""
+    return {
+        "type": "update",
+        "start": window["start"],
+        "end": window["end"],
+        "emotion": window["emotion"],
+        "confidence": f"{window['confidence'] * 100:.1f}",
+        "probabilities": {label.lower(): p for label, p in window["probabilities"].items()},
+        "latency_ms": window["latency_ms"],
+        "speech": window["speech"],
+    }
 
 def get_file_info(file_path):
     """Get information about the audio file"""
@@ -130,7 +174,8 @@ def get_file_info(file_path):
         import mutagen
         from mutagen import File
         
-        audio_file = File(file_path)
+        with stage_timer("file_info"):
+            audio_file = File(file_path)
         if audio_file is not None:
             info = {
                 'duration': getattr(audio_file.info, 'length', 0),
@@ -138,128 +183,515 @@ def get_file_info(file_path):
                 'sample_rate': getattr(audio_file.info, 'sample_rate', 0),
                 'channels': getattr(audio_file.info, 'channels', 0)
             }
-            print(f"File info: {info}")
+            log("File info: %s", info)
             return info
     except ImportError:
-        print("Mutagen not available for file info")
+        log("Mutagen not available for file info")
     except Exception as e:
-        print(f"Could not get file info: {e}")
+        log("Could not get file info: %s", e)
     
     return None
 
+def get_upload_extension(file):
+    """Pick a temp file suffix from the upload's content type and filename"""
+    file_extension = '.wav'  # default
+    original_filename = file.filename or 'audio'
+    
+    if file.content_type:
+        log("Content type: %s", file.content_type)
+        if 'webm' in file.content_type:
+            file_extension = '.webm'
+        elif 'mp4' in file.content_type or 'mp4a' in file.content_type:
+            file_extension = '.mp4'
+        elif 'mpeg' in file.content_type or 'mp3' in file.content_type:
+            file_extension = '.mp3'
+        elif 'wav' in file.content_type:
+            file_extension = '.wav'
+    
+    # Also check filename extension
+    if original_filename:
+        name_lower = original_filename.lower()
+        if name_lower.endswith('.webm'):
+            file_extension = '.webm'
+        elif name_lower.endswith('.mp4'):
+            file_extension = '.mp4'
+        elif name_lower.endswith('.mp3'):
+            file_extension = '.mp3'
+        elif name_lower.endswith('.wav'):
+            file_extension = '.wav'
+    
+    log("Using file extension: %s", file_extension)
+    log("Original filename: %s", original_filename)
+    return file_extension
+
+def save_temp_upload(audio_bytes, file):
+    """Write the upload to a temp file for decoders that need a path"""
+    suffix = get_upload_extension(file)
+    with stage_timer("temp_write"), tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        temp_file.write(audio_bytes)
+        temp_path = temp_file.name
+    log("Saved temporary file: %s (%s bytes)", temp_path, len(audio_bytes))
+    return temp_path
+
+def timeline_lookup(audio_bytes, model):
+    """Cache key for a timeline request, and its finished result on a cache hit"""
+    params = dict(get_feature_params(model.feature_spec), mode='timeline', hop=TIMELINE_HOP_SECONDS,
+                  max_seconds=TIMELINE_MAX_SECONDS)
+    cache_key = make_cache_key(audio_bytes, params, model.model_id)
+    cached = feature_cache.get(cache_key)
+    metrics.CACHE_LOOKUPS.inc(result="hit" if cached is not None else "miss")
+    if cached is None:
+        return cache_key, None
+    log("=== Cache hit (timeline) ===")
+    return cache_key, build_timeline_result(cached.features, cached.probabilities, model)
+
+def score_timeline(cache_key, timeline, model):
+    """One batched predict over the voiced windows of ``timeline_features`` output"""
+    starts, features, keep, vad_info, decode_info = timeline
+    predictions = np.full((len(starts), len(model.labels)), np.nan)
+    if keep.any():
+        with stage_timer("inference"):
+            predictions[keep] = model.batcher.predict_batch(features)
+    
+    # The cache keeps window starts in place of features for timeline entries
+    feature_cache.put(cache_key, starts, predictions)
+    result = build_timeline_result(starts, predictions, model, vad_info)
+    result["decode"] = decode_info
+    return result
+
+def predict_timeline(audio_bytes, file, model):
+    """Emotion timeline over the whole clip from one STFT pass and one batched predict"""
+    cache_key, result = timeline_lookup(audio_bytes, model)
+    if result is not None:
+        return result
+    
+    log("=== Extracting timeline features ===")
+    timeline = timeline_features(audio_bytes, get_upload_extension(file), model.feature_spec,
+                                 TIMELINE_HOP_SECONDS, TIMELINE_MAX_SECONDS)
+    return score_timeline(cache_key, timeline, model)
+
+def run_prediction(cache_key, features, model, details=None):
+    """Run inference on one feature vector and remember the result.
+
+    ``details`` (voice activity, decode cost) is reported next to the
+    probabilities; cache hits have nothing to report.
+    """
+    log("Features shape: %s", features.shape)
+
+    # Make prediction
+    log("=== Making prediction ===")
+    with stage_timer("inference"):
+        prediction = model.batcher.predict(features)
+    feature_cache.put(cache_key, features, prediction)
+    result = build_result(prediction, model)
+    result.update(details or {})
+
+    log("=== Prediction successful ===")
+    return result
+
+def batch_lookup(audio_bytes, model):
+    """Cache key for one file of a batch, and its finished result on a cache hit"""
+    cache_key = make_cache_key(audio_bytes, get_feature_params(model.feature_spec), model.model_id)
+    cached = feature_cache.get(cache_key)
+    metrics.CACHE_LOOKUPS.inc(result="hit" if cached is not None else "miss")
+    return cache_key, build_result(cached.probabilities, model) if cached is not None else None
+
+def batch_extract(name, audio_bytes, model):
+    """``(cache_key, features, details, result)`` for one file of a batch.
+
+    ``result`` is already set when the file needs no inference: a cache hit,
+    silence, or a file that could not be decoded.
+    """
+    cache_key, result = batch_lookup(audio_bytes, model)
+    if result is not None:
+        return cache_key, None, None, result
+    try:
+        features, details = extract_features_from_upload(audio_bytes, os.path.splitext(name)[1] or ".wav",
+                                                         model.feature_spec)
+        return cache_key, features, details, None
+    except NoSpeechError as e:
+        return cache_key, None, None, build_no_speech_result(e.vad_info, model)
+    except Exception as e:
+        log("Batch file %s failed: %s", name, e)
+        return cache_key, None, None, {"success": False, "error": str(e)}
+
+def finish_batch_rows(ready, predictions, model):
+    """``(index, name, result)`` for decoded ``(index, name, cache_key, features, details)`` rows"""
+    scored = []
+    for (index, name, cache_key, features, details), prediction in zip(ready, predictions):
+        feature_cache.put(cache_key, features, prediction)
+        result = build_result(prediction, model)
+        result.update(details)
+        scored.append((index, name, result))
+    return scored
+
+def score_batch_rows(ready, model):
+    """One batched inference call over every decoded row in ``ready``"""
+    try:
+        with stage_timer("inference"):
+            predictions = model.batcher.predict_batch([row[3] for row in ready])
+    except Exception as e:
+        return [(index, name, {"success": False, "error": str(e)}) for index, name, *_ in ready]
+    return finish_batch_rows(ready, predictions, model)
+
+class BatchSummary:
+    """Counts for the final ``{"done": true}`` line of a /predict_batch stream"""
+
+    def __init__(self, n_files):
+        self.began = time.perf_counter()
+        self.counts = {"files": n_files, "succeeded": 0, "failed": 0, "inference_calls": 0}
+
+    def line(self, index, name, result):
+        self.counts["succeeded" if result.get("success") else "failed"] += 1
+        return ndjson_line(dict(result, index=index, file=name))
+
+    def done(self):
+        elapsed = time.perf_counter() - self.began
+        metrics.REQUEST_SECONDS.observe(elapsed, endpoint="predict_batch")
+        if self.counts["failed"]:
+            metrics.ERRORS.inc(endpoint="predict_batch")
+        return ndjson_line(dict(self.counts, done=True, elapsed_ms=round(elapsed * 1000, 1)))
+
+def stream_batch(items, model):
+    """NDJSON lines for ``(name, bytes)`` items in the order they finish.
+
+    Files decode concurrently on ``batch_decode_pool``. Cache hits, silent
+    clips and failures are sent as soon as they are known; decoded rows are
+    scored together once a full model batch is ready or every file is decoded,
+    so a batch up to the batcher's size is a single inference call.
+    """
+    summary = BatchSummary(len(items))
+    futures = {batch_decode_pool.submit(batch_extract, name, data, model): (index, name)
+               for index, (name, data) in enumerate(items)}
+    pending = set(futures)
+    ready = []
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, name = futures[future]
+                cache_key, features, details, result = future.result()
+                if result is None:
+                    ready.append((index, name, cache_key, features, details))
+                else:
+                    yield summary.line(index, name, result)
+            if ready and (len(ready) >= model.batcher.max_batch_size or not pending):
+                summary.counts["inference_calls"] += 1
+                for index, name, result in score_batch_rows(ready, model):
+                    yield summary.line(index, name, result)
+                ready = []
+    finally:
+        # The client went away: do not decode what nobody will read
+        for future in pending:
+            future.cancel()
+    yield summary.done()
+
 @app.route("/")
 def index():
     return render_template("complete_project.html")
 
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(feature_cache.stats())
+
+@app.route("/vad/stats")
+def vad_stats():
+    return jsonify(vad.stats() if vad is not None else {"enabled": False})
+
+@app.route("/ready")
+def readiness():
+    """200 once the model is loaded and warm, 503 before that"""
+    status = 200 if ready.is_set() else 503
+    return jsonify({"ready": ready.is_set(), "startup": startup_report}), status
+
+@app.route("/models")
+def list_models():
+    return jsonify(registry.describe())
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/profiles/<request_id>")
+def download_profile(request_id):
+    """The saved cProfile dump of a profiled request, for pstats or snakeviz"""
+    if not is_admin(request.headers):
+        return jsonify({"success": False, "error": "Admin token required"}), 403
+    try:
+        path = profile_path(request_id)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if not os.path.exists(path):
+        return jsonify({"success": False, "error": f"No profile for {request_id}"}), 404
+    return send_file(os.path.abspath(path), mimetype="application/octet-stream", as_attachment=True)
+
 @app.route("/predict", methods=["POST"])
 def predict():
+    began = time.perf_counter()
+    metrics.REQUESTS.inc(endpoint="predict")
+    try:
+        # X-Profile: 1 (or ?profile=1) with a valid X-Admin-Token
+        profiling = profiling_requested(request.headers, request.args)
+    except ProfilingDenied as e:
+        metrics.ERRORS.inc(endpoint="predict")
+        return jsonify({"success": False, "error": str(e)}), 403
+    profile = RequestProfile(request.headers.get("X-Request-ID")) if profiling else nullcontext()
+    with profile:
+        try:
+            # ?model=name, ?model=name@version or model + version form fields; default otherwise
+            with registry.use(request.values.get("model"), request.values.get("version")) as model:
+                result = predict_with(model)
+        except KeyError as e:
+            result = {"success": False, "error": e.args[0]}
+        if not result.get("success"):
+            metrics.ERRORS.inc(endpoint="predict")
+        with stage_timer("serialization"):
+            response = jsonify(result)
+    if profiling:
+        report = profile.report()
+        report["path"] = profile.save(report)
+        log("=== Profiled request %s: %.1f ms ===", profile.request_id, report['total_ms'])
+        response = jsonify(dict(result, profile=report))
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - began, endpoint="predict")
+    return response
+
+@app.route("/predict_batch", methods=["POST"])
+def predict_batch():
+    """Several clips, or a zip/tar of them, in one request.
+
+    The answer is newline-delimited JSON: one /predict result per file, with
+    its ``index`` and ``file`` name, as each file finishes, then a
+    ``{"done": true, ...}`` summary line.
+    """
+    metrics.REQUESTS.inc(endpoint="predict_batch")
+    with stage_timer("upload_read"):
+        uploads = [(f.filename, f.read()) for _, f in request.files.items(multi=True)]
+    try:
+        items = unpack_uploads(uploads)
+        if not items:
+            raise ValueError("No audio files provided")
+        model = registry.acquire(request.values.get("model"), request.values.get("version"))
+    except BatchTooLarge as e:
+        metrics.ERRORS.inc(endpoint="predict_batch")
+        return jsonify({"success": False, "error": str(e)}), 413
+    except (KeyError, ValueError) as e:
+        metrics.ERRORS.inc(endpoint="predict_batch")
+        return jsonify({"success": False, "error": e.args[0]}), 400
+    log("=== Batch of %s files for %s ===", len(items), model.key)
+    response = Response(stream_batch(items, model), mimetype=NDJSON_MIMETYPE)
+    # Held until the last line is sent, or the client disconnects
+    response.call_on_close(model.release)
+    return response
+
+def predict_with(model):
+    """The /predict result for the held model, as a dict"""
     try:
-        print("=== Received prediction request ===")
+        log("=== Received prediction request ===")
         
         if 'audio' not in request.files:
-            print("No audio file in request")
-            return jsonify({"success": False, "error": "No audio file provided"})
+            log("No audio file in request")
+            return {"success": False, "error": "No audio file provided"}
         
         file = request.files["audio"]
-        print(f"Received file: {file.filename}")
-        print(f"Content type: {file.content_type}")
-        print(f"File size: {len(file.read())} bytes")
-        file.seek(0)  # Reset file pointer
+        log("Received file: %s", file.filename)
+        log("Content type: %s", file.content_type)
+        with stage_timer("upload_read"):
+            audio_bytes = file.read()
+        log("File size: %s bytes", len(audio_bytes))
         
         if file.filename == '':
-            print("Empty filename")
-            return jsonify({"success": False, "error": "No file selected"})
+            log("Empty filename")
+            return {"success": False, "error": "No file selected"}
         
-        # Determine file extension
-        file_extension = '.wav'  # default
-        original_filename = file.filename or 'audio'
+        if request.values.get("mode") == "timeline":
+            return predict_timeline(audio_bytes, file, model)
         
-        if file.content_type:
-            print(f"Content type: {file.content_type}")
-            if 'webm' in file.content_type:
-                file_extension = '.webm'
-            elif 'mp4' in file.content_type or 'mp4a' in file.content_type:
-                file_extension = '.mp4'
-            elif 'mpeg' in file.content_type or 'mp3' in file.content_type:
-                file_extension = '.mp3'
-            elif 'wav' in file.content_type:
-                file_extension = '.wav'
+        # Identical clips skip decoding and inference entirely
+        cache_key = make_cache_key(audio_bytes, get_feature_params(model.feature_spec), model.model_id)
+        cached = feature_cache.get(cache_key)
+        metrics.CACHE_LOOKUPS.inc(result="hit" if cached is not None else "miss")
+        if cached is not None:
+            log("=== Cache hit ===")
+            return build_result(cached.probabilities, model)
         
-        # Also check filename extension
-        if original_filename:
-            name_lower = original_filename.lower()
-            if name_lower.endswith('.webm'):
-                file_extension = '.webm'
-            elif name_lower.endswith('.mp4'):
-                file_extension = '.mp4'
-            elif name_lower.endswith('.mp3'):
-                file_extension = '.mp3'
-            elif name_lower.endswith('.wav'):
-                file_extension = '.wav'
-        
-        print(f"Using file extension: {file_extension}")
-        print(f"Original filename: {original_filename}")
+        if can_decode_in_memory(audio_bytes):
+            # WAV/FLAC/OGG via soundfile, WebM/MP4/MP3 via PyAV, no temp file or ffmpeg process
+            try:
+                log("=== Extracting features (in memory) ===")
+                features, details = extract_features_from_bytes(audio_bytes, model.feature_spec)
+                return run_prediction(cache_key, features, model, details)
+            except NoSpeechError:
+                raise
+            except Exception as e:
+                log("In-memory decoding failed, falling back to temp file: %s", e)
+                metrics.DECODE_FALLBACKS.inc(method="in_memory")
         
         # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-            file.save(temp_file.name)
-            temp_path = temp_file.name
-            print(f"Saved temporary file: {temp_path}")
-            print(f"Temp file size: {os.path.getsize(temp_path)} bytes")
+        temp_path = save_temp_upload(audio_bytes, file)
         
         try:
-            # Get file info if possible
-            file_info = get_file_info(temp_path)
-            
             # Extract features
-            print("=== Extracting features ===")
-            features = extract_features(temp_path)
-            features = np.expand_dims(features, axis=0)
-            print(f"Features shape: {features.shape}")
-
-            # Make prediction
-            print("=== Making prediction ===")
-            prediction = model.predict(features, verbose=0)
-            emotion_idx = np.argmax(prediction)
-            emotion = emotions[emotion_idx]
-            confidence = float(np.max(prediction)) * 100
-            
-            print(f"Prediction: {emotion} ({confidence:.1f}%)")
-            print(f"All probabilities: {prediction[0]}")
-            
-            # Get all probabilities
-            probabilities = {
-                'neutral': float(prediction[0][0]),
-                'happy': float(prediction[0][1]),
-                'sad': float(prediction[0][2]),
-                'angry': float(prediction[0][3]),
-                'fear': float(prediction[0][4]),
-                'disgust': float(prediction[0][5]),
-                'surprise': float(prediction[0][6])
-            }
-
-            result = {
-                "success": True,
-                "emotion": emotion,
-                "confidence": f"{confidence:.1f}",
-                "probabilities": probabilities
-            }
-            
-            print("=== Prediction successful ===")
-            return jsonify(result)
+            log("=== Extracting features ===")
+            features, details = extract_features(temp_path, model.feature_spec)
+            return run_prediction(cache_key, features, model, details)
             
         finally:
             # Clean up temporary file
             if os.path.exists(temp_path):
                 os.unlink(temp_path)
-                print(f"Cleaned up temporary file: {temp_path}")
+                log("Cleaned up temporary file: %s", temp_path)
                 
+    except NoSpeechError as e:
+        return build_no_speech_result(e.vad_info, model)
     except Exception as e:
         print(f"=== Prediction error ===")
         print(f"Error: {str(e)}")
         import traceback
         traceback.print_exc()
-        return jsonify({"success": False, "error": str(e)})
+        return {"success": False, "error": str(e)}
+
+@sock.route("/stream")
+def stream(ws):
+    """Live emotion updates for audio sent while the client is still recording.
+
+    Protocol: a JSON ``{"type": "start", "format": "webm" | "pcm_f32le",
+    "sample_rate": ..., "model": ...}`` message, then binary audio chunks, then
+    ``{"type": "stop"}``. The server answers with ``update`` messages as
+    windows complete and a final ``done`` message.
+    """
+    send_lock = threading.Lock()
+
+    def send(payload):
+        with send_lock:
+            ws.send(json.dumps(payload))
+
+    session = None
+    model = None
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                break
+            if isinstance(message, str):
+                control = json.loads(message)
+                if control.get("type") == "start" and session is None:
+                    log("=== Live stream started: %s ===", control)
+                    # The session keeps the model it started with across hot swaps
+                    model = registry.acquire(control.get("model"), control.get("version"))
+                    spec = model.feature_spec
+                    session = LiveSession(
+                        control, model.batcher.predict_batch, model.labels,
+                        on_update=lambda window: send(build_live_update(window)),
+                        spec=spec, window_seconds=window_seconds(spec),
+                        hop_seconds=LIVE_HOP_SECONDS, vad=vad,
+                    )
+                    send({"type": "ready", "model": model.key, "labels": model.labels})
+                elif control.get("type") == "stop":
+                    break
+            elif session is not None:
+                session.feed(message)
+    except Exception as e:
+        print(f"Live stream error: {e}")
+        try:
+            send({"type": "error", "error": str(e)})
+        except Exception:
+            pass
+    finally:
+        if session is not None:
+            summary = session.finish()
+            log("=== Live stream finished: %s ===", summary)
+            try:
+                send({"type": "done", **summary})
+            except Exception:
+                pass
+        if model is not None:
+            model.release()
+
+def warm_up():
+    """Push synthetic requests through decode, MFCC and predict.
+
+    The first pass pays for lazy imports, engine matrices, numba and the
+    backend's graph tracing; the second shows what a warm request costs.
+    Every batch size the batchers can produce is traced once as well,
+    for every model in the registry.
+    """
+    import soundfile as sf
+    from create_test_audio import generate_test_tone
+    
+    tone = generate_test_tone(duration=OFFSET + DURATION + 0.5, sample_rate=WARMUP_SAMPLE_RATE, seed=0)
+    buffer = io.BytesIO()
+    sf.write(buffer, tone, WARMUP_SAMPLE_RATE, format="WAV")
+    wav_bytes = buffer.getvalue()
+    
+    model = registry.get()
+    passes = []
+    for _ in range(2):
+        t0 = time.perf_counter()
+        features, _ = extract_features_from_bytes(wav_bytes, model.feature_spec)
+        t1 = time.perf_counter()
+        model.batcher.predict(features)
+        t2 = time.perf_counter()
+        passes.append({
+            "features_ms": round((t1 - t0) * 1000, 1),
+            "predict_ms": round((t2 - t1) * 1000, 1),
+            "total_ms": round((t2 - t0) * 1000, 1),
+        })
+    
+    # Formats that cannot be decoded in memory go through librosa.load on a temp file
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
+        temp_file.write(wav_bytes)
+    try:
+        extract_features(temp_file.name, model.feature_spec)
+    finally:
+        os.unlink(temp_file.name)
+    
+    for entry in registry.entries():
+        entry.warm_up(WARMUP_BATCH_SIZES)
+    # Timeline engines, once per distinct feature spec
+    for spec in {entry.feature_spec for entry in registry.entries()}:
+        window = int(window_seconds(spec) * spec.sample_rate)
+        get_engine(sr=spec.sample_rate, n_mfcc=spec.n_mfcc, n_fft=spec.n_fft, hop_length=spec.hop_length,
+                   n_mels=spec.n_mels).window_mean_mfcc(
+            np.resize(tone, 2 * window), window, int(TIMELINE_HOP_SECONDS * spec.sample_rate)
+        )
+    return passes
+
+def run_startup():
+    """Warm up (unless disabled), mark the app ready and report startup timings"""
+    try:
+        if WARMUP_MODE != "off":
+            t0 = time.perf_counter()
+            with metrics.paused():
+                first, warm = warm_up()
+            startup_report["warmup_s"] = round(time.perf_counter() - t0, 3)
+            startup_report["first_request_ms"] = first
+            startup_report["warm_request_ms"] = warm
+    except Exception as e:
+        # A failed warm-up costs latency, not correctness, so the app still goes ready
+        print(f"Warm-up failed: {e}")
+        startup_report["warmup_error"] = str(e)
+    finally:
+        startup_report["ready_s"] = round(time.perf_counter() - STARTUP_BEGAN, 3)
+        ready.set()
+        print(f"=== Startup: {json.dumps(startup_report)} ===")
+
+def start(watch=True):
+    """Load the models, start the model watcher and warm up per WARMUP_MODE"""
+    model_load_began = time.perf_counter()
+    registry.scan(warm_up=False)
+    startup_report["model_load_s"] = round(time.perf_counter() - model_load_began, 3)
+    print(f"Inference backend: {INFERENCE_BACKEND}, default model: {registry.get().key}")
+    if watch and MODEL_POLL_SECONDS > 0:
+        registry.start_watching(MODEL_POLL_SECONDS)
+    
+    if WARMUP_MODE == "background":
+        threading.Thread(target=run_startup, name="warm-up", daemon=True).start()
+    else:
+        run_startup()
+
+# serve_prefork.py imports with SER_DEFER_START=1 and decides where models load
+if os.environ.get("SER_DEFER_START") != "1":
+    start()
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,335 @@
+import argparse
+import asyncio
+import contextvars
+import functools
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
+
+from aiohttp import web
+
+import metrics
+from audio_features import extract_features_traced, get_feature_params, timeline_features_traced, warm_up_features
+from batch_uploads import NDJSON_MIMETYPE, BatchTooLarge, unpack_uploads
+from metrics import log, stage_timer
+from request_profiler import ProfilingDenied, RequestProfile, is_admin, profile_path, profiling_requested, run_profiled
+from voice_activity import NoSpeechError
+
+# Decode + MFCC run in worker processes, so a slow WebM decode holds one
+# worker instead of the GIL every other request needs
+DECODE_WORKERS = int(os.environ.get("SER_DECODE_WORKERS", str(os.cpu_count() or 1)))
+# Threads that wait on the models' batchers; the batchers coalesce their rows
+INFERENCE_THREADS = int(os.environ.get("SER_INFERENCE_THREADS", "4"))
+# Uploads admitted to the decode pool at once; more single uploads are
+# answered 503 right away, while files of a batch wait for a free slot
+MAX_PENDING = int(os.environ.get("SER_MAX_PENDING", "64"))
+MAX_UPLOAD_MB = float(os.environ.get("SER_MAX_UPLOAD_MB", "32"))
+
+
+class ServerBusy(Exception):
+    """Every one of the ``max_pending`` decode slots is taken"""
+
+
+class AsyncServer:
+    """aiohttp front end over the same models, cache and result format as app.py.
+
+    Request I/O stays on the event loop. Decoding and feature extraction go
+    to a bounded process pool, inference to a bounded thread pool, and the
+    loop only awaits both.
+    """
+
+    def __init__(self, ser, decode_workers=DECODE_WORKERS, inference_threads=INFERENCE_THREADS,
+                 max_pending=MAX_PENDING):
+        self.ser = ser
+        self.decode_pool = ProcessPoolExecutor(
+            max_workers=decode_workers,
+            # TensorFlow is loaded in this process; forking it is not safe
+            mp_context=mp.get_context("spawn"),
+            # Pay for imports and JIT before the first upload
+            initializer=warm_up_features,
+        )
+        self.inference_pool = ThreadPoolExecutor(max_workers=inference_threads,
+                                                 thread_name_prefix="inference")
+        self.decode_workers = decode_workers
+        self.inference_threads = inference_threads
+        self.max_pending = max_pending
+        self.pending = 0
+        self.decode_slots = asyncio.Semaphore(max_pending)
+
+    async def predict(self, request):
+        began = time.perf_counter()
+        metrics.REQUESTS.inc(endpoint="predict")
+        try:
+            profiling = profiling_requested(request.headers, request.query)
+        except ProfilingDenied as e:
+            metrics.ERRORS.inc(endpoint="predict")
+            return web.json_response({"success": False, "error": str(e)}, status=403)
+        # The loop thread serves other requests meanwhile, so only the pool
+        # work done for this request is profiled
+        profile = (RequestProfile(request.headers.get("X-Request-ID"), profile_thread=False)
+                   if profiling else nullcontext())
+        with profile:
+            result, status = await self.predict_result(request, profile if profiling else None)
+            if not result.get("success"):
+                metrics.ERRORS.inc(endpoint="predict")
+            with stage_timer("serialization"):
+                response = web.json_response(result, status=status)
+        if profiling:
+            report = profile.report()
+            report["path"] = profile.save(report)
+            log("=== Profiled request %s: %.1f ms ===", profile.request_id, report['total_ms'])
+            response = web.json_response(dict(result, profile=report), status=status)
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - began, endpoint="predict")
+        return response
+
+    async def predict_result(self, request, profile=None):
+        """``(result dict, HTTP status)`` for one /predict request"""
+        with stage_timer("upload_read"):
+            form = await request.post()
+        upload = form.get("audio")
+        if upload is None or not hasattr(upload, "file"):
+            return {"success": False, "error": "No audio file provided"}, 200
+        try:
+            model = self.ser.registry.acquire(request.query.get("model") or form.get("model"),
+                                              request.query.get("version") or form.get("version"))
+        except KeyError as e:
+            return {"success": False, "error": e.args[0]}, 200
+        try:
+            mode = request.query.get("mode") or form.get("mode")
+            return await self.predict_with(model, upload, mode, profile), 200
+        except NoSpeechError as e:
+            return self.ser.build_no_speech_result(e.vad_info, model), 200
+        except ServerBusy:
+            return {"success": False, "error": "Server busy, retry later"}, 503
+        except Exception as e:
+            print(f"=== Prediction error: {e} ===")
+            return {"success": False, "error": str(e)}, 200
+        finally:
+            model.release()
+
+    async def predict_with(self, model, upload, mode=None, profile=None):
+        ser = self.ser
+        audio_bytes = upload.file.read()
+        log("=== Received prediction request: %s, %s bytes ===", upload.filename, len(audio_bytes))
+        if mode == "timeline":
+            return await self.predict_timeline(model, upload, audio_bytes, profile)
+
+        cache_key = ser.make_cache_key(audio_bytes, get_feature_params(model.feature_spec), model.model_id)
+        cached = ser.feature_cache.get(cache_key)
+        metrics.CACHE_LOOKUPS.inc(result="hit" if cached is not None else "miss")
+        if cached is not None:
+            log("=== Cache hit ===")
+            return ser.build_result(cached.probabilities, model)
+
+        async with self.decode_slot():
+            features, details, error, recorded = await self._run(
+                self.decode_pool, extract_features_traced,
+                audio_bytes, ser.get_upload_extension(upload), model.feature_spec, profile=profile,
+            )
+        # Stage timings and counters from the worker process
+        metrics.replay(recorded)
+        if error is not None:
+            raise error
+        return await self._run(self.inference_pool, ser.run_prediction, cache_key, features, model, details,
+                               profile=profile)
+
+    async def predict_timeline(self, model, upload, audio_bytes, profile=None):
+        """``app.predict_timeline`` with decoding and windowed MFCCs in the process pool"""
+        ser = self.ser
+        cache_key, result = ser.timeline_lookup(audio_bytes, model)
+        if result is not None:
+            return result
+        async with self.decode_slot():
+            timeline, error, recorded = await self._run(
+                self.decode_pool, timeline_features_traced, audio_bytes, ser.get_upload_extension(upload),
+                model.feature_spec, ser.TIMELINE_HOP_SECONDS, ser.TIMELINE_MAX_SECONDS, profile=profile,
+            )
+        metrics.replay(recorded)
+        if error is not None:
+            raise error
+        return await self._run(self.inference_pool, ser.score_timeline, cache_key, timeline, model,
+                               profile=profile)
+
+    async def predict_batch(self, request):
+        """app.py's /predict_batch: NDJSON results per file as they finish, then a summary line"""
+        metrics.REQUESTS.inc(endpoint="predict_batch")
+        with stage_timer("upload_read"):
+            form = await request.post()
+        uploads = [(f.filename, f.file.read()) for f in form.values() if hasattr(f, "file")]
+        try:
+            items = unpack_uploads(uploads)
+            if not items:
+                raise ValueError("No audio files provided")
+            model = self.ser.registry.acquire(request.query.get("model") or form.get("model"),
+                                              request.query.get("version") or form.get("version"))
+        except BatchTooLarge as e:
+            metrics.ERRORS.inc(endpoint="predict_batch")
+            return web.json_response({"success": False, "error": str(e)}, status=413)
+        except (KeyError, ValueError) as e:
+            metrics.ERRORS.inc(endpoint="predict_batch")
+            return web.json_response({"success": False, "error": e.args[0]}, status=400)
+        try:
+            log("=== Batch of %s files for %s ===", len(items), model.key)
+            response = web.StreamResponse(headers={"Content-Type": NDJSON_MIMETYPE})
+            await response.prepare(request)
+            summary = self.ser.BatchSummary(len(items))
+            async for line in self.stream_batch(items, model, summary):
+                await response.write(line.encode())
+            await response.write(summary.done().encode())
+            await response.write_eof()
+            return response
+        finally:
+            model.release()
+
+    async def batch_extract(self, index, name, audio_bytes, model):
+        """One file of a batch, decoded in the process pool; see ``app.batch_extract``"""
+        ser = self.ser
+        cache_key, result = ser.batch_lookup(audio_bytes, model)
+        if result is not None:
+            return index, name, cache_key, None, None, result
+        # Only cache misses take a decode slot, and they queue for one
+        async with self.decode_slot(wait=True):
+            features, details, error, recorded = await self._run(
+                self.decode_pool, extract_features_traced, audio_bytes, os.path.splitext(name)[1] or ".wav",
+                model.feature_spec,
+            )
+        metrics.replay(recorded)
+        if isinstance(error, NoSpeechError):
+            result = ser.build_no_speech_result(error.vad_info, model)
+        elif error is not None:
+            result = {"success": False, "error": str(error)}
+        return index, name, cache_key, features, details, result
+
+    async def stream_batch(self, items, model, summary):
+        """NDJSON lines in the order files finish, scored in model-sized batches like ``app.stream_batch``"""
+        tasks = [asyncio.ensure_future(self.batch_extract(index, name, data, model))
+                 for index, (name, data) in enumerate(items)]
+        remaining = len(tasks)
+        ready = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, name, cache_key, features, details, result = await next_done
+                remaining -= 1
+                if result is None:
+                    ready.append((index, name, cache_key, features, details))
+                else:
+                    yield summary.line(index, name, result)
+                if ready and (len(ready) >= model.batcher.max_batch_size or not remaining):
+                    summary.counts["inference_calls"] += 1
+                    for index, name, result in await self._run(self.inference_pool, self.ser.score_batch_rows,
+                                                               ready, model):
+                        yield summary.line(index, name, result)
+                    ready = []
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @asynccontextmanager
+    async def decode_slot(self, wait=False):
+        """Hold one of the ``max_pending`` decode slots; unless ``wait``, raise ``ServerBusy`` when none is free"""
+        if not wait and self.decode_slots.locked():
+            raise ServerBusy()
+        async with self.decode_slots:
+            self.pending += 1
+            try:
+                yield
+            finally:
+                self.pending -= 1
+
+    async def _run(self, pool, fn, *args, profile=None):
+        """Await ``fn(*args)`` in ``pool``; under ``profile`` the pool side is profiled too"""
+        if profile is not None:
+            # The part number goes in the suffix: the id alone may already be the longest valid one
+            dump_path = profile_path(profile.request_id, f".part{len(profile.extra_stats)}.prof")
+            os.makedirs(os.path.dirname(dump_path) or ".", exist_ok=True)
+            fn, args = run_profiled, (dump_path, fn) + args
+        if isinstance(pool, ThreadPoolExecutor):
+            # Threads see this request's metrics context (its trace); worker
+            # processes send their measurements back instead
+            fn, args = contextvars.copy_context().run, (fn,) + args
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args))
+        finally:
+            if profile is not None:
+                profile.add_stats(dump_path)
+
+    async def ready(self, request):
+        status = 200 if self.ser.ready.is_set() else 503
+        return web.json_response({"ready": self.ser.ready.is_set(), "startup": self.ser.startup_report},
+                                 status=status)
+
+    async def models(self, request):
+        return web.json_response(self.ser.registry.describe())
+
+    async def pools(self, request):
+        return web.json_response({
+            "decode_workers": self.decode_workers,
+            "inference_threads": self.inference_threads,
+            "pending_decodes": self.pending,
+            "max_pending": self.max_pending,
+        })
+
+    async def metrics_endpoint(self, request):
+        return web.Response(body=metrics.render().encode(),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    async def download_profile(self, request):
+        if not is_admin(request.headers):
+            return web.json_response({"success": False, "error": "Admin token required"}, status=403)
+        request_id = request.match_info["request_id"]
+        try:
+            path = profile_path(request_id)
+        except ValueError as e:
+            return web.json_response({"success": False, "error": str(e)}, status=400)
+        if not os.path.exists(path):
+            return web.json_response({"success": False, "error": f"No profile for {request_id}"}, status=404)
+        return web.FileResponse(path, headers={"Content-Type": "application/octet-stream"})
+
+    async def cache_stats(self, request):
+        return web.json_response(self.ser.feature_cache.stats())
+
+    async def _close(self, app):
+        self.decode_pool.shutdown(cancel_futures=True)
+        self.inference_pool.shutdown()
+
+    def make_app(self):
+        app = web.Application(client_max_size=int(MAX_UPLOAD_MB * 1024 * 1024))
+        app.add_routes([
+            web.post("/predict", self.predict),
+            web.post("/predict_batch", self.predict_batch),
+            web.get("/ready", self.ready),
+            web.get("/models", self.models),
+            web.get("/pools", self.pools),
+            web.get("/cache/stats", self.cache_stats),
+            web.get("/metrics", self.metrics_endpoint),
+            web.get("/profiles/{request_id}", self.download_profile),
+        ])
+        app.on_cleanup.append(self._close)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve /predict from an asyncio event loop with bounded worker pools")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--decode-workers", type=int, default=DECODE_WORKERS)
+    parser.add_argument("--inference-threads", type=int, default=INFERENCE_THREADS)
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING)
+    args = parser.parse_args()
+
+    # Imported here, not at the top: spawned decode workers import this module
+    # and must not load TensorFlow or the models
+    import app as ser
+
+    server = AsyncServer(ser, args.decode_workers, args.inference_threads, args.max_pending)
+    # Start the workers (and their warm-up) now rather than on the first upload
+    for future in [server.decode_pool.submit(os.getpid) for _ in range(args.decode_workers)]:
+        future.result()
+    print(f"Async server: {args.decode_workers} decode workers, {args.inference_threads} inference threads")
+    web.run_app(server.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
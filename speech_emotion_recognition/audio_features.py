@@ -0,0 +1,331 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import metrics
+from audio_io import can_decode_in_memory, decode_in_memory, decode_window
+from feature_spec import FeatureSpec
+from metrics import log, stage_timer
+from mfcc_engine import get_engine
+from voice_activity import NoSpeechError, VoiceActivityDetector
+
+# Decode + MFCC path shared by app.py and the async server's worker processes.
+# Nothing here imports TensorFlow or loads a model, so workers stay small.
+
+# Feature extraction parameters
+SAMPLE_RATE = 22050
+DURATION = 3
+OFFSET = 0.5
+N_MFCC = 40
+
+# What every request was decoded with before models carried their own spec;
+# used for models whose sidecar has no ``feature_spec``
+SERVING_SPEC = FeatureSpec(sample_rate=SAMPLE_RATE, offset=OFFSET, duration=DURATION,
+                           normalize=True, n_mfcc=N_MFCC)
+
+# Voice-activity gate: silent audio skips normalization, MFCCs and the model.
+# Opt-in, since it splices out quiet stretches the model was not trained without
+VAD_ENABLED = os.environ.get("SER_VAD_ENABLED", "0") == "1"
+VAD_THRESHOLD_DB = float(os.environ.get("SER_VAD_THRESHOLD_DB", "-45"))
+VAD_MIN_SPEECH_SECONDS = float(os.environ.get("SER_VAD_MIN_SPEECH_SECONDS", "0.25"))
+
+vad = VoiceActivityDetector(energy_threshold_db=VAD_THRESHOLD_DB) if VAD_ENABLED else None
+
+def get_feature_params(spec=SERVING_SPEC):
+    """Feature settings that change the MFCC vector for a given clip, the VAD gate's included"""
+    params = spec.to_dict()
+    if vad is not None:
+        params.update(vad_threshold_db=VAD_THRESHOLD_DB, vad_min_speech_seconds=VAD_MIN_SPEECH_SECONDS)
+    return params
+
+def window_seconds(spec=SERVING_SPEC):
+    """Length of the windows timeline and live modes cut longer recordings into"""
+    return spec.fixed_duration or spec.duration or DURATION
+
+def trim_silence(audio, spec=SERVING_SPEC):
+    """The spec's ``trim`` step: ``(audio, first_kept_sample)``"""
+    if not spec.trim:
+        return audio, 0
+    import librosa
+    
+    with stage_timer("trim"):
+        audio, (start, _) = librosa.effects.trim(audio)
+    return audio, int(start)
+
+def extract_details(vad_info, decode_info):
+    """What a result reports next to the probabilities: voice activity and what decoding cost"""
+    details = {"decode": decode_info}
+    if vad_info is not None:
+        details["vad"] = vad_info
+    return details
+
+def extract_features(file_path, spec=SERVING_SPEC):
+    """Extract MFCC features from an audio file, decoding only the window the spec uses.
+
+    Returns ``(features, details)`` like ``extract_features_from_bytes``.
+    """
+    import librosa
+    
+    sample_rate, offset, duration = spec.sample_rate, spec.offset, spec.decode_seconds()
+    
+    try:
+        log("Attempting to load audio file: %s", file_path)
+        
+        # Get file extension
+        file_ext = os.path.splitext(file_path)[1].lower()
+        log("File extension: %s", file_ext)
+        
+        decode_began = time.perf_counter()
+        
+        try:
+            # Method 1: seek to the offset and stop after the duration (soundfile or PyAV)
+            log("Trying windowed decoding...")
+            audio, sr, decode_info = decode_window(file_path, sr=sample_rate, offset=offset, duration=duration,
+                                                   res_type=spec.res_type)
+            log("Windowed decoding successful. Audio length: %s, Sample rate: %s, %s", len(audio), sr, decode_info)
+            
+        except Exception as e1:
+            log("Windowed decoding failed: %s", e1)
+            metrics.DECODE_FALLBACKS.inc(method="windowed")
+            
+            try:
+                # Method 2: librosa/audioread; decodes from the start but stops at offset + duration
+                log("Trying direct librosa loading...")
+                audio, sr = librosa.load(file_path, duration=duration, offset=offset, sr=sample_rate,
+                                         res_type=spec.res_type)
+                decode_info = {
+                    'decoder': 'librosa',
+                    'decoded_seconds': round(offset + len(audio) / sr, 3),
+                    'bytes_read': None,
+                    'bytes_total': os.path.getsize(file_path),
+                    'decode_ms': round((time.perf_counter() - decode_began) * 1000, 3),
+                }
+                log("Direct loading successful. Audio length: %s, Sample rate: %s", len(audio), sr)
+                
+            except Exception as e2:
+                log("Direct loading failed: %s", e2)
+                metrics.DECODE_FALLBACKS.inc(method="librosa_direct")
+                raise Exception(f"Could not load audio file. Tried multiple methods. Last error: {str(e2)}")
+        finally:
+            metrics.record_stage("decode", time.perf_counter() - decode_began)
+        
+        features, vad_info = features_from_audio(audio, sr, spec)
+        return features, extract_details(vad_info, decode_info)
+        
+    except NoSpeechError:
+        raise
+    except Exception as e:
+        log("Feature extraction error: %s", e)
+        raise Exception(f"Audio processing failed: {str(e)}")
+
+def extract_features_from_bytes(audio_bytes, spec=SERVING_SPEC):
+    """Extract MFCC features from an upload decoded in memory (soundfile or PyAV).
+
+    The upload is decoded straight to the spec's rate: only the window the
+    spec uses is read, and it is resampled only when the file's own rate
+    differs. Returns ``(features, details)``, ``details`` holding the
+    ``decode`` info (bytes read, seconds decoded, time spent) and ``vad``.
+    """
+    try:
+        with stage_timer("decode"):
+            audio, sr, info = decode_in_memory(
+                audio_bytes, sr=spec.sample_rate, offset=spec.offset, duration=spec.decode_seconds(),
+                res_type=spec.res_type,
+            )
+        log("File info: %s", info)
+        log("In-memory decoding successful. Audio length: %s, Sample rate: %s", len(audio), sr)
+        
+        features, vad_info = features_from_audio(audio, sr, spec)
+        return features, extract_details(vad_info, info)
+        
+    except NoSpeechError:
+        raise
+    except Exception as e:
+        log("Feature extraction error: %s", e)
+        raise Exception(f"Audio processing failed: {str(e)}")
+
+def features_from_audio(audio, sr, spec=SERVING_SPEC):
+    """Gate, validate and condition decoded audio as ``spec`` says, then reduce it to mean MFCCs.
+
+    Returns ``(features, vad_info)``; raises ``NoSpeechError`` before any
+    MFCC work when the clip is silent.
+    """
+    import librosa
+    
+    # Ensure we have audio data
+    if audio is None or len(audio) == 0:
+        raise ValueError("No audio data found in file")
+    
+    # Drop silent stretches before normalization would amplify them
+    vad_info = None
+    if vad is not None:
+        with stage_timer("vad"):
+            audio, vad_info = vad.voiced_audio(audio, sr)
+        log("Voice activity: %s", vad_info)
+        no_speech = vad_info["speech_seconds"] < VAD_MIN_SPEECH_SECONDS
+        vad.record_clip(vad_info, skipped=no_speech)
+        if no_speech:
+            metrics.NO_SPEECH.inc()
+            raise NoSpeechError(vad_info)
+    
+    # Ensure minimum length
+    if len(audio) < sr * 0.1:  # Less than 0.1 seconds
+        raise ValueError("Audio file too short (minimum 0.1 seconds required)")
+    
+    # Same conditioning as the model's training data
+    audio, _ = trim_silence(audio, spec)
+    if spec.normalize:
+        with stage_timer("normalize"):
+            audio = librosa.util.normalize(audio)
+        if metrics.VERBOSE:
+            log("Audio normalized. Min: %.3f, Max: %.3f", np.min(audio), np.max(audio))
+    if spec.fixed_duration:
+        audio = librosa.util.fix_length(audio, size=int(sr * spec.fixed_duration))
+    
+    # Extract MFCC features
+    try:
+        with stage_timer("mfcc"):
+            engine = get_engine(sr=sr, n_mfcc=spec.n_mfcc, n_fft=spec.n_fft,
+                                hop_length=spec.hop_length, n_mels=spec.n_mels)
+            features = engine.mean_mfcc(audio)
+        log("Successfully extracted MFCC features: %s", features.shape)
+        
+        # Validate features
+        if np.any(np.isnan(features)) or np.any(np.isinf(features)):
+            raise ValueError("Invalid MFCC features (NaN or Inf values)")
+        
+        return features, vad_info
+        
+    except Exception as e:
+        log("MFCC extraction failed: %s", e)
+        raise Exception(f"Could not extract features from audio. Error: {str(e)}")
+
+def extract_features_from_upload(audio_bytes, extension=".wav", spec=SERVING_SPEC):
+    """Bytes in, ``(features, details)`` out: in memory when possible, else via a temp file.
+
+    Module-level and free of Flask objects so it can run in a process pool.
+    """
+    if can_decode_in_memory(audio_bytes):
+        try:
+            return extract_features_from_bytes(audio_bytes, spec)
+        except NoSpeechError:
+            raise
+        except Exception as e:
+            log("In-memory decoding failed, falling back to temp file: %s", e)
+            metrics.DECODE_FALLBACKS.inc(method="in_memory")
+    
+    with stage_timer("temp_write"), tempfile.NamedTemporaryFile(delete=False, suffix=extension) as temp_file:
+        temp_file.write(audio_bytes)
+    try:
+        return extract_features(temp_file.name, spec)
+    finally:
+        os.unlink(temp_file.name)
+
+def decode_full_clip(audio_bytes, extension=".wav", spec=SERVING_SPEC, max_seconds=None):
+    """Decode the whole upload (up to ``max_seconds``) at the spec's sample rate; ``(audio, sr, decode_info)``"""
+    if can_decode_in_memory(audio_bytes):
+        try:
+            with stage_timer("decode"):
+                audio, sr, info = decode_in_memory(audio_bytes, sr=spec.sample_rate, duration=max_seconds,
+                                                   res_type=spec.res_type)
+            log("File info: %s", info)
+            return audio, sr, info
+        except Exception as e:
+            log("In-memory decoding failed, falling back to temp file: %s", e)
+            metrics.DECODE_FALLBACKS.inc(method="in_memory")
+    
+    import librosa
+    
+    with stage_timer("temp_write"), tempfile.NamedTemporaryFile(delete=False, suffix=extension) as temp_file:
+        temp_file.write(audio_bytes)
+    try:
+        began = time.perf_counter()
+        with stage_timer("decode"):
+            audio, sr = librosa.load(temp_file.name, sr=spec.sample_rate, duration=max_seconds,
+                                     res_type=spec.res_type)
+        return audio, sr, {
+            "decoder": "librosa",
+            "decoded_seconds": round(len(audio) / sr, 3),
+            "bytes_read": None,
+            "bytes_total": len(audio_bytes),
+            "decode_ms": round((time.perf_counter() - began) * 1000, 3),
+        }
+    finally:
+        os.unlink(temp_file.name)
+
+def timeline_features(audio_bytes, extension=".wav", spec=SERVING_SPEC, hop_seconds=1.0, max_seconds=None):
+    """Mean MFCCs of overlapping windows over the whole upload, from one STFT pass.
+
+    Returns ``(starts, features, keep, vad_info, decode_info)``: window
+    starts in seconds, one feature row per window ``keep`` marks, and the
+    rest skipped as silent. A clip shorter than one window is a single
+    window, trimmed, normalized and padded exactly like /predict. Free of
+    model objects so it can run in a process pool.
+    """
+    audio, sr, decode_info = decode_full_clip(audio_bytes, extension, spec, max_seconds)
+    window = int(window_seconds(spec) * sr)
+    hop = int(hop_seconds * sr)
+    # Windows are cut from the trimmed clip; each is already the spec's fixed length
+    trimmed, lead = trim_silence(audio, spec)
+    
+    if len(trimmed) < window:
+        try:
+            features, vad_info = features_from_audio(audio, sr, spec)
+        except NoSpeechError as e:
+            return np.zeros(1), np.zeros((0, spec.n_mfcc), dtype=np.float32), np.zeros(1, dtype=bool), \
+                e.vad_info, decode_info
+        return np.zeros(1), features[np.newaxis, :], np.ones(1, dtype=bool), vad_info, decode_info
+    
+    engine = get_engine(sr=sr, n_mfcc=spec.n_mfcc, n_fft=spec.n_fft,
+                        hop_length=spec.hop_length, n_mels=spec.n_mels)
+    n_windows = engine.n_windows(len(trimmed), window, hop)
+    keep = np.ones(n_windows, dtype=bool)
+    if vad is not None:
+        # Gate on the same uncentered frame grid the windows are pooled from
+        with stage_timer("vad"):
+            active = vad.frame_activity(engine.frame(trimmed, center=False))
+            keep = vad.window_speech(active, 1 + (window - engine.n_fft) // engine.hop_length,
+                                     max(1, hop // engine.hop_length), n_windows)
+        vad.record_windows(n_windows, n_windows - int(keep.sum()))
+    
+    starts = (lead + np.arange(n_windows) * (max(1, hop // engine.hop_length) * engine.hop_length)) / sr
+    features = np.zeros((0, spec.n_mfcc), dtype=np.float32)
+    if keep.any():
+        with stage_timer("mfcc"):
+            features, _ = engine.window_mean_mfcc(trimmed, window, hop, normalize=spec.normalize, keep=keep)
+    vad_info = {"windows": n_windows, "windows_skipped": int(n_windows - keep.sum())}
+    log("Timeline windows: %s (%s silent, skipped)", n_windows, vad_info['windows_skipped'])
+    return starts, features, keep, vad_info, decode_info
+
+def timeline_features_traced(audio_bytes, extension=".wav", spec=SERVING_SPEC, hop_seconds=1.0, max_seconds=None):
+    """``timeline_features`` for worker processes: ``(timeline, error, trace)``, like ``extract_features_traced``"""
+    with metrics.trace() as recorded:
+        try:
+            return timeline_features(audio_bytes, extension, spec, hop_seconds, max_seconds), None, recorded
+        except Exception as e:
+            return None, e, recorded
+
+def extract_features_traced(audio_bytes, extension=".wav", spec=SERVING_SPEC):
+    """``extract_features_from_upload`` for worker processes: ``(features, details, error, trace)``.
+
+    Errors are returned rather than raised so the stage timings and counters
+    still reach the server process, which applies them with ``metrics.replay``.
+    """
+    with metrics.trace() as recorded:
+        try:
+            features, details = extract_features_from_upload(audio_bytes, extension, spec)
+            return features, details, None, recorded
+        except Exception as e:
+            return None, None, e, recorded
+
+def warm_up_features():
+    """Pay for lazy imports, resampling filters and numba JIT on a synthetic clip"""
+    import io
+    import soundfile as sf
+    from create_test_audio import generate_test_tone
+    
+    buffer = io.BytesIO()
+    sf.write(buffer, generate_test_tone(duration=4, sample_rate=44100, seed=0), 44100, format="WAV")
+    return extract_features_from_upload(buffer.getvalue())
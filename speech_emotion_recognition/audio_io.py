@@ -0,0 +1,364 @@
+import io
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import soundfile as sf
+
+try:
+    import av
+except ImportError:
+    av = None
+
+# Containers libsndfile can decode straight from a memory buffer
+SOUNDFILE_FORMATS = ("wav", "flac", "ogg")
+
+# Compressed containers decoded in-process by FFmpeg's libraries through PyAV
+PYAV_FORMATS = ("webm", "mp4", "mp3")
+
+# After a seek, decoding restarts this far before the offset so codecs with
+# inter-frame state (Opus, AAC, MP3) have settled when the window begins;
+# shorter offsets are decoded through, a seek would save less than it costs
+SEEK_PREROLL_SECONDS = 0.5
+SEEK_MIN_SECONDS = 1.0
+
+
+def sniff_format(audio_bytes):
+    """Guess the container from its magic bytes; returns None when unknown"""
+    header = audio_bytes[:12]
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header[:4] == b"fLaC":
+        return "flac"
+    if header[:4] == b"OggS":
+        return "ogg"
+    if header[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if header[4:8] == b"ftyp":
+        return "mp4"
+    if header[:3] == b"ID3" or header[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+        return "mp3"
+    return None
+
+
+def can_decode_in_memory(audio_bytes):
+    fmt = sniff_format(audio_bytes)
+    return fmt in SOUNDFILE_FORMATS or (av is not None and fmt in PYAV_FORMATS)
+
+
+class _CountingReader:
+    """Binary file wrapper that counts the bytes a decoder actually reads"""
+
+    def __init__(self, f):
+        self._f = f
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._f.seek(offset, whence)
+
+    def tell(self):
+        return self._f.tell()
+
+
+def decode_window(source, sr=22050, offset=0.0, duration=None, res_type="soxr_hq"):
+    """Decode only ``duration`` seconds from ``offset`` of an upload or audio file.
+
+    ``source`` is the file's bytes or a path. WAV/FLAC/OGG seek straight to
+    the offset; everything else goes through PyAV, which seeks to the packet
+    before the offset and stops decoding once the window is complete, so a
+    3 s window of a 60 s upload costs about 3 s of decoding. Mirrors
+    ``librosa.load(..., sr=sr, offset=offset, duration=duration,
+    res_type=res_type)``: channels are averaged to mono and the result is
+    float32 at ``sr``. Returns ``(audio, sr, info)``; besides the header
+    fields ``get_file_info`` used to report, ``info`` has ``resampler``,
+    ``bytes_read`` (of ``bytes_total``), ``decoded_seconds`` and ``decode_ms``.
+    """
+    began = time.perf_counter()
+    if isinstance(source, (bytes, bytearray)):
+        f, size = io.BytesIO(source), len(source)
+    else:
+        f, size = open(source, "rb"), os.path.getsize(source)
+    with f:
+        fmt = sniff_format(f.read(12))
+        f.seek(0)
+        reader = _CountingReader(f)
+        if fmt in SOUNDFILE_FORMATS:
+            audio, sr, info = _decode_soundfile(reader, sr, offset, duration, res_type)
+        elif av is not None:
+            # FFmpeg probes formats the magic bytes above do not cover
+            audio, sr, info = _decode_pyav(reader, sr, offset, duration, res_type)
+        else:
+            raise ValueError(f"No decoder for format: {fmt or 'unknown'} (PyAV is not installed)")
+    info['bytes_read'] = reader.bytes_read
+    info['bytes_total'] = size
+    info['decode_ms'] = round((time.perf_counter() - began) * 1000, 3)
+    return audio, sr, info
+
+
+def decode_in_memory(audio_bytes, sr=22050, offset=0.0, duration=None, res_type="soxr_hq"):
+    """``decode_window`` for an upload held in memory: no temp file and no ffmpeg process"""
+    fmt = sniff_format(audio_bytes)
+    if fmt not in SOUNDFILE_FORMATS and fmt not in PYAV_FORMATS:
+        raise ValueError(f"No in-memory decoder for format: {fmt or 'unknown'}")
+    return decode_window(audio_bytes, sr=sr, offset=offset, duration=duration, res_type=res_type)
+
+
+def _decode_soundfile(reader, sr, offset, duration, res_type):
+    with sf.SoundFile(reader) as f:
+        native_sr = f.samplerate
+        info = {
+            'duration': f.frames / native_sr if native_sr else 0,
+            'sample_rate': native_sr,
+            'channels': f.channels,
+            'format': f.format,
+            'decoder': 'soundfile',
+            'resampler': None,
+        }
+
+        start = min(int(round(offset * native_sr)), f.frames)
+        frames = -1 if duration is None else int(round(duration * native_sr))
+        f.seek(start)
+        audio = f.read(frames, dtype="float32", always_2d=True)
+
+    info['seeked'] = start > 0
+    info['decoded_seconds'] = round(len(audio) / native_sr, 3) if native_sr else 0
+    audio = np.mean(audio, axis=1) if audio.shape[1] > 1 else audio[:, 0]
+
+    if sr is not None and native_sr != sr:
+        import librosa
+
+        # Only the decoded window is resampled, never the whole file
+        audio = librosa.resample(audio, orig_sr=native_sr, target_sr=sr, res_type=res_type)
+        info['resampler'] = res_type
+    else:
+        sr = native_sr
+
+    return audio, sr, info
+
+
+def _decode_pyav(reader, sr, offset, duration, res_type):
+    """Decode WebM/Opus, MP4/AAC, MP3 and other FFmpeg formats with PyAV"""
+    decoded = _pyav_window(reader, offset, duration, seek=True)
+    if decoded is None:
+        # The container could not seek precisely enough; decode from the start instead
+        reader.seek(0)
+        decoded = _pyav_window(reader, offset, duration, seek=False)
+    audio, native_sr, info = decoded
+
+    if sr is not None and native_sr != sr:
+        import librosa
+
+        # Resampled like _decode_soundfile, so every format follows librosa.load
+        audio = librosa.resample(audio, orig_sr=native_sr, target_sr=sr, res_type=res_type)
+        info['resampler'] = res_type
+    else:
+        sr = native_sr
+
+    return audio, sr, info
+
+
+def _pyav_window(reader, offset, duration, seek):
+    """Mono float32 window at the stream's native rate; None when a seek lands past the offset"""
+    with av.open(reader, mode="r") as container:
+        stream = container.streams.audio[0]
+        native_sr = stream.codec_context.sample_rate
+
+        info = {
+            'duration': float(container.duration / av.time_base) if container.duration else 0,
+            'sample_rate': native_sr,
+            'channels': stream.codec_context.channels,
+            'format': container.format.name,
+            'codec': stream.codec_context.name,
+            'decoder': 'pyav',
+            'resampler': None,
+        }
+
+        start = int(round(offset * native_sr))
+        stop = None if duration is None else start + int(round(duration * native_sr))
+
+        # Sample positions count from the stream's first timestamp, which is
+        # past the encoder delay, just as they do when decoding from the start
+        origin = float(stream.start_time * stream.time_base) if stream.start_time is not None else 0.0
+        seek = seek and offset >= SEEK_MIN_SECONDS
+        if seek:
+            try:
+                container.seek(int((origin + offset - SEEK_PREROLL_SECONDS) / stream.time_base), stream=stream)
+            except av.error.FFmpegError:
+                return None
+        first = None if seek else 0
+
+        # libswresample only downmixes to mono float32; the rate is left alone
+        mixer = av.AudioResampler(format="flt", layout="mono")
+        chunks = []
+        decoded = 0
+
+        for frame in container.decode(stream):
+            if first is None:
+                if frame.time is None:
+                    return None
+                first = int(round((frame.time - origin) * native_sr))
+                if first > start:
+                    return None
+            for out in mixer.resample(frame):
+                chunks.append(out.to_ndarray().reshape(-1))
+                decoded += len(chunks[-1])
+            if stop is not None and first + decoded >= stop:
+                break
+        else:
+            for out in mixer.resample(None):
+                chunks.append(out.to_ndarray().reshape(-1))
+                decoded += len(chunks[-1])
+
+    info['seeked'] = bool(first)
+    info['decoded_seconds'] = round(decoded / native_sr, 3)
+    audio = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+    first = first or 0
+    return audio[max(start - first, 0):None if stop is None else stop - first], native_sr, info
+
+
+def _soxr_quality(res_type):
+    """soxr quality for a librosa ``soxr_*`` res_type; live streams can only resample with soxr"""
+    if not res_type.startswith("soxr_"):
+        raise ValueError(f"Live streams cannot resample with {res_type!r}, only soxr_*")
+    return res_type[len("soxr_"):].upper()
+
+
+def _stream_resampler(input_rate, sr, res_type):
+    """Incremental mono float32 resampler from ``input_rate`` to ``sr``; None when the rates match"""
+    if input_rate == sr:
+        return None
+    import soxr
+
+    return soxr.ResampleStream(input_rate, sr, 1, dtype="float32", quality=_soxr_quality(res_type))
+
+
+class _ChunkPipe:
+    """Blocking file-like object fed with byte chunks from another thread"""
+
+    def __init__(self):
+        self._chunks = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def feed(self, data):
+        with self._cond:
+            self._chunks.append(bytes(data))
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def read(self, size=-1):
+        with self._cond:
+            while not self._chunks and not self._closed:
+                self._cond.wait()
+            if not self._chunks:
+                return b""
+            if size is None or size < 0:
+                data = b"".join(self._chunks)
+                self._chunks.clear()
+                return data
+            out = bytearray()
+            while self._chunks and len(out) < size:
+                chunk = self._chunks.popleft()
+                take = size - len(out)
+                out += chunk[:take]
+                if len(chunk) > take:
+                    self._chunks.appendleft(chunk[take:])
+            return bytes(out)
+
+
+class StreamingDecoder:
+    """Incrementally decode a container stream (e.g. MediaRecorder WebM/Opus chunks).
+
+    Bytes are pushed with ``feed`` as they arrive; a background thread runs
+    PyAV's demuxer on them and calls ``on_audio`` with mono float32 blocks
+    at ``sr`` as soon as each packet is decoded. ``close`` signals the end
+    of the stream and waits for the last samples to be delivered. Resampling
+    uses the soxr quality of ``res_type``, as ``decode_window`` does.
+    """
+
+    def __init__(self, on_audio, sr=22050, container_format=None, res_type="soxr_hq"):
+        if av is None:
+            raise RuntimeError("PyAV is required for streaming container decoding")
+        _soxr_quality(res_type)
+        self.on_audio = on_audio
+        self.sr = sr
+        self.container_format = container_format
+        self.res_type = res_type
+        self.error = None
+        self._pipe = _ChunkPipe()
+        self._thread = threading.Thread(target=self._run, name="streaming-decoder", daemon=True)
+        self._thread.start()
+
+    def feed(self, data):
+        self._pipe.feed(data)
+
+    def close(self, timeout=None):
+        self._pipe.close()
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            with av.open(self._pipe, mode="r", format=self.container_format) as container:
+                stream = container.streams.audio[0]
+                # PyAV only downmixes; the rate change goes through soxr
+                mixer = av.AudioResampler(format="flt", layout="mono")
+                resampler = None
+                for frame in container.decode(stream):
+                    if resampler is None:
+                        resampler = _stream_resampler(frame.sample_rate, self.sr, self.res_type) or False
+                    for out in mixer.resample(frame):
+                        self._emit(resampler, out.to_ndarray().reshape(-1), last=False)
+                for out in mixer.resample(None):
+                    self._emit(resampler, out.to_ndarray().reshape(-1), last=False)
+                if resampler:
+                    self._emit(resampler, np.zeros(0, dtype=np.float32), last=True)
+        except Exception as e:
+            self.error = e
+
+    def _emit(self, resampler, samples, last):
+        if resampler:
+            samples = resampler.resample_chunk(samples, last=last)
+        if len(samples):
+            self.on_audio(samples)
+
+
+class PCMStreamDecoder:
+    """Incrementally resample raw little-endian float32 PCM frames to mono at ``sr``"""
+
+    def __init__(self, on_audio, sr=22050, input_rate=48000, channels=1, res_type="soxr_hq"):
+        self.on_audio = on_audio
+        self.channels = int(channels)
+        self.error = None
+        self._pending = b""
+        self._resampler = _stream_resampler(input_rate, sr, res_type)
+
+    def feed(self, data):
+        data = self._pending + bytes(data)
+        frame_bytes = 4 * self.channels
+        usable = len(data) - len(data) % frame_bytes
+        self._pending = data[usable:]
+        if not usable:
+            return
+        samples = np.frombuffer(data[:usable], dtype="<f4").reshape(-1, self.channels).mean(axis=1)
+        self._emit(samples.astype(np.float32), last=False)
+
+    def close(self, timeout=None):
+        if self._resampler is not None:
+            self._emit(np.zeros(0, dtype=np.float32), last=True)
+
+    def _emit(self, samples, last):
+        if self._resampler is not None:
+            samples = self._resampler.resample_chunk(samples, last=last)
+        if len(samples):
+            self.on_audio(samples)
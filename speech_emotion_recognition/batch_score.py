@@ -0,0 +1,280 @@
+import argparse
+import csv
+import glob
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+# Per-file diagnostics would swamp a run over a whole archive
+os.environ.setdefault("SER_VERBOSE", "0")
+
+from audio_features import extract_features_from_upload, warm_up_features  # noqa: E402
+from voice_activity import NoSpeechError  # noqa: E402
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".mp3", ".mp4", ".m4a", ".webm")
+OUTPUT_FORMATS = ("csv", "jsonl", "parquet")
+REPORT_SECONDS = 10.0
+
+
+def list_inputs(inputs):
+    """Audio paths from directories (searched recursively), glob patterns and manifests.
+
+    A manifest is a ``.txt`` file with one path per line or a ``.csv`` with a
+    ``path`` column; relative paths are resolved against the manifest's folder.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(AUDIO_EXTENSIONS))
+        elif item.endswith((".txt", ".csv")) and os.path.isfile(item):
+            base = os.path.dirname(item)
+            with open(item, newline="") as f:
+                if item.endswith(".csv"):
+                    entries = [row["path"] for row in csv.DictReader(f)]
+                else:
+                    entries = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+            paths.extend(os.path.join(base, p) for p in entries)
+        else:
+            paths.extend(sorted(glob.glob(item, recursive=True)))
+    # Keep the first occurrence of each file
+    return list(dict.fromkeys(os.path.normpath(p) for p in paths))
+
+
+def extract_chunk(paths, spec):
+    """Worker entry point: ``(path, features, status, error)`` for each file, never raising"""
+    results = []
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                audio_bytes = f.read()
+            features, _ = extract_features_from_upload(audio_bytes, os.path.splitext(path)[1] or ".wav", spec)
+            results.append((path, np.asarray(features, dtype=np.float32), "ok", None))
+        except NoSpeechError:
+            results.append((path, None, "no_speech", None))
+        except Exception as e:
+            results.append((path, None, "error", str(e)))
+    return results
+
+
+class ResultWriter:
+    """Streams scored rows to CSV, JSONL or Parquet.
+
+    CSV and JSONL are appended to, so a resumed run continues the same file.
+    Parquet files cannot be appended to; ``output`` is then a directory and
+    every run adds its own ``part-NNNNN.parquet``, which pandas and pyarrow
+    read back as one dataset.
+    """
+
+    def __init__(self, output, fmt, labels):
+        self.fmt = fmt
+        self.columns = (["path", "status", "emotion", "confidence"]
+                        + [f"prob_{label.lower()}" for label in labels] + ["error"])
+        if fmt == "parquet":
+            if pa is None:
+                raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+            os.makedirs(output, exist_ok=True)
+            part = len(glob.glob(os.path.join(output, "part-*.parquet")))
+            self.path = os.path.join(output, f"part-{part:05d}.parquet")
+            floats = {"confidence"} | {c for c in self.columns if c.startswith("prob_")}
+            self.schema = pa.schema([(c, pa.float32() if c in floats else pa.string()) for c in self.columns])
+            self._writer = pq.ParquetWriter(self.path, self.schema)
+        else:
+            self.path = output
+            new_file = not os.path.exists(output) or os.path.getsize(output) == 0
+            self._file = open(output, "a", newline="")
+            if fmt == "csv":
+                self._csv = csv.DictWriter(self._file, fieldnames=self.columns)
+                if new_file:
+                    self._csv.writeheader()
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self.fmt == "parquet":
+            # One row group per inference batch
+            self._writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+            return
+        if self.fmt == "csv":
+            self._csv.writerows(rows)
+        else:
+            self._file.writelines(json.dumps(row) + "\n" for row in rows)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self.fmt == "parquet":
+            self._writer.close()
+        else:
+            self._file.close()
+
+
+class Checkpoint:
+    """Paths already written to the output, one per line, appended after each batch.
+
+    Rows are written before their paths are recorded, so a run killed in
+    between scores those files again on resume rather than losing them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        partial = False
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    # A line cut short by a crash is not a finished file
+                    if line.endswith("\n"):
+                        self.done.add(line[:-1])
+                    else:
+                        partial = True
+        self._file = open(path, "a")
+        if partial:
+            self._file.write("\n")
+
+    def record(self, paths):
+        self._file.writelines(p + "\n" for p in paths)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.done.update(paths)
+
+    def close(self):
+        self._file.close()
+
+
+def score_rows(runner, labels, pending):
+    """Output rows for extracted ``(path, features, status, error)`` tuples, scored in one model call"""
+    scored = [item for item in pending if item[2] == "ok"]
+    predictions = runner.predict_batch(np.stack([item[1] for item in scored])) if scored else []
+    probabilities = dict(zip((item[0] for item in scored), predictions))
+
+    rows = []
+    for path, _, status, error in pending:
+        row = {"path": path, "status": status, "emotion": None, "confidence": None, "error": error}
+        row.update({f"prob_{label.lower()}": None for label in labels})
+        if path in probabilities:
+            p = probabilities[path]
+            row["emotion"] = labels[int(np.argmax(p))]
+            row["confidence"] = float(np.max(p))
+            row.update({f"prob_{label.lower()}": float(v) for label, v in zip(labels, p)})
+        rows.append(row)
+    return rows
+
+
+def load_model_entry(args):
+    from model_registry import ModelRegistry
+
+    # Only the requested model is loaded; the rest of the directory is left alone
+    registry = ModelRegistry(args.model_dir, args.model, backend=args.backend, quantize=args.quantize,
+                             num_threads=args.threads or None)
+    return registry, registry.load(args.model)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score an audio archive offline: decode and extract features across a process pool, "
+                    "run the model in large batches and stream per-file probabilities to CSV, JSONL or "
+                    "Parquet. Rerunning the same command resumes an interrupted run."
+    )
+    parser.add_argument("inputs", nargs="+", help="directories, glob patterns (quote them) or .txt/.csv manifests")
+    parser.add_argument("--output", required=True, help="results file (a directory of parts for Parquet)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS,
+                        help="default: from the output extension, else csv")
+    parser.add_argument("--checkpoint", help="default: <output>.checkpoint")
+    parser.add_argument("--model-dir", default=os.environ.get("SER_MODEL_DIR", "model"))
+    parser.add_argument("--model", default=os.environ.get("SER_DEFAULT_MODEL", "emotion_7class"),
+                        help="model name or name@version from the model directory")
+    parser.add_argument("--backend", default=os.environ.get("SER_INFERENCE_BACKEND", "keras"))
+    parser.add_argument("--quantize", default=os.environ.get("SER_INFERENCE_QUANTIZE"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="feature-extraction processes")
+    parser.add_argument("--threads", type=int, default=0, help="inference threads (default: backend's choice)")
+    parser.add_argument("--chunk-size", type=int, default=32, help="files per worker task")
+    parser.add_argument("--batch-size", type=int, default=512, help="feature rows per model call")
+    parser.add_argument("--limit", type=int, help="score at most this many new files (for trial runs)")
+    args = parser.parse_args()
+
+    fmt = args.format or next((f for f in OUTPUT_FORMATS if args.output.endswith("." + f)), "csv")
+    checkpoint = Checkpoint(args.checkpoint or args.output.rstrip("/") + ".checkpoint")
+
+    t0 = time.perf_counter()
+    paths = list_inputs(args.inputs)
+    todo = [p for p in paths if p not in checkpoint.done]
+    if args.limit is not None:
+        todo = todo[:args.limit]
+    print(f"{len(paths)} files found, {sum(p in checkpoint.done for p in paths)} already scored, "
+          f"{len(todo)} to score ({time.perf_counter() - t0:.1f}s listing)")
+    if not todo:
+        checkpoint.close()
+        return
+
+    registry, entry = load_model_entry(args)
+    writer = ResultWriter(args.output, fmt, entry.labels)
+    print(f"Scoring with {entry.key} ({entry.backend}) into {writer.path}: "
+          f"{args.workers} workers, chunks of {args.chunk_size}, batches of {args.batch_size}")
+
+    chunks = [todo[i:i + args.chunk_size] for i in range(0, len(todo), args.chunk_size)]
+    counts = {"ok": 0, "no_speech": 0, "error": 0}
+    pending = []
+    done = 0
+    began = last_report = time.perf_counter()
+
+    def flush():
+        nonlocal pending, done
+        rows = score_rows(entry.runner, entry.labels, pending)
+        writer.write(rows)
+        checkpoint.record([row["path"] for row in rows])
+        for row in rows:
+            counts[row["status"]] += 1
+        done += len(rows)
+        pending = []
+
+    # spawn, not fork: the parent has loaded TensorFlow, which is not fork-safe
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context("spawn"),
+                             initializer=warm_up_features) as pool:
+        next_chunk = 0
+        in_flight = set()
+        try:
+            while next_chunk < len(chunks) or in_flight:
+                # Keep a couple of chunks queued per worker, not the whole archive
+                while next_chunk < len(chunks) and len(in_flight) < 2 * args.workers:
+                    in_flight.add(pool.submit(extract_chunk, chunks[next_chunk], entry.feature_spec))
+                    next_chunk += 1
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    pending.extend(future.result())
+                if len(pending) >= args.batch_size:
+                    flush()
+                if time.perf_counter() - last_report >= REPORT_SECONDS:
+                    rate = done / (time.perf_counter() - began)
+                    eta = (len(todo) - done) / rate if rate else float("inf")
+                    print(f"{done}/{len(todo)} files, {rate:.1f} files/s, {counts['error']} errors, "
+                          f"ETA {eta / 60:.1f} min")
+                    last_report = time.perf_counter()
+            flush()
+        except KeyboardInterrupt:
+            # Keep what has been extracted; the checkpoint makes the rest resumable
+            pool.shutdown(wait=False, cancel_futures=True)
+            flush()
+            print("Interrupted; rerun the same command to resume")
+        finally:
+            writer.close()
+            checkpoint.close()
+            registry.stop()
+
+    elapsed = time.perf_counter() - began
+    print(f"Scored {done} files in {elapsed:.1f}s ({done / elapsed:.1f} files/s): {counts['ok']} ok, "
+          f"{counts['no_speech']} no speech, {counts['error']} errors -> {writer.path}")
+
+
+if __name__ == "__main__":
+    main()
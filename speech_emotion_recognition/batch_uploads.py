@@ -0,0 +1,135 @@
+import io
+import json
+import lzma
+import os
+import tarfile
+import zipfile
+import zlib
+
+# Limits for one /predict_batch request, archives counted after extraction
+MAX_FILES = int(os.environ.get("SER_BATCH_MAX_FILES", "100"))
+MAX_TOTAL_MB = float(os.environ.get("SER_BATCH_MAX_MB", "256"))
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".mp3", ".mp4", ".m4a", ".webm")
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# What a damaged archive raises while its headers or members are read; encrypted
+# zip members raise RuntimeError and unsupported compression NotImplementedError
+_ZIP_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError)
+_TAR_ERRORS = (tarfile.TarError, zlib.error, lzma.LZMAError, EOFError, OSError)
+
+# gzip, bzip2 and xz headers: such an upload can only be a (possibly damaged) tarball
+_COMPRESSED_MAGIC = (b"\x1f\x8b", b"BZh", b"\xfd7zXZ\x00")
+
+
+class BatchTooLarge(ValueError):
+    """More files or bytes than ``MAX_FILES`` / ``MAX_TOTAL_MB`` allow"""
+
+
+class _Budget:
+    def __init__(self, max_files, max_total_mb):
+        self.max_files = max_files
+        self.max_total_mb = max_total_mb
+        self.files = max_files
+        self.bytes = int(max_total_mb * 1024 * 1024)
+
+    def take(self, size):
+        if self.files <= 0:
+            raise BatchTooLarge(f"More than {self.max_files} files in one batch")
+        if size > self.bytes:
+            raise BatchTooLarge(f"Batch larger than {self.max_total_mb:g} MB")
+        self.files -= 1
+        self.bytes -= size
+
+
+def _is_audio_member(name):
+    base = os.path.basename(name)
+    # Skip folders, macOS resource forks and dotfiles packed alongside the clips
+    return (base and not base.startswith(".") and "__MACOSX/" not in name
+            and base.lower().endswith(AUDIO_EXTENSIONS))
+
+
+def _read_limited(f, budget, declared_size):
+    # Archive headers can understate sizes; never read more than the budget allows
+    budget.take(declared_size)
+    data = f.read(budget.bytes + declared_size + 1)
+    if len(data) > declared_size:
+        budget.take(len(data) - declared_size)
+    return data
+
+
+def _unpack_zip(name, data, budget):
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except _ZIP_ERRORS as e:
+        raise ValueError(f"{name}: {e}")
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir() or not _is_audio_member(info.filename):
+                continue
+            try:
+                with archive.open(info) as f:
+                    clip = _read_limited(f, budget, info.file_size)
+            except _ZIP_ERRORS as e:
+                raise ValueError(f"{name}: corrupt member {info.filename}: {e}")
+            yield info.filename, clip
+
+
+def _unpack_tar(name, data, budget):
+    try:
+        archive = tarfile.open(fileobj=io.BytesIO(data), mode="r:*")
+    except _TAR_ERRORS:
+        # tarfile lists every compression it tried; none of them is the answer
+        raise ValueError(f"{name}: corrupt or truncated archive")
+    with archive:
+        members = iter(archive)
+        while True:
+            try:
+                member = next(members, None)
+            except _TAR_ERRORS as e:
+                raise ValueError(f"{name}: corrupt archive: {e}")
+            if member is None:
+                return
+            # Regular files only: links and devices are never followed
+            if not member.isfile() or not _is_audio_member(member.name):
+                continue
+            try:
+                clip = _read_limited(archive.extractfile(member), budget, member.size)
+            except _TAR_ERRORS as e:
+                raise ValueError(f"{name}: corrupt member {member.name}: {e}")
+            yield member.name, clip
+
+
+def _open_tar(data):
+    try:
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:*"):
+            return True
+    except _TAR_ERRORS:
+        return False
+
+
+def unpack_uploads(uploads, max_files=MAX_FILES, max_total_mb=MAX_TOTAL_MB):
+    """``(name, bytes)`` for every clip in ``uploads``, itself a list of ``(filename, bytes)``.
+
+    Zip and tar (optionally gzip/bz2/xz compressed) uploads are expanded in
+    memory; members are never written to disk, so their paths cannot escape
+    anywhere. Raises ``BatchTooLarge`` past the limits and ``ValueError`` for
+    a corrupt or truncated archive or member, before any clip is scored.
+    """
+    budget = _Budget(max_files, max_total_mb)
+    items = []
+    for filename, data in uploads:
+        name = filename or f"file{len(items)}"
+        if data[:4] == b"PK\x03\x04":
+            items.extend(_unpack_zip(name, data, budget))
+        elif not name.lower().endswith(AUDIO_EXTENSIONS) and (data.startswith(_COMPRESSED_MAGIC)
+                                                               or _open_tar(data)):
+            items.extend(_unpack_tar(name, data, budget))
+        else:
+            budget.take(len(data))
+            items.append((name, data))
+    return items
+
+
+def ndjson_line(payload):
+    return json.dumps(payload) + "\n"
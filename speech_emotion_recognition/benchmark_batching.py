@@ -0,0 +1,82 @@
+import argparse
+import threading
+import time
+
+import numpy as np
+from tensorflow.keras.models import load_model
+
+from inference_batcher import InferenceBatcher
+
+MODEL_PATH = "model/emotion_model_7class.h5"
+N_FEATURES = 40
+
+
+def run_clients(predict_one, n_clients, requests_per_client):
+    """Drive ``predict_one`` from ``n_clients`` threads and collect latencies"""
+    latencies = [[] for _ in range(n_clients)]
+    start_barrier = threading.Barrier(n_clients + 1)
+
+    def client(idx):
+        rng = np.random.default_rng(idx)
+        rows = rng.standard_normal((requests_per_client, N_FEATURES)).astype(np.float32)
+        start_barrier.wait()
+        for row in rows:
+            t0 = time.perf_counter()
+            predict_one(row)
+            latencies[idx].append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(n_clients)]
+    for t in threads:
+        t.start()
+    start_barrier.wait()
+    t_start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t_start
+
+    all_latencies = np.concatenate([np.asarray(l) for l in latencies]) * 1000.0
+    return {
+        "clients": n_clients,
+        "requests": int(all_latencies.size),
+        "throughput_rps": all_latencies.size / elapsed,
+        "p50_ms": float(np.percentile(all_latencies, 50)),
+        "p99_ms": float(np.percentile(all_latencies, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-request and micro-batched inference")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="requests per client")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    # Warm up graph tracing so it is not charged to the first measurement
+    model.predict(np.zeros((1, N_FEATURES), dtype=np.float32), verbose=0)
+    model.predict_on_batch(np.zeros((args.max_batch_size, N_FEATURES), dtype=np.float32))
+
+    def direct(row):
+        return model.predict(row[np.newaxis, :], verbose=0)[0]
+
+    batcher = InferenceBatcher(
+        model.predict_on_batch,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+    )
+
+    print(f"{'mode':<8} {'clients':>7} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for n_clients in args.clients:
+        for mode, fn in (("direct", direct), ("batched", batcher.predict)):
+            result = run_clients(fn, n_clients, args.requests)
+            print(f"{mode:<8} {n_clients:>7} {result['throughput_rps']:>10.1f} "
+                  f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f}")
+
+    print(f"Batcher stats: {batcher.stats()}")
+    batcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+import warnings
+
+import librosa
+import numpy as np
+
+from audio_features import DURATION, OFFSET
+from audio_io import decode_in_memory
+from benchmark_mfcc import best_of
+from create_test_audio import CORPUS_DIR, CORPUS_FORMATS, create_corpus, generate_test_tone
+from mfcc_engine import get_engine
+
+STAGES = ("decode", "resample", "normalize", "mfcc", "mean_pool", "batch")
+# librosa res_type values; kaiser_* need resampy and are reported as skipped without it
+RES_TYPES = ("soxr_hq", "soxr_mq", "soxr_qq", "polyphase", "fft", "kaiser_fast")
+# Rates uploads arrive at before resampling: Opus/WebM decodes at 48 kHz, CD audio is 44.1 kHz
+SOURCE_RATES = (48000, 44100)
+
+
+def peak_kb(fn):
+    """Peak Python-heap allocation of one call, in KB. numpy buffers are
+    included; memory held inside native decoders (FFmpeg, soxr) is not.
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def measure(stage, params, audio_seconds, fn, repeats):
+    """One benchmark case: warm up, best-of timing, then a separate traced run for memory"""
+    try:
+        fn()  # numba JIT, FFT plans and filter banks are built on first use
+    except Exception as e:
+        # e.g. kaiser_* without resampy, or librosa.load on WebM without ffmpeg
+        reason = (str(e).strip().splitlines() or [""])[0]
+        return {"stage": stage, "params": params,
+                "skipped": f"{type(e).__name__}: {reason}" if reason else type(e).__name__}
+    best, _ = best_of(fn, repeats)
+    return {
+        "stage": stage,
+        "params": params,
+        "audio_seconds": audio_seconds,
+        "best_ms": best * 1000,
+        "ns_per_audio_second": best * 1e9 / audio_seconds,
+        "peak_kb": peak_kb(fn),
+    }
+
+
+def librosa_load(path, sr):
+    with warnings.catch_warnings():
+        # librosa warns each time it falls back from soundfile to audioread
+        warnings.simplefilter("ignore")
+        return librosa.load(path, sr=sr)
+
+
+def decode_cases(args):
+    paths = create_corpus(args.corpus_dir, args.durations, args.formats)
+    # create_corpus returns one path per (duration, format), durations outermost
+    for path, (duration, fmt) in zip(paths, itertools.product(args.durations, args.formats)):
+        data = open(path, "rb").read()
+        for sr in args.sr:
+            # What app.py uses first, then the librosa.load fallback it drops to
+            yield ("decode", {"format": fmt, "duration": duration, "sr": sr, "loader": "in_memory"}, duration,
+                   lambda data=data, sr=sr: decode_in_memory(data, sr=sr))
+            yield ("decode", {"format": fmt, "duration": duration, "sr": sr, "loader": "librosa_load"}, duration,
+                   lambda path=path, sr=sr: librosa_load(path, sr))
+            # Only the window /predict uses, as extract_features_from_bytes decodes it;
+            # normalized by the seconds in that window, not the whole clip
+            window = min(DURATION, duration - OFFSET)
+            if window <= 0:
+                continue
+            yield ("decode", {"format": fmt, "duration": duration, "sr": sr, "loader": "window"}, window,
+                   lambda data=data, sr=sr: decode_in_memory(data, sr=sr, offset=OFFSET, duration=DURATION))
+
+
+def resample_cases(args):
+    for source_sr in SOURCE_RATES:
+        for duration in args.durations:
+            y = generate_test_tone(duration, source_sr, seed=0)
+            for sr in args.sr:
+                for res_type in args.res_types:
+                    yield ("resample", {"from_sr": source_sr, "sr": sr, "res_type": res_type, "duration": duration},
+                           duration, lambda y=y, s=source_sr, sr=sr, r=res_type:
+                           librosa.resample(y, orig_sr=s, target_sr=sr, res_type=r))
+
+
+def normalize_cases(args):
+    for sr in args.sr:
+        for duration in args.durations:
+            y = generate_test_tone(duration, sr, seed=0)
+            yield ("normalize", {"sr": sr, "duration": duration}, duration,
+                   lambda y=y: librosa.util.normalize(y))
+
+
+def mfcc_cases(args):
+    for sr in args.sr:
+        for duration in args.durations:
+            y = generate_test_tone(duration, sr, seed=0)
+            for n_fft, hop in args.stft:
+                params = {"sr": sr, "duration": duration, "n_fft": n_fft, "hop_length": hop}
+                yield ("mfcc", dict(params, impl="librosa"), duration,
+                       lambda y=y, sr=sr, n_fft=n_fft, hop=hop: librosa.feature.mfcc(
+                           y=y, sr=sr, n_mfcc=args.n_mfcc, n_fft=n_fft, hop_length=hop))
+                engine = get_engine(sr=sr, n_mfcc=args.n_mfcc, n_fft=n_fft, hop_length=hop)
+                yield ("mfcc", dict(params, impl="engine"), duration, lambda y=y, engine=engine: engine.mfcc(y))
+
+
+def mean_pool_cases(args):
+    for sr in args.sr:
+        for duration in args.durations:
+            mfcc = librosa.feature.mfcc(y=generate_test_tone(duration, sr, seed=0), sr=sr, n_mfcc=args.n_mfcc)
+            yield ("mean_pool", {"sr": sr, "duration": duration}, duration,
+                   lambda mfcc=mfcc: np.mean(mfcc.T, axis=0))
+
+
+def batch_cases(args):
+    for sr in args.sr:
+        engine = get_engine(sr=sr, n_mfcc=args.n_mfcc)
+        for duration in args.durations:
+            for batch_size in args.batch_sizes:
+                batch = np.stack([generate_test_tone(duration, sr, seed=i) for i in range(batch_size)])
+                yield ("batch", {"sr": sr, "duration": duration, "batch_size": batch_size}, duration * batch_size,
+                       lambda batch=batch, engine=engine: engine.mean_mfcc_batch(batch))
+
+
+CASES = {
+    "decode": decode_cases,
+    "resample": resample_cases,
+    "normalize": normalize_cases,
+    "mfcc": mfcc_cases,
+    "mean_pool": mean_pool_cases,
+    "batch": batch_cases,
+}
+
+
+def case_key(case):
+    return case["stage"] + " " + " ".join(f"{k}={v}" for k, v in sorted(case["params"].items()))
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    """Print cases more than ``tolerance`` slower per audio-second than the baseline; returns how many"""
+    with open(baseline_path) as f:
+        baseline = {case_key(c): c for c in json.load(f)["results"] if "ns_per_audio_second" in c}
+    regressions = []
+    for case in results:
+        before = baseline.get(case_key(case))
+        if before is None or "ns_per_audio_second" not in case:
+            continue
+        ratio = case["ns_per_audio_second"] / before["ns_per_audio_second"]
+        if ratio > 1.0 + tolerance:
+            regressions.append((ratio, case_key(case)))
+    print(f"\n{len(regressions)} regression(s) over {tolerance:.0%} against {baseline_path}")
+    for ratio, key in sorted(regressions, reverse=True):
+        print(f"  {ratio:5.2f}x  {key}")
+    return len(regressions)
+
+
+def parse_stft(value):
+    n_fft, hop = value.split(":")
+    return int(n_fft), int(hop)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Microbenchmark decode, resampling, normalization, MFCC and mean pooling "
+                    "in ns per second of audio, with peak memory"
+    )
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--sr", type=int, nargs="+", default=[16000, 22050], help="target sample rates")
+    parser.add_argument("--durations", type=float, nargs="+", default=[1.0, 3.0, 10.0], help="clip lengths in seconds")
+    parser.add_argument("--formats", nargs="+", default=list(CORPUS_FORMATS), choices=CORPUS_FORMATS)
+    parser.add_argument("--corpus-dir", default=CORPUS_DIR)
+    parser.add_argument("--res-types", nargs="+", default=list(RES_TYPES))
+    parser.add_argument("--stft", type=parse_stft, nargs="+", default=[(2048, 512), (1024, 256), (512, 128)],
+                        help="n_fft:hop_length pairs for the MFCC stage")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--n-mfcc", type=int, default=40)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results JSON from an earlier commit to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="slowdown per audio-second reported as a regression (default 15%%)")
+    args = parser.parse_args()
+
+    print(f"{'case':<78} {'ms':>9} {'ns/audio-s':>12} {'peak KB':>9}")
+    results = []
+    for stage in args.stages:
+        for name, params, audio_seconds, fn in CASES[stage](args):
+            case = measure(name, params, audio_seconds, fn, args.repeats)
+            results.append(case)
+            if "skipped" in case:
+                print(f"{case_key(case):<78} skipped: {case['skipped'][:60]}")
+            else:
+                print(f"{case_key(case):<78} {case['best_ms']:>9.2f} {case['ns_per_audio_second']:>12.0f} "
+                      f"{case['peak_kb']:>9.0f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "host": {"machine": platform.machine(), "cpus": os.cpu_count(), "python": platform.python_version(),
+                         "numpy": np.__version__, "librosa": librosa.__version__},
+                "repeats": args.repeats,
+                "results": results,
+            }, f, indent=2)
+        print(f"\nResults saved to {args.json}")
+    if args.baseline and compare(results, args.baseline, args.tolerance):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
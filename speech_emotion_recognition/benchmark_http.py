@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+import numpy as np
+
+from create_test_audio import CORPUS_DIR, CORPUS_DURATIONS, CORPUS_FORMATS, create_corpus
+from load_test import summarize
+from serve_prefork import memory_mb
+
+DEFAULT_URL = "http://127.0.0.1:5000/predict"
+MEMORY_SAMPLE_SECONDS = 0.5
+
+
+def find_server_pids(port):
+    """Pids holding the listening socket on ``port`` (every worker of a pre-fork server), Linux only"""
+    inodes = set()
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    if fields[3] == "0A" and int(fields[1].rsplit(":", 1)[1], 16) == port:
+                        inodes.add(f"socket:[{fields[9]}]")
+        except OSError:
+            pass
+    pids = []
+    for pid in filter(str.isdigit, os.listdir("/proc") if inodes else []):
+        try:
+            fds = os.listdir(f"/proc/{pid}/fd")
+            if any(os.readlink(f"/proc/{pid}/fd/{fd}") in inodes for fd in fds):
+                pids.append(int(pid))
+        except OSError:
+            continue
+    return pids
+
+
+async def send(session, url, clip, results, began=None):
+    """Post one clip; latency counts from ``began`` (its scheduled time) when given"""
+    name, data = clip
+    form = aiohttp.FormData()
+    form.add_field("audio", data, filename=name)
+    t0 = began if began is not None else time.perf_counter()
+    try:
+        async with session.post(url, data=form) as response:
+            body = await response.json(content_type=None)
+        ok = response.status == 200 and body.get("success", False)
+    except (aiohttp.ClientError, ValueError, asyncio.TimeoutError):
+        ok = False
+    results[name]["latencies" if ok else "errors"].append(time.perf_counter() - t0)
+
+
+async def closed_loop(session, url, clips, concurrency, seconds, results):
+    """``concurrency`` clients each send their next request as soon as the last one returns"""
+    deadline = time.perf_counter() + seconds
+
+    async def client(i):
+        # Each client starts at a different clip and goes through all of them
+        n = i
+        while time.perf_counter() < deadline:
+            await send(session, url, clips[n % len(clips)], results)
+            n += 1
+
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+
+
+async def open_loop(session, url, clips, rate, seconds, results, max_outstanding, poisson=False):
+    """Requests arrive at ``rate`` per second whether or not earlier ones have returned.
+
+    Latency is measured from each request's scheduled arrival, so a server
+    that falls behind is charged for the queueing it causes. Arrivals that
+    find ``max_outstanding`` requests in flight are dropped and counted.
+    """
+    rng = np.random.default_rng(0)
+    began = time.perf_counter()
+    next_arrival, n, dropped = began, 0, 0
+    in_flight = set()
+    while next_arrival < began + seconds:
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_outstanding:
+            dropped += 1
+        else:
+            task = asyncio.create_task(send(session, url, clips[n % len(clips)], results, began=next_arrival))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        n += 1
+        next_arrival += rng.exponential(1.0 / rate) if poisson else 1.0 / rate
+    if in_flight:
+        await asyncio.wait(in_flight)
+    return dropped
+
+
+async def sample_memory(pids, samples):
+    """Record the servers' summed (RSS, PSS) in MB until cancelled"""
+    while True:
+        totals = [memory_mb(pid) for pid in pids]
+        samples.append((sum(r or 0.0 for r, _ in totals), sum(p or 0.0 for _, p in totals)))
+        await asyncio.sleep(MEMORY_SAMPLE_SECONDS)
+
+
+async def run_scenario(url, clips, mode, level, args, pids):
+    results = {name: {"latencies": [], "errors": []} for name, _ in clips}
+    samples = []
+    sampler = asyncio.create_task(sample_memory(pids, samples)) if pids else None
+    # One connection per concurrent request, as separate browsers would open
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector,
+                                     timeout=aiohttp.ClientTimeout(total=args.timeout)) as session:
+        t0 = time.perf_counter()
+        if mode == "closed":
+            await closed_loop(session, url, clips, level, args.seconds, results)
+            dropped = 0
+        else:
+            dropped = await open_loop(session, url, clips, level, args.seconds, results,
+                                      args.max_outstanding, args.poisson)
+        elapsed = time.perf_counter() - t0
+    if sampler is not None:
+        sampler.cancel()
+
+    merged = {"latencies": [x for r in results.values() for x in r["latencies"]],
+              "errors": [x for r in results.values() for x in r["errors"]]}
+    overall = summarize(merged, elapsed)
+    attempted = overall["requests"] + overall["errors"] + dropped
+    overall.update(dropped=dropped, error_rate=(overall["errors"] + dropped) / attempted if attempted else 0.0)
+    if samples:
+        overall["server_rss_mb_max"] = max(r for r, _ in samples)
+        overall["server_pss_mb_max"] = max(p for _, p in samples)
+    return {"mode": mode, "concurrency" if mode == "closed" else "rate_rps": level,
+            "seconds": elapsed, **overall,
+            "by_clip": {name: summarize(r, elapsed) for name, r in results.items()}}
+
+
+def print_row(scenario):
+    level = (f"{scenario['concurrency']} clients" if scenario["mode"] == "closed"
+             else f"{scenario['rate_rps']:g} req/s")
+    p = [f"{scenario[k]:>8.1f}" if scenario[k] is not None else f"{'-':>8}" for k in ("p50_ms", "p95_ms", "p99_ms")]
+    rss = scenario.get("server_rss_mb_max")
+    print(f"{scenario['mode']:<7} {level:<12} {scenario['throughput_rps']:>8.1f} {' '.join(p)} "
+          f"{scenario['error_rate'] * 100:>6.1f}% {rss if rss is not None else float('nan'):>8.0f}")
+
+
+async def run_all(url, clips, args, pids):
+    scenarios = [("closed", c) for c in args.concurrency] + [("open", r) for r in args.rates]
+    report = []
+    print(f"\n{'mode':<7} {'load':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'RSS MB':>8}")
+    for mode, level in scenarios:
+        scenario = await run_scenario(url, clips, mode, level, args, pids)
+        print_row(scenario)
+        report.append(scenario)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark /predict over a synthetic WAV/WebM/MP3/MP4 corpus at fixed concurrency "
+                    "and fixed arrival rates. Run it against app.py (or async_server.py, serve_prefork.py) "
+                    "and against simple_demo.py to separate HTTP overhead from ML cost. Start ML servers "
+                    "with SER_CACHE_MAX_ENTRIES=0 so repeated uploads are not served from the cache."
+    )
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--label", help="name for this server in the results, e.g. app or simple_demo")
+    parser.add_argument("--corpus-dir", default=CORPUS_DIR)
+    parser.add_argument("--formats", nargs="+", default=list(CORPUS_FORMATS), choices=CORPUS_FORMATS)
+    parser.add_argument("--durations", nargs="+", type=float, default=list(CORPUS_DURATIONS),
+                        help="clip lengths in seconds")
+    parser.add_argument("--concurrency", nargs="*", type=int, default=[1, 4, 16],
+                        help="closed-loop client counts")
+    parser.add_argument("--rates", nargs="*", type=float, default=[2.0, 5.0, 10.0],
+                        help="open-loop arrival rates in requests per second")
+    parser.add_argument("--poisson", action="store_true", help="exponential rather than evenly spaced arrivals")
+    parser.add_argument("--max-outstanding", type=int, default=256,
+                        help="open-loop requests in flight before further arrivals are dropped")
+    parser.add_argument("--seconds", type=float, default=20.0, help="length of each scenario")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--server-pid", nargs="*", type=int,
+                        help="server processes to sample RSS from (default: whoever listens on the URL's port)")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    paths = create_corpus(args.corpus_dir, args.durations, args.formats)
+    clips = [(os.path.basename(path), open(path, "rb").read()) for path in paths]
+    parsed = urlparse(args.url)
+    pids = args.server_pid if args.server_pid is not None else find_server_pids(parsed.port or 80)
+    label = args.label or f"{parsed.hostname}:{parsed.port}"
+    print(f"Benchmarking {label} ({args.url}) with {len(clips)} clips from {args.corpus_dir}, "
+          f"{args.seconds:.0f}s per scenario; server pids {pids or 'unknown'}")
+
+    scenarios = asyncio.run(run_all(args.url, clips, args, pids))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "label": label,
+                "url": args.url,
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "host": {"machine": platform.machine(), "cpus": os.cpu_count(), "python": platform.python_version()},
+                "corpus": {name: len(data) for name, data in clips},
+                "server_pids": pids,
+                "scenarios": scenarios,
+            }, f, indent=2)
+        print(f"\nResults saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
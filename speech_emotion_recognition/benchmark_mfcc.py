@@ -0,0 +1,60 @@
+import argparse
+import time
+
+import librosa
+import numpy as np
+
+from mfcc_engine import get_engine
+
+
+def librosa_mean_mfcc(batch, sr, n_mfcc):
+    """The per-file path every script used: one librosa call per clip"""
+    return np.array([
+        np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc).T, axis=0)
+        for y in batch
+    ])
+
+
+def best_of(fn, repeats):
+    """Best wall-clock time of ``repeats`` runs, plus the last result"""
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched MFCC extraction against librosa")
+    parser.add_argument("--sr", type=int, nargs="+", default=[16000, 22050])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 128])
+    parser.add_argument("--duration", type=float, default=3.0, help="clip length in seconds")
+    parser.add_argument("--n-mfcc", type=int, default=40)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'sr':>6} {'batch':>6} {'librosa ms':>11} {'engine ms':>10} {'speedup':>8} {'max abs diff':>13}")
+
+    for sr in args.sr:
+        engine = get_engine(sr=sr, n_mfcc=args.n_mfcc)
+        n_samples = int(args.duration * sr)
+        for batch_size in args.batch_sizes:
+            batch = (0.1 * rng.standard_normal((batch_size, n_samples))).astype(np.float32)
+
+            # librosa compiles numba kernels on first use; keep that out of the timing
+            librosa_mean_mfcc(batch[:1], sr, args.n_mfcc)
+            engine.mean_mfcc_batch(batch[:1])
+
+            t_ref, ref = best_of(lambda: librosa_mean_mfcc(batch, sr, args.n_mfcc), args.repeats)
+            t_eng, out = best_of(lambda: engine.mean_mfcc_batch(batch), args.repeats)
+            diff = float(np.abs(ref - out).max())
+
+            print(f"{sr:>6} {batch_size:>6} {t_ref * 1000:>11.1f} {t_eng * 1000:>10.1f} "
+                  f"{t_ref / t_eng:>7.2f}x {diff:>13.2e}")
+
+
+if __name__ == "__main__":
+    main()
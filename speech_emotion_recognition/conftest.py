@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules are flat scripts next to this file; tests import them by name
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# A command-line format checker, not a pytest module
+collect_ignore = ["test_audio_formats.py"]
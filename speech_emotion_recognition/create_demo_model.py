@@ -4,6 +4,9 @@ from tensorflow.keras.layers import Dense, Dropout
 from tensorflow.keras.utils import to_categorical
 import os
 
+from audio_features import SERVING_SPEC
+from model_registry import save_model_metadata
+
 # Create some dummy data for demonstration
 print("Creating demo model with synthetic data...")
 
@@ -52,6 +55,8 @@ history = model.fit(
 
 # Save the model
 model.save("model/emotion_model.h5")
+save_model_metadata("model/emotion_model.h5", ["Angry", "Happy", "Sad", "Neutral"],
+                    name="emotion_4class", input_shape=model.input_shape[1:], feature_spec=SERVING_SPEC)
 print("Demo model saved successfully!")
 
 # Test the model
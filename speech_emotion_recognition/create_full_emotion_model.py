@@ -4,6 +4,9 @@ from tensorflow.keras.layers import Dense, Dropout, Conv1D, LSTM, MaxPooling1D
 from tensorflow.keras.utils import to_categorical
 import os
 
+from audio_features import SERVING_SPEC
+from model_registry import save_model_metadata
+
 def create_full_emotion_model():
     """Create a model that supports all 7 RAVDESS emotions"""
     
@@ -82,6 +85,9 @@ def create_full_emotion_model():
     
     # Save model
     model.save("model/emotion_model_7class.h5")
+    save_model_metadata("model/emotion_model_7class.h5", emotions,
+                        name="emotion_7class", input_shape=model.input_shape[1:],
+                        feature_spec=SERVING_SPEC)
     print(f"\nModel saved as emotion_model_7class.h5")
     
     # Test prediction
@@ -3,13 +3,25 @@ import librosa
 import soundfile as sf
 import os
 
-def create_test_audio():
-    """Create a simple test audio file for demonstration"""
-    
-    # Create a simple sine wave (like a tone)
-    duration = 3  # seconds
-    sample_rate = 22050
-    frequency = 440  # A4 note
+try:
+    import av
+except ImportError:
+    av = None
+
+# Compressed formats the browser recorder and typical uploads produce:
+# extension -> (container, encoder, sample rate the encoder expects)
+ENCODERS = {
+    "webm": ("webm", "libopus", 48000),
+    "mp3": ("mp3", "libmp3lame", 22050),
+    "mp4": ("mp4", "aac", 22050),
+}
+CORPUS_DIR = "benchmark_corpus"
+CORPUS_FORMATS = ("wav", "webm", "mp3", "mp4")
+CORPUS_DURATIONS = (1, 3, 10, 30)
+
+def generate_test_tone(duration=3, sample_rate=22050, frequency=440, seed=None):
+    """Synthetic speech-like tone: a harmonic pair with noise and a decay envelope"""
+    rng = np.random.default_rng(seed)
     
     # Generate time array
     t = np.linspace(0, duration, int(sample_rate * duration))
@@ -19,11 +31,61 @@ def create_test_audio():
     
     # Add some variation to make it more speech-like
     audio += np.sin(2 * np.pi * frequency * 2 * t) * 0.1
-    audio += np.random.normal(0, 0.05, len(audio))  # Add some noise
+    audio += rng.normal(0, 0.05, len(audio))  # Add some noise
     
     # Apply envelope to make it more natural
     envelope = np.exp(-t * 0.5)  # Decay envelope
-    audio = audio * envelope
+    return (audio * envelope).astype(np.float32)
+
+def write_clip(path, audio, sample_rate):
+    """Save mono float audio as WAV, or encode it in-process with PyAV for WebM/Opus, MP3 and MP4/AAC"""
+    fmt = os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt == "wav":
+        sf.write(path, audio, sample_rate)
+        return
+    if av is None:
+        raise RuntimeError(f"PyAV is needed to write {fmt} clips")
+    container_format, codec, rate = ENCODERS[fmt]
+    with av.open(path, "w", format=container_format) as container:
+        stream = container.add_stream(codec, rate=rate, layout="mono")
+        frame = av.AudioFrame.from_ndarray(np.ascontiguousarray(audio, dtype=np.float32).reshape(1, -1),
+                                           format="flt", layout="mono")
+        frame.sample_rate = sample_rate
+        # Convert to the encoder's rate, sample format and fixed frame size
+        resampler = av.AudioResampler(format=stream.codec_context.format, layout="mono", rate=rate,
+                                      frame_size=stream.codec_context.frame_size or None)
+        for chunk in resampler.resample(frame) + resampler.resample(None):
+            container.mux(stream.encode(chunk))
+        container.mux(stream.encode(None))
+
+
+def create_corpus(out_dir, durations=CORPUS_DURATIONS, formats=CORPUS_FORMATS, sample_rate=22050):
+    """Write one synthetic clip per format and duration; returns the paths.
+
+    Clips that already exist are reused, so repeated benchmark runs send the same bytes.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for duration in durations:
+        audio = None
+        for fmt in formats:
+            path = os.path.join(out_dir, f"tone_{duration:g}s.{fmt}")
+            if not os.path.exists(path):
+                if audio is None:
+                    audio = generate_test_tone(duration, sample_rate, seed=int(duration * 1000))
+                write_clip(path, audio, sample_rate)
+            paths.append(path)
+    return paths
+
+def create_test_audio():
+    """Create a simple test audio file for demonstration"""
+    
+    # Create a simple sine wave (like a tone)
+    duration = 3  # seconds
+    sample_rate = 22050
+    frequency = 440  # A4 note
+    
+    audio = generate_test_tone(duration, sample_rate, frequency)
     
     # Save as WAV file
     output_file = "test_audio.wav"
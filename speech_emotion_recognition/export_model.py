@@ -0,0 +1,346 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from feature_spec import FeatureSpec
+from inference_backends import exported_model_path, load_backend
+
+MODEL_PATH = "model/emotion_model_7class.h5"
+FEATURES_PATH = "features"  # shards written by Preprocess.py; must match the model's feature spec
+CALIBRATION_SAMPLES = 500
+EVAL_SAMPLES = 1000
+LATENCY_RUNS = 200
+BATCH_SIZE = 32
+TFLITE_BATCH_SIZE = 1
+
+
+def load_model_spec(model_path):
+    """The feature spec the model is served with: its sidecar's, or the runtime's for older sidecars"""
+    from model_registry import metadata_path
+
+    declared = None
+    if os.path.exists(metadata_path(model_path)):
+        with open(metadata_path(model_path)) as f:
+            declared = json.load(f).get("feature_spec")
+    if declared is None:
+        from audio_features import SERVING_SPEC
+
+        print(f"{model_path} has no feature_spec in its sidecar; assuming the runtime's")
+        return SERVING_SPEC
+    return FeatureSpec.from_dict(declared)
+
+
+def check_feature_config(path, config, spec):
+    """``ValueError`` unless features extracted with ``config`` are what the model sees when served"""
+    differences = FeatureSpec.from_config(config).differences(FeatureSpec.from_config(spec.to_config()))
+    if differences:
+        summary = ", ".join(f"{field}={found} (model {wanted})" for field, (found, wanted) in differences.items())
+        raise ValueError(f"{path} was extracted with another feature spec: {summary}; "
+                         "re-extract it with the model's spec or pass --features")
+
+
+def load_cached_features(path, n_features, spec):
+    """Feature rows extracted with ``spec`` from a shard directory, a FeatureStore database or a .npy array.
+
+    Calibrating or measuring drift on features the model is never served
+    with says nothing about serving, so shards with another spec are refused
+    and only the database rows extracted with ``spec`` are read. A bare .npy
+    records no spec and is taken on trust.
+    """
+    if os.path.isdir(path):
+        from feature_shards import ShardedDataset
+
+        dataset = ShardedDataset(path)
+        check_feature_config(path, dataset.feature_config, spec)
+        X, _ = dataset.take(np.arange(len(dataset)))
+    elif path.endswith(".db"):
+        from feature_store import config_key
+
+        with sqlite3.connect(path) as conn:
+            rows = conn.execute("SELECT features FROM features WHERE config = ?",
+                                (config_key(spec.to_config()),)).fetchall()
+        if not rows:
+            raise ValueError(f"{path} has no features extracted with the model's feature spec")
+        X = np.array([np.frombuffer(r[0], dtype=np.float32) for r in rows
+                      if len(r[0]) == 4 * n_features], dtype=np.float32)
+    else:
+        print(f"{path} records no feature spec; assuming it matches the model's")
+        X = np.load(path).astype(np.float32)
+    X = X.reshape(len(X), -1)
+    if X.shape[1] != n_features:
+        raise ValueError(f"{path} holds {X.shape[1]}-dim features, the model expects {n_features}")
+    return X
+
+
+def _signature(model, batch_size=None):
+    import tensorflow as tf
+
+    shape = (batch_size,) + tuple(model.input_shape[1:])
+    return [tf.TensorSpec(shape, tf.float32, name="features")]
+
+
+def save_serving_model(model, directory, batch_size=None):
+    """Write an inference-only SavedModel whose serving signature has the given batch size"""
+    import tensorflow as tf
+
+    try:
+        model.export(directory, input_signature=_signature(model, batch_size), verbose=False)
+    except TypeError:
+        # Keras 2 has no input_signature on export(); save the signature directly
+        fn = tf.function(lambda features: model(features, training=False),
+                         input_signature=_signature(model, batch_size))
+        tf.saved_model.save(model, directory, signatures=fn)
+
+
+def export_tflite(model, out_path, quantize, calibration, batch_size=TFLITE_BATCH_SIZE):
+    """Convert to TFLite with a fixed batch size.
+
+    The LSTM layers only lower to TFLite's fused kernels when every shape is
+    static, so the batch dimension is fixed and ``TFLiteBackend`` splits or
+    pads larger batches to it. ``int8`` without calibration rows quantizes
+    the weights only (dynamic range).
+    """
+    import tensorflow as tf
+
+    with tempfile.TemporaryDirectory() as directory:
+        save_serving_model(model, directory, batch_size)
+        converter = tf.lite.TFLiteConverter.from_saved_model(directory)
+        if quantize == "float16":
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.target_spec.supported_types = [tf.float16]
+        elif quantize == "int8" and calibration is None:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        elif quantize == "int8":
+            rows = calibration.reshape((len(calibration),) + tuple(model.input_shape[1:]))
+            usable = len(rows) - len(rows) % batch_size
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.representative_dataset = lambda: (
+                [rows[i:i + batch_size]] for i in range(0, usable, batch_size)
+            )
+        tflite_model = converter.convert()
+    with open(out_path, "wb") as f:
+        f.write(tflite_model)
+
+
+def _export_calibrated_tflite(model_path, out_path, calibration, batch_size):
+    import tensorflow as tf
+
+    export_tflite(tf.keras.models.load_model(model_path), out_path, "int8", calibration, batch_size)
+
+
+def export_tflite_int8(model, model_path, out_path, calibration, batch_size=TFLITE_BATCH_SIZE):
+    """Calibrated full-integer int8, or weight-only int8 if calibration crashes.
+
+    The TFLite calibrator can segfault on LSTM layers, so the calibrated
+    conversion runs in its own process. Returns the mode that was written.
+    """
+    process = mp.get_context("spawn").Process(
+        target=_export_calibrated_tflite, args=(model_path, out_path, calibration, batch_size)
+    )
+    process.start()
+    process.join()
+    if process.exitcode == 0:
+        return "int8"
+    print(f"Calibrated int8 conversion failed (exit code {process.exitcode}), "
+          "falling back to dynamic-range int8 weights")
+    export_tflite(model, out_path, "int8", None, batch_size)
+    return "int8-dynamic"
+
+
+def export_onnx(model, out_path, quantize, calibration):
+    import tensorflow as tf
+    import tf2onnx
+
+    if quantize == "float16":
+        raise ValueError("float16 export is only supported for TFLite")
+
+    float_path = out_path if quantize in (None, "none") else out_path + ".float.onnx"
+    with tempfile.TemporaryDirectory() as directory:
+        # Converting the exported graph works for both Keras 2 and Keras 3 models
+        save_serving_model(model, directory)
+        # Keep the loaded object alive: the signature only references its variables
+        loaded = tf.saved_model.load(directory)
+        serving = loaded.signatures["serving_default"]
+        input_name = list(serving.structured_input_signature[1])[0]
+        fn = tf.function(lambda features: list(serving(**{input_name: features}).values())[0])
+        tf2onnx.convert.from_function(fn, input_signature=_signature(model), opset=13, output_path=float_path)
+
+    if quantize == "int8":
+        from onnxruntime.quantization import CalibrationDataReader, QuantType, quantize_static
+
+        import onnxruntime as ort
+
+        input_name = ort.InferenceSession(float_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+        rows = calibration.reshape((len(calibration),) + tuple(model.input_shape[1:]))
+
+        class Reader(CalibrationDataReader):
+            def __init__(self):
+                self._rows = iter(rows)
+
+            def get_next(self):
+                row = next(self._rows, None)
+                return None if row is None else {input_name: row[np.newaxis]}
+
+        quantize_static(float_path, out_path, Reader(),
+                        activation_type=QuantType.QInt8, weight_type=QuantType.QInt8)
+        os.unlink(float_path)
+
+
+def _rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(backend, model_path, X, num_threads, results):
+    """Runs in a fresh process so RSS covers only this backend's imports and model"""
+    rss_before = _rss_mb()
+    t0 = time.perf_counter()
+    runner = load_backend(backend, model_path, num_threads=num_threads)
+    load_s = time.perf_counter() - t0
+    predictions = np.concatenate([runner.predict_batch(X[i:i + BATCH_SIZE])
+                                  for i in range(0, len(X), BATCH_SIZE)])
+
+    single = []
+    for i in range(LATENCY_RUNS):
+        t0 = time.perf_counter()
+        runner.predict_batch(X[i % len(X)][np.newaxis])
+        single.append(time.perf_counter() - t0)
+    batch = X[:BATCH_SIZE]
+    runner.predict_batch(batch)
+    batched = []
+    for _ in range(max(1, LATENCY_RUNS // 10)):
+        t0 = time.perf_counter()
+        runner.predict_batch(batch)
+        batched.append(time.perf_counter() - t0)
+
+    results.put({
+        "predictions": predictions,
+        "load_s": load_s,
+        "single_p50_ms": float(np.percentile(single, 50) * 1000),
+        "single_p95_ms": float(np.percentile(single, 95) * 1000),
+        "batch_ms": float(np.median(batched) * 1000),
+        "rss_mb": _rss_mb(),
+        "rss_added_mb": _rss_mb() - rss_before,
+    })
+
+
+def measure(backend, model_path, X, num_threads=None):
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(target=_measure, args=(backend, model_path, X, num_threads, results))
+    process.start()
+    while True:
+        try:
+            result = results.get(timeout=1.0)
+            break
+        except queue.Empty:
+            if not process.is_alive():
+                raise RuntimeError(f"Measuring {backend} failed (exit code {process.exitcode})")
+    process.join()
+    return result
+
+
+def drift(reference, predictions):
+    """How far an exported model's outputs are from the Keras model's"""
+    diff = np.abs(reference - predictions)
+    return {
+        "top1_agreement": float(np.mean(reference.argmax(1) == predictions.argmax(1))),
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a Keras model to TFLite/ONNX and compare it")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--format", nargs="+", choices=("tflite", "onnx"), default=["tflite"])
+    parser.add_argument("--quantize", nargs="+", choices=("none", "float16", "int8"), default=["none"])
+    parser.add_argument("--features", default=FEATURES_PATH,
+                        help="features extracted with the model's feature spec, for calibration and drift: "
+                             "shard dir, features.db or .npy")
+    parser.add_argument("--calibration-samples", type=int, default=CALIBRATION_SAMPLES)
+    parser.add_argument("--eval-samples", type=int, default=EVAL_SAMPLES)
+    parser.add_argument("--tflite-batch-size", type=int, default=TFLITE_BATCH_SIZE,
+                        help="fixed batch size of TFLite exports; smaller batches are zero-padded")
+    parser.add_argument("--threads", type=int, default=1, help="inference threads while measuring")
+    args = parser.parse_args()
+
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(args.model)
+    n_features = int(np.prod(model.input_shape[1:]))
+
+    X = load_cached_features(args.features, n_features, load_model_spec(args.model))
+    rng = np.random.default_rng(0)
+    X = X[rng.permutation(len(X))]
+    # Calibrate and evaluate on disjoint rows when there are enough of them
+    calibration = X[:args.calibration_samples]
+    evaluation = X[args.calibration_samples:][:args.eval_samples]
+    if len(evaluation) < BATCH_SIZE:
+        evaluation = X[:args.eval_samples]
+    print(f"Features: {len(calibration)} for calibration, {len(evaluation)} for evaluation")
+
+    exported = []
+    for fmt in args.format:
+        for quantize in args.quantize:
+            out_path = exported_model_path(args.model, fmt, quantize)
+            try:
+                if fmt == "tflite" and quantize == "int8":
+                    quantize = export_tflite_int8(model, args.model, out_path, calibration,
+                                                  args.tflite_batch_size)
+                elif fmt == "tflite":
+                    export_tflite(model, out_path, quantize, calibration, args.tflite_batch_size)
+                else:
+                    export_onnx(model, out_path, quantize, calibration)
+            except Exception as e:
+                print(f"Skipping {fmt}/{quantize}: {e}")
+                continue
+            print(f"Wrote {out_path} ({os.path.getsize(out_path) / 1024:.1f} KB)")
+            exported.append((fmt, quantize, out_path))
+
+    print("\nMeasuring (each backend in a fresh process)...")
+    reference = measure("keras", args.model, evaluation, args.threads)
+    rows = [("keras", "none", args.model, reference, None)]
+    for fmt, quantize, out_path in exported:
+        result = measure(fmt, out_path, evaluation, args.threads)
+        rows.append((fmt, quantize, out_path, result, drift(reference["predictions"], result["predictions"])))
+
+    report = []
+    print(f"\n{'backend':<8} {'quant':<12} {'size KB':>8} {'top-1 agree':>11} {'max diff':>9} "
+          f"{'1-row p50':>10} {'batch32':>9} {'RSS MB':>8}")
+    for fmt, quantize, path, result, d in rows:
+        agree = f"{d['top1_agreement'] * 100:.1f}%" if d else "-"
+        max_diff = f"{d['max_abs_diff']:.4f}" if d else "-"
+        print(f"{fmt:<8} {quantize:<12} {os.path.getsize(path) / 1024:>8.1f} {agree:>11} {max_diff:>9} "
+              f"{result['single_p50_ms']:>8.3f}ms {result['batch_ms']:>7.3f}ms {result['rss_mb']:>8.0f}")
+        report.append({
+            "backend": fmt, "quantize": quantize, "path": path,
+            "size_bytes": os.path.getsize(path),
+            **{k: v for k, v in result.items() if k != "predictions"},
+            "drift": d,
+        })
+
+    report_path = os.path.splitext(args.model)[0] + ".export_report.json"
+    with open(report_path, "w") as f:
+        json.dump({"model": args.model, "eval_samples": len(evaluation), "results": report}, f, indent=2)
+    print(f"\nReport saved to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_cache_key(audio_bytes, feature_params, model_id):
+    """Build a content-addressed key from the upload bytes, feature settings and model"""
+    digest = hashlib.sha256(audio_bytes)
+    params = ";".join(f"{name}={feature_params[name]}" for name in sorted(feature_params))
+    digest.update(b"\0" + params.encode("utf-8"))
+    digest.update(b"\0" + str(model_id).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CacheEntry:
+    """Cached MFCC vector and probability vector for one clip"""
+
+    __slots__ = ("features", "probabilities", "expires_at")
+
+    def __init__(self, features, probabilities, expires_at):
+        self.features = features
+        self.probabilities = probabilities
+        self.expires_at = expires_at
+
+
+class FeatureCache:
+    """Thread-safe LRU cache with size and TTL eviction.
+
+    Entries are dropped once the cache holds more than ``max_entries`` items
+    (least recently used first) or once they are older than ``ttl_seconds``.
+    A ``max_entries`` of 0 disables caching.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600.0):
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached entry for ``key`` or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, features, probabilities):
+        """Store the features and probabilities computed for ``key``"""
+        if self.max_entries <= 0:
+            return
+        entry = CacheEntry(features, probabilities, time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters for diagnostics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,195 @@
+import json
+import os
+
+import numpy as np
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+
+
+class ShardWriter:
+    """Write features as fixed-size .npy shards plus a label array and manifest.
+
+    Pooled features go to ``features_XXXXX.npy`` as (count, n_features)
+    arrays. When frame-level MFCCs are added they go to ``frames_XXXXX.npy``
+    as (count, n_frames, n_mfcc) arrays with matching row offsets. The
+    manifest records per-shard offsets and the feature configuration so a
+    reader never has to open a shard to know where a row lives.
+    """
+
+    def __init__(self, out_dir, feature_config, dtype="float32", shard_size=4096):
+        if np.dtype(dtype) not in (np.dtype("float16"), np.dtype("float32")):
+            raise ValueError("Shard dtype must be float16 or float32")
+
+        self.out_dir = out_dir
+        self.feature_config = feature_config
+        self.dtype = np.dtype(dtype)
+        self.shard_size = int(shard_size)
+
+        self._features = []
+        self._frames = []
+        self._labels = []
+        self._buffered = 0
+        self._written_labels = []
+        self._shards = []
+        self._frame_shards = []
+        self._n_samples = 0
+        self._n_features = None
+        self._frame_shape = None
+
+        os.makedirs(out_dir, exist_ok=True)
+
+    def add_batch(self, features, labels, frames=None):
+        """Append a batch of rows; ``frames`` is optional but must be given for every batch or none"""
+        features = np.asarray(features)
+        labels = np.asarray(labels)
+        if len(features) != len(labels):
+            raise ValueError("features and labels must have the same length")
+        if self._n_features is None:
+            self._n_features = features.shape[1]
+        if frames is not None:
+            frames = np.asarray(frames)
+            if self._frame_shape is None:
+                self._frame_shape = frames.shape[1:]
+        if (frames is None) != (self._frame_shape is None) or (frames is not None and len(frames) != len(features)):
+            raise ValueError("frames must be given for every row or for none")
+
+        start = 0
+        while start < len(features):
+            take = min(self.shard_size - self._buffered, len(features) - start)
+            self._features.append(features[start:start + take])
+            self._labels.append(labels[start:start + take])
+            if frames is not None:
+                self._frames.append(frames[start:start + take])
+            self._buffered += take
+            start += take
+            if self._buffered == self.shard_size:
+                self._flush()
+
+    def close(self):
+        """Flush the last partial shard and write ``labels.npy`` and the manifest"""
+        self._flush()
+        labels = np.concatenate(self._written_labels) if self._written_labels else np.zeros(0, dtype=np.int64)
+        np.save(os.path.join(self.out_dir, "labels.npy"), labels)
+
+        manifest = {
+            "version": FORMAT_VERSION,
+            "dtype": self.dtype.name,
+            "n_samples": self._n_samples,
+            "n_features": self._n_features,
+            "feature_config": self.feature_config,
+            "labels": "labels.npy",
+            "shards": self._shards,
+            "frames": None if self._frame_shape is None else {
+                "shape": list(self._frame_shape),
+                "shards": self._frame_shards,
+            },
+        }
+        with open(os.path.join(self.out_dir, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def _flush(self):
+        if not self._buffered:
+            return
+        index = len(self._shards)
+        offset = self._n_samples
+        count = self._buffered
+
+        name = f"features_{index:05d}.npy"
+        np.save(os.path.join(self.out_dir, name), np.concatenate(self._features).astype(self.dtype))
+        self._shards.append({"file": name, "offset": offset, "count": count})
+
+        if self._frames:
+            frame_name = f"frames_{index:05d}.npy"
+            np.save(os.path.join(self.out_dir, frame_name), np.concatenate(self._frames).astype(self.dtype))
+            self._frame_shards.append({"file": frame_name, "offset": offset, "count": count})
+
+        self._written_labels.append(np.concatenate(self._labels))
+        self._n_samples += count
+        self._features, self._frames, self._labels = [], [], []
+        self._buffered = 0
+
+
+def write_shards(out_dir, features, labels, feature_config, frames=None,
+                 dtype="float32", shard_size=4096):
+    """Write in-memory arrays to a sharded directory in one call"""
+    writer = ShardWriter(out_dir, feature_config, dtype=dtype, shard_size=shard_size)
+    writer.add_batch(features, labels, frames=frames)
+    return writer.close()
+
+
+class ShardedDataset:
+    """Read-only view over a sharded feature directory.
+
+    Every shard and the label array are opened with ``np.load(mmap_mode='r')``
+    so only the rows a batch touches are paged in. Rows are addressed by a
+    global index; ``take`` gathers them across shards and returns float32.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, MANIFEST_NAME)) as f:
+            self.manifest = json.load(f)
+        if self.manifest["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported shard format version: {self.manifest['version']}")
+
+        self.feature_config = self.manifest["feature_config"]
+        self.labels = np.load(os.path.join(root, self.manifest["labels"]), mmap_mode="r")
+        self._shards = [self._open(s) for s in self.manifest["shards"]]
+        self._offsets = np.array([s["offset"] for s in self.manifest["shards"]] + [len(self)], dtype=np.int64)
+
+        frames = self.manifest.get("frames")
+        self._frame_shards = [self._open(s) for s in frames["shards"]] if frames else None
+
+    def __len__(self):
+        return self.manifest["n_samples"]
+
+    @property
+    def n_features(self):
+        return self.manifest["n_features"]
+
+    @property
+    def has_frames(self):
+        return self._frame_shards is not None
+
+    def _open(self, shard):
+        return np.load(os.path.join(self.root, shard["file"]), mmap_mode="r")
+
+    def _gather(self, shards, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        # Reading in sorted order keeps page faults sequential within each shard
+        order = np.argsort(indices, kind="stable")
+        sorted_idx = indices[order]
+        shard_ids = np.searchsorted(self._offsets, sorted_idx, side="right") - 1
+
+        out = np.empty((len(indices),) + shards[0].shape[1:], dtype=np.float32)
+        for shard_id in np.unique(shard_ids):
+            mask = shard_ids == shard_id
+            local = sorted_idx[mask] - self._offsets[shard_id]
+            out[order[mask]] = shards[shard_id][local]
+        return out
+
+    def take(self, indices):
+        """Pooled features and labels for the given global row indices"""
+        indices = np.asarray(indices, dtype=np.int64)
+        return self._gather(self._shards, indices), np.asarray(self.labels[indices])
+
+    def take_frames(self, indices):
+        """Frame-level MFCC tensors for the given global row indices"""
+        if not self.has_frames:
+            raise ValueError("This dataset was written without frame-level features")
+        return self._gather(self._frame_shards, indices)
+
+    def batch_generator(self, indices, batch_size, shuffle=True, seed=None,
+                        transform=None, repeat=True):
+        """Yield ``(X, y)`` batches over ``indices``; ``transform`` may reshape or encode them"""
+        indices = np.asarray(indices, dtype=np.int64)
+        rng = np.random.default_rng(seed)
+        while True:
+            order = rng.permutation(indices) if shuffle else indices
+            for start in range(0, len(order), batch_size):
+                X, y = self.take(order[start:start + batch_size])
+                yield transform(X, y) if transform else (X, y)
+            if not repeat:
+                return
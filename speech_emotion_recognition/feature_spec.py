@@ -0,0 +1,104 @@
+import dataclasses
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+# Bumped when a field changes meaning; older sidecars are refused rather than misread
+SPEC_VERSION = 1
+
+# Poolings the serving path can produce: one mean MFCC vector per clip
+SERVING_POOLINGS = ("mean",)
+
+# Refuse models whose spec differs from the runtime's instead of serving them with their own
+STRICT = os.environ.get("SER_STRICT_FEATURE_SPEC", "0") == "1"
+
+# feature_store / Preprocess.py config keys and the spec fields they map to
+_CONFIG_KEYS = {
+    "sr": "sample_rate",
+    "offset": "offset",
+    "duration": "duration",
+    "trim": "trim",
+    "normalize": "normalize",
+    "fixed_duration": "fixed_duration",
+    "n_mfcc": "n_mfcc",
+    "pooling": "pooling",
+}
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """How a model's input features are computed from audio.
+
+    Training writes it into the model's sidecar (``save_model_metadata(...,
+    feature_spec=spec.to_dict())``) and serving decodes and extracts every
+    request for that model with it, so the two cannot drift apart. Frozen
+    and hashable: it is sent to decode worker processes and used in cache keys.
+    """
+
+    sample_rate: int = 22050
+    offset: float = 0.0  # seconds skipped at the start of the clip
+    duration: Optional[float] = None  # seconds decoded after the offset; None for the whole clip
+    trim: bool = False  # librosa.effects.trim leading and trailing silence
+    normalize: bool = False  # peak-normalize after trimming
+    fixed_duration: Optional[float] = None  # pad or cut to this many seconds before the MFCCs
+    n_mfcc: int = 40
+    n_fft: int = 2048
+    hop_length: int = 512
+    n_mels: int = 128
+    pooling: str = "mean"
+    res_type: str = "soxr_hq"  # librosa resampler, librosa.load's default
+    version: int = SPEC_VERSION
+
+    @classmethod
+    def from_dict(cls, data):
+        """Parse a sidecar's ``feature_spec``; ``ValueError`` for another version or unknown fields"""
+        version = data.get("version", SPEC_VERSION)
+        if version != SPEC_VERSION:
+            raise ValueError(f"Unsupported feature spec version {version} (this code reads {SPEC_VERSION})")
+        fields = {f.name for f in dataclasses.fields(cls)}
+        unknown = sorted(set(data) - fields)
+        if unknown:
+            raise ValueError(f"Unknown feature spec fields: {', '.join(unknown)}")
+        return cls(**data)
+
+    @classmethod
+    def from_config(cls, config, **overrides):
+        """The spec for a ``feature_store``-style config dict (``sr``, ``offset``, ``trim``, ...)"""
+        values = {field: config[key] for key, field in _CONFIG_KEYS.items() if config.get(key) is not None}
+        values.update(overrides)
+        return cls(**values)
+
+    def to_dict(self):
+        return dataclasses.asdict(self)
+
+    def to_config(self):
+        """The ``feature_store`` config dict that extracts these features offline"""
+        config = {key: getattr(self, field) for key, field in _CONFIG_KEYS.items()}
+        return {key: value for key, value in config.items() if value is not None}
+
+    def decode_seconds(self):
+        """Seconds after ``offset`` that can change the features, None for the whole clip.
+
+        ``duration`` when set; otherwise ``fixed_duration`` when neither trimming
+        nor normalization looks past the cut, so the rest need not be decoded.
+        """
+        if self.duration is not None:
+            return self.duration
+        if self.fixed_duration and not self.trim and not self.normalize:
+            return self.fixed_duration
+        return None
+
+    def differences(self, other):
+        """``{field: (self's value, other's value)}`` for every field that differs"""
+        return {f.name: (getattr(self, f.name), getattr(other, f.name))
+                for f in dataclasses.fields(self) if getattr(self, f.name) != getattr(other, f.name)}
+
+    def check_servable(self, n_features):
+        """``ValueError`` unless the serving path can produce this model's input from this spec"""
+        if self.pooling not in SERVING_POOLINGS:
+            raise ValueError(f"Feature spec pooling {self.pooling!r} cannot be served "
+                             f"(supported: {', '.join(SERVING_POOLINGS)})")
+        if self.n_mfcc != n_features:
+            raise ValueError(f"Feature spec gives {self.n_mfcc} MFCCs but the model takes {n_features} features")
+        if self.n_mfcc > self.n_mels:
+            raise ValueError(f"Feature spec asks for {self.n_mfcc} MFCCs from {self.n_mels} mel bands")
@@ -0,0 +1,191 @@
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import librosa
+import numpy as np
+
+from mfcc_engine import get_engine, mean_mfcc, mean_mfcc_batch
+
+DEFAULT_STORE_PATH = "features.db"
+
+
+def config_key(config):
+    """Stable string for a feature configuration; changing any field invalidates stored rows"""
+    return json.dumps(config, sort_keys=True, separators=(",", ":"))
+
+
+class FeatureStore:
+    """On-disk feature cache keyed by file path, mtime, size and feature config.
+
+    Rows live in a single SQLite table so that re-runs only need a stat()
+    per file to find out which clips are new or changed.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS features ("
+            " path TEXT NOT NULL,"
+            " config TEXT NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " features BLOB NOT NULL,"
+            " PRIMARY KEY (path, config))"
+        )
+        self._conn.commit()
+
+    def get(self, file_path, config, stat=None):
+        """Return the stored vector for ``file_path`` if it is still current, else None"""
+        stat = stat or os.stat(file_path)
+        row = self._conn.execute(
+            "SELECT mtime_ns, size, features FROM features WHERE path = ? AND config = ?",
+            (os.path.abspath(file_path), config_key(config)),
+        ).fetchone()
+        if row is None or row[0] != stat.st_mtime_ns or row[1] != stat.st_size:
+            return None
+        return np.frombuffer(row[2], dtype=np.float32)
+
+    def put_many(self, items, config):
+        """Store ``(file_path, stat, features)`` tuples in one transaction"""
+        key = config_key(config)
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO features (path, config, mtime_ns, size, features)"
+            " VALUES (?, ?, ?, ?, ?)",
+            [
+                (os.path.abspath(path), key, stat.st_mtime_ns, stat.st_size,
+                 np.asarray(features, dtype=np.float32).tobytes())
+                for path, stat, features in items
+            ],
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_signal(file_path, config):
+    """Load and condition one clip according to ``config``"""
+    audio, sr = librosa.load(
+        file_path,
+        sr=config["sr"],
+        offset=config.get("offset", 0.0),
+        duration=config.get("duration"),
+    )
+    if config.get("trim"):
+        audio, _ = librosa.effects.trim(audio)
+    if config.get("normalize"):
+        audio = librosa.util.normalize(audio)
+    if config.get("fixed_duration"):
+        audio = librosa.util.fix_length(audio, size=int(sr * config["fixed_duration"]))
+    return audio
+
+
+def extract_chunk(file_paths, config):
+    """Worker entry point: features for a chunk of files as (path, features, error) tuples.
+
+    With ``config["pooling"] == "frames"`` the features are the full
+    (n_frames, n_mfcc) MFCC matrix instead of its mean over time.
+    """
+    frame_level = config.get("pooling") == "frames"
+    if frame_level and not config.get("fixed_duration"):
+        raise ValueError("Frame-level features need a fixed_duration so every clip has the same shape")
+
+    results = []
+    signals = []
+    for file_path in file_paths:
+        try:
+            signals.append((file_path, load_signal(file_path, config)))
+        except Exception as e:
+            results.append((file_path, None, str(e)))
+
+    if config.get("fixed_duration") and signals:
+        # Equal-length clips go through the MFCC engine as one batch
+        stacked = np.stack([s for _, s in signals])
+        if frame_level:
+            batch = get_engine(sr=config["sr"], n_mfcc=config["n_mfcc"]).mfcc(stacked)
+        else:
+            batch = mean_mfcc_batch(stacked, sr=config["sr"], n_mfcc=config["n_mfcc"])
+        results.extend((path, features, None) for (path, _), features in zip(signals, batch))
+    else:
+        for file_path, signal in signals:
+            try:
+                results.append((file_path, mean_mfcc(signal, sr=config["sr"], n_mfcc=config["n_mfcc"]), None))
+            except Exception as e:
+                results.append((file_path, None, str(e)))
+    return results
+
+
+def list_dataset(dataset_path, labels, extension=".wav"):
+    """(file_path, label_index) pairs for ``dataset_path/<label>/*.wav`` in a stable order"""
+    items = []
+    for idx, label in enumerate(labels):
+        folder = os.path.join(dataset_path, label)
+        if not os.path.exists(folder):
+            print(f"Warning: {folder} does not exist")
+            continue
+        for file in sorted(os.listdir(folder)):
+            if file.endswith(extension):
+                items.append((os.path.join(folder, file), idx))
+    return items
+
+
+def extract_dataset(dataset_path, labels, config, store_path=DEFAULT_STORE_PATH,
+                    workers=None, chunk_size=16):
+    """Extract features for a labelled dataset, reusing rows from the feature store.
+
+    Only files that are missing from the store, or whose mtime/size changed,
+    are decoded; those are spread across a process pool in chunks. Returns
+    ``(X, y)`` in the order of ``list_dataset``; with frame pooling ``X`` is
+    (n_files, n_frames, n_mfcc).
+    """
+    items = list_dataset(dataset_path, labels)
+    features = {}
+    stats = {}
+    pending = []
+
+    t0 = time.perf_counter()
+    with FeatureStore(store_path) as store:
+        for file_path, _ in items:
+            stat = os.stat(file_path)
+            stats[file_path] = stat
+            cached = store.get(file_path, config, stat)
+            if cached is None:
+                pending.append(file_path)
+            else:
+                features[file_path] = cached
+
+        print(f"Feature store: {len(features)} cached, {len(pending)} to extract")
+
+        if pending:
+            chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(extract_chunk, chunk, config) for chunk in chunks]
+                for future in as_completed(futures):
+                    done = []
+                    for file_path, vector, error in future.result():
+                        if error is not None:
+                            print(f"Error processing {file_path}: {error}")
+                            continue
+                        features[file_path] = np.asarray(vector, dtype=np.float32).reshape(-1)
+                        done.append((file_path, stats[file_path], vector))
+                    store.put_many(done, config)
+
+    elapsed = time.perf_counter() - t0
+    print(f"Features ready for {len(features)} files in {elapsed:.1f}s")
+
+    kept = [(path, label) for path, label in items if path in features]
+    X = np.array([features[path] for path, _ in kept], dtype=np.float32)
+    if config.get("pooling") == "frames":
+        X = X.reshape(len(kept), -1, config["n_mfcc"])
+    y = np.array([label for _, label in kept])
+    return X, y
@@ -0,0 +1,142 @@
+import os
+import threading
+
+import numpy as np
+
+BACKENDS = ("keras", "tflite", "onnx")
+
+
+def exported_model_path(keras_path, backend, quantize=None):
+    """Where ``export_model.py`` writes a backend's copy of ``keras_path``.
+
+    ``model/emotion_model_7class.h5`` becomes e.g.
+    ``model/emotion_model_7class.int8.tflite`` or ``model/emotion_model_7class.onnx``.
+    """
+    if backend == "keras":
+        return keras_path
+    stem = os.path.splitext(keras_path)[0]
+    suffix = f".{quantize}" if quantize and quantize != "none" else ""
+    extension = {"tflite": ".tflite", "onnx": ".onnx"}[backend]
+    return stem + suffix + extension
+
+
+def _fit_input(X, input_shape):
+    """Reshape (n, n_features) rows to the model's own input layout, e.g. (n, 40, 1)"""
+    X = np.asarray(X, dtype=np.float32)
+    return X.reshape((len(X),) + tuple(int(d) for d in input_shape[1:]))
+
+
+class KerasBackend:
+    """Full TensorFlow/Keras model, as trained"""
+
+    name = "keras"
+
+    def __init__(self, model_path, num_threads=None):
+        import tensorflow as tf
+        from tensorflow.keras.models import load_model
+
+        if num_threads:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+            except RuntimeError:
+                pass  # TensorFlow is already running, e.g. a second model; keep its setting
+        self.model_path = model_path
+        self.model = load_model(model_path)
+        self.input_shape = tuple(self.model.input_shape)
+
+    def predict_batch(self, X):
+        return np.asarray(self.model.predict_on_batch(_fit_input(X, self.input_shape)))
+
+
+def _tflite_interpreter_class():
+    # The standalone runtime is a few MB; full TensorFlow also ships an interpreter
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteBackend:
+    """TFLite interpreter; float, float16 and int8 models all take and return float32.
+
+    Exported models have a fixed batch size (see ``export_model.py``), so
+    larger batches run in chunks and the last chunk is zero-padded. The
+    interpreter is not thread-safe, so calls are serialized.
+    """
+
+    name = "tflite"
+
+    def __init__(self, model_path, num_threads=None):
+        Interpreter = _tflite_interpreter_class()
+        self.model_path = model_path
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self.input_shape = (None,) + tuple(int(d) for d in self._input["shape"][1:])
+        self.batch_size = int(self._input["shape"][0])
+        self._lock = threading.Lock()
+
+    def predict_batch(self, X):
+        X = _fit_input(X, self.input_shape)
+        outputs = []
+        with self._lock:
+            for start in range(0, len(X), self.batch_size):
+                chunk = X[start:start + self.batch_size]
+                n = len(chunk)
+                if n < self.batch_size:
+                    chunk = np.concatenate([chunk, np.zeros((self.batch_size - n,) + chunk.shape[1:], np.float32)])
+                self.interpreter.set_tensor(self._input["index"], _quantize(chunk, self._input))
+                self.interpreter.invoke()
+                output = self.interpreter.get_tensor(self._output["index"])[:n]
+                outputs.append(_dequantize(output, self._output))
+        return np.concatenate(outputs)
+
+
+def _quantize(X, detail):
+    scale, zero_point = detail["quantization"]
+    if detail["dtype"] == np.float32 or not scale:
+        return X.astype(detail["dtype"])
+    info = np.iinfo(detail["dtype"])
+    return np.clip(np.round(X / scale + zero_point), info.min, info.max).astype(detail["dtype"])
+
+
+def _dequantize(Y, detail):
+    scale, zero_point = detail["quantization"]
+    if detail["dtype"] == np.float32 or not scale:
+        return Y.astype(np.float32)
+    return ((Y.astype(np.float32) - zero_point) * scale).astype(np.float32)
+
+
+class ONNXBackend:
+    """ONNX Runtime session on the CPU execution provider"""
+
+    name = "onnx"
+
+    def __init__(self, model_path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self._input_name = model_input.name
+        self.input_shape = (None,) + tuple(int(d) for d in model_input.shape[1:])
+
+    def predict_batch(self, X):
+        return self.session.run(None, {self._input_name: _fit_input(X, self.input_shape)})[0]
+
+
+def load_backend(backend, model_path, num_threads=None):
+    """Open ``model_path`` with the named backend ("keras", "tflite" or "onnx")"""
+    classes = {"keras": KerasBackend, "tflite": TFLiteBackend, "onnx": ONNXBackend}
+    if backend not in classes:
+        raise ValueError(f"Unknown inference backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"{model_path} not found; run export_model.py first")
+    return classes[backend](model_path, num_threads=num_threads)
@@ -0,0 +1,153 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class _PendingRequest:
+    """A single feature row waiting for its probabilities"""
+
+    __slots__ = ("features", "result", "error", "done")
+
+    def __init__(self, features):
+        self.features = features
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class InferenceBatcher:
+    """Merge concurrent single-row predictions into batched model calls.
+
+    Callers submit one feature row at a time with ``predict``. A background
+    worker collects rows until either ``max_batch_size`` rows are queued or
+    ``max_wait_ms`` has passed since the first row arrived, runs the whole
+    batch through ``predict_fn`` once and hands each caller its own row.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms must not be negative")
+
+        self.predict_fn = predict_fn
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = float(max_wait_ms) / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._closed = False
+
+        self._thread = threading.Thread(
+            target=self._run, name="inference-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def predict(self, features, timeout=None):
+        """Submit one feature row and block until its probabilities are ready"""
+        if self._closed:
+            raise RuntimeError("InferenceBatcher is closed")
+
+        request = _PendingRequest(np.asarray(features, dtype=np.float32))
+        self._queue.put(request)
+
+        if not request.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for batched inference")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def predict_batch(self, rows, timeout=None):
+        """Submit several rows at once and return their probabilities stacked"""
+        if self._closed:
+            raise RuntimeError("InferenceBatcher is closed")
+
+        requests = [_PendingRequest(np.asarray(row, dtype=np.float32)) for row in rows]
+        for request in requests:
+            self._queue.put(request)
+
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for request in requests:
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            if not request.done.wait(remaining):
+                raise TimeoutError("Timed out waiting for batched inference")
+            if request.error is not None:
+                raise request.error
+        return np.stack([request.result for request in requests])
+
+    def stats(self):
+        """Return batch counters for diagnostics"""
+        with self._lock:
+            batches, rows = self._batches, self._rows
+        return {
+            "batches": batches,
+            "rows": rows,
+            "mean_batch_size": rows / batches if batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    def close(self, timeout=None):
+        """Stop the worker after the rows already queued have been served"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _collect(self, first):
+        """Gather rows behind ``first`` until the batch is full or the wait expires"""
+        batch = [first]
+        stop = False
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+
+        return batch, stop
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch, stop = self._collect(first)
+            self._process(batch)
+            if stop:
+                break
+
+    def _process(self, batch):
+        try:
+            inputs = np.stack([request.features for request in batch])
+            outputs = np.asarray(self.predict_fn(inputs))
+            if len(outputs) != len(batch):
+                raise ValueError(
+                    f"Model returned {len(outputs)} rows for a batch of {len(batch)}"
+                )
+            for request, row in zip(batch, outputs):
+                request.result = row
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        finally:
+            with self._lock:
+                self._batches += 1
+                self._rows += len(batch)
+            for request in batch:
+                request.done.set()
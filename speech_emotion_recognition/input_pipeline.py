@@ -0,0 +1,138 @@
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from feature_store import load_signal
+from mfcc_engine import mean_mfcc
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+def _to_model_inputs(num_classes, add_channel):
+    def fn(X, y):
+        if add_channel:
+            X = tf.expand_dims(X, -1)
+        return X, tf.one_hot(y, num_classes)
+    return fn
+
+
+def shard_dataset(sharded, indices, batch_size=32, num_classes=4, shuffle_buffer=10000,
+                  add_channel=False, seed=None):
+    """Stream batches from a memory-mapped ``ShardedDataset``.
+
+    Indices are shuffled with a bounded buffer and batched first, then each
+    batch of indices is gathered from the shards by parallel ``map`` calls,
+    so only one batch per in-flight call is ever materialised in memory.
+    """
+    n_features = sharded.n_features
+
+    def gather(batch_indices):
+        X, y = sharded.take(batch_indices)
+        return X, y.astype(np.int32)
+
+    def load(batch_indices):
+        X, y = tf.numpy_function(gather, [batch_indices], [tf.float32, tf.int32])
+        X.set_shape([None, n_features])
+        y.set_shape([None])
+        return X, y
+
+    ds = tf.data.Dataset.from_tensor_slices(np.asarray(indices, dtype=np.int64))
+    if shuffle_buffer:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    return (
+        ds.batch(batch_size)
+        .map(load, num_parallel_calls=AUTOTUNE)
+        .map(_to_model_inputs(num_classes, add_channel), num_parallel_calls=AUTOTUNE)
+        .prefetch(AUTOTUNE)
+    )
+
+
+def file_dataset(file_paths, labels, config, batch_size=32, num_classes=4, shuffle_buffer=10000,
+                 add_channel=False, cache=True, seed=None):
+    """Decode audio and extract mean MFCCs on the fly with parallel ``map`` calls.
+
+    With ``cache=True`` the first epoch extracts features in parallel and
+    later epochs replay them from memory; shuffling happens after the cache
+    so every epoch still sees a fresh order.
+    """
+    n_mfcc = config["n_mfcc"]
+
+    def extract(path):
+        signal = load_signal(path.decode("utf-8"), config)
+        return mean_mfcc(signal, sr=config["sr"], n_mfcc=n_mfcc)
+
+    def load(path, label):
+        X = tf.numpy_function(extract, [path], tf.float32)
+        X.set_shape([n_mfcc])
+        return X, label
+
+    ds = tf.data.Dataset.from_tensor_slices((list(file_paths), np.asarray(labels, dtype=np.int32)))
+    ds = ds.map(load, num_parallel_calls=AUTOTUNE)
+    if cache:
+        ds = ds.cache()
+    if shuffle_buffer:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    return (
+        ds.batch(batch_size)
+        .map(_to_model_inputs(num_classes, add_channel), num_parallel_calls=AUTOTUNE)
+        .prefetch(AUTOTUNE)
+    )
+
+
+def array_dataset(X, y, batch_size=32, num_classes=4, shuffle_buffer=10000, add_channel=False, seed=None):
+    """Shuffle/batch/prefetch pipeline over arrays that are already in memory"""
+    ds = tf.data.Dataset.from_tensor_slices((np.asarray(X, dtype=np.float32), np.asarray(y, dtype=np.int32)))
+    if shuffle_buffer:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    return (
+        ds.batch(batch_size)
+        .map(_to_model_inputs(num_classes, add_channel), num_parallel_calls=AUTOTUNE)
+        .prefetch(AUTOTUNE)
+    )
+
+
+def measure_input_throughput(dataset, max_batches=None):
+    """Samples per second the input pipeline delivers with no model attached"""
+    samples = 0
+    t0 = time.perf_counter()
+    for i, (X, _) in enumerate(dataset):
+        samples += int(X.shape[0])
+        if max_batches is not None and i + 1 >= max_batches:
+            break
+    elapsed = time.perf_counter() - t0
+    return samples / elapsed if elapsed > 0 else 0.0
+
+
+class ThroughputCallback(tf.keras.callbacks.Callback):
+    """Report training samples per second for every epoch.
+
+    Compare the number with ``measure_input_throughput`` on the same
+    dataset: if the pipeline alone is not much faster than training, the
+    input side is the bottleneck. Keras does not report batch lengths, so
+    each step counts ``batch_size`` rows, capped at ``n_samples`` (the
+    rows in one epoch) so a short last batch is not over-counted.
+    """
+
+    def __init__(self, batch_size, n_samples=None):
+        super().__init__()
+        self.batch_size = batch_size
+        self.n_samples = n_samples
+        self.history = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._samples = 0
+        self._start = self._last = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._samples += self.batch_size
+        if self.n_samples is not None:
+            self._samples = min(self._samples, self.n_samples)
+        self._last = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        # Measured to the last training step so validation time is excluded
+        elapsed = self._last - self._start
+        rate = self._samples / elapsed if elapsed > 0 else 0.0
+        self.history.append(rate)
+        print(f"Epoch {epoch + 1}: {rate:.0f} samples/sec")
@@ -0,0 +1,57 @@
+from audio_io import PCMStreamDecoder, StreamingDecoder
+from streaming_engine import StreamingEmotionEngine
+
+
+class LiveSession:
+    """One live client: incremental decoder -> streaming engine -> updates.
+
+    The client announces its format first (``webm`` MediaRecorder chunks or
+    ``pcm_f32le`` frames at ``sample_rate``), then sends audio as it is
+    recorded. Every completed window is passed to ``on_update`` right away,
+    so the first result arrives one window after recording starts no matter
+    how long the recording runs. Decoding and features follow the model's
+    ``FeatureSpec`` (``spec``).
+    """
+
+    def __init__(self, start_message, predict_fn, labels, on_update, spec,
+                 window_seconds=3.0, hop_seconds=1.0, vad=None):
+        self.sr = sr = spec.sample_rate
+        self.engine = StreamingEmotionEngine(
+            predict_fn, labels, spec=spec,
+            window_seconds=window_seconds, hop_seconds=hop_seconds,
+            on_result=on_update, vad=vad,
+        )
+
+        fmt = start_message.get("format", "webm")
+        if fmt == "pcm_f32le":
+            self.decoder = PCMStreamDecoder(
+                self._on_audio, sr=sr,
+                input_rate=int(start_message.get("sample_rate", sr)),
+                channels=int(start_message.get("channels", 1)),
+                res_type=spec.res_type,
+            )
+        elif fmt in ("webm", "ogg", "mp4"):
+            self.decoder = StreamingDecoder(self._on_audio, sr=sr, container_format=fmt,
+                                            res_type=spec.res_type)
+        else:
+            raise ValueError(f"Unsupported stream format: {fmt}")
+        # Started last so a refused format or resampler leaves no worker thread behind
+        self.engine.start()
+
+    def _on_audio(self, samples):
+        self.engine.audio_callback(samples, len(samples), None, None)
+
+    def feed(self, data):
+        self.decoder.feed(data)
+
+    def finish(self):
+        """Flush the decoder, emit every remaining complete window and summarise"""
+        self.decoder.close()
+        self.engine.stop(drain=True)
+        summary = {
+            "audio_seconds": self.engine.samples.written / self.sr,
+            "latency": self.engine.latency_summary(),
+        }
+        if self.decoder.error is not None:
+            summary["error"] = str(self.decoder.error)
+        return summary
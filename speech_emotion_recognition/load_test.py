@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+import numpy as np
+
+DEFAULT_TARGET = "flask=http://127.0.0.1:5000/predict"
+DEFAULT_FILES = ["test_audio.wav"]
+
+
+async def client(session, url, path, data, deadline, results):
+    """Post ``data`` back to back until ``deadline``; one latency or error per request"""
+    while time.perf_counter() < deadline:
+        form = aiohttp.FormData()
+        form.add_field("audio", data, filename=os.path.basename(path))
+        t0 = time.perf_counter()
+        try:
+            async with session.post(url, data=form) as response:
+                body = await response.json(content_type=None)
+            ok = response.status == 200 and body.get("success", False)
+        except (aiohttp.ClientError, ValueError, asyncio.TimeoutError):
+            ok = False
+        results["latencies" if ok else "errors"].append(time.perf_counter() - t0)
+
+
+def summarize(results, elapsed):
+    latencies = np.asarray(results["latencies"]) * 1000.0
+    summary = {"requests": int(latencies.size), "errors": len(results["errors"]),
+               "throughput_rps": latencies.size / elapsed}
+    for q in (50, 95, 99):
+        summary[f"p{q}_ms"] = float(np.percentile(latencies, q)) if latencies.size else None
+    return summary
+
+
+async def run_target(url, groups, seconds, timeout):
+    """Drive every client group against one server at the same time"""
+    deadline = time.perf_counter() + seconds
+    results = {name: {"latencies": [], "errors": []} for name in groups}
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        tasks = []
+        for name, (paths, n_clients) in groups.items():
+            payloads = [(path, open(path, "rb").read()) for path in paths]
+            for i in range(n_clients):
+                path, data = payloads[i % len(payloads)]
+                tasks.append(client(session, url, path, data, deadline, results[name]))
+        t0 = time.perf_counter()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - t0
+    return {name: summarize(r, elapsed) for name, r in results.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load-test /predict on one or more servers, e.g. app.py vs async_server.py. "
+                    "Start the servers with SER_CACHE_MAX_ENTRIES=0 so repeated uploads are not cached."
+    )
+    parser.add_argument("--target", action="append",
+                        help=f"label=url of a /predict endpoint, repeatable (default {DEFAULT_TARGET})")
+    parser.add_argument("--files", nargs="+", default=DEFAULT_FILES, help="short clips for the fast clients")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--slow-files", nargs="*", default=[],
+                        help="long or expensive uploads (e.g. long WebM recordings) sent alongside")
+    parser.add_argument("--slow-clients", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=20.0, help="test length per target")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    groups = {"fast": (args.files, args.clients)}
+    if args.slow_files and args.slow_clients:
+        groups["slow"] = (args.slow_files, args.slow_clients)
+
+    report = {}
+    for target in args.target or [DEFAULT_TARGET]:
+        label, url = target.split("=", 1) if "=" in target else (target, target)
+        print(f"Loading {label} ({url}) for {args.seconds:.0f}s: "
+              + ", ".join(f"{n} x {name}" for name, (_, n) in groups.items()))
+        report[label] = asyncio.run(run_target(url, groups, args.seconds, args.timeout))
+
+    print(f"\n{'server':<10} {'clients':<7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for label, by_group in report.items():
+        for name, s in by_group.items():
+            p = [f"{s[k]:>9.1f}" if s[k] is not None else f"{'-':>9}" for k in ("p50_ms", "p95_ms", "p99_ms")]
+            print(f"{label:<10} {name:<7} {s['throughput_rps']:>8.1f} {' '.join(p)} {s['errors']:>7}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"seconds": args.seconds, "groups": {k: {"files": v[0], "clients": v[1]}
+                                                           for k, v in groups.items()},
+                       "results": report}, f, indent=2)
+        print(f"\nResults saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
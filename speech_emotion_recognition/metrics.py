@@ -0,0 +1,183 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# SER_VERBOSE=0 turns the per-request diagnostic prints off
+VERBOSE = os.environ.get("SER_VERBOSE", "1") != "0"
+
+# Request stages run from well under a millisecond (cache lookups) to seconds (long decodes)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def log(message, *args):
+    """Per-request diagnostics, formatted only when verbose: ``log("decoded %s", info)``.
+
+    Guard arguments that are costly to compute with ``if metrics.VERBOSE``.
+    """
+    if VERBOSE:
+        print(message % args if args else message)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        if _paused.get():
+            return
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+        current = _trace.get()
+        if current is not None:
+            current["counts"].append((self.name, labels, amount))
+
+    def samples(self):
+        with self._lock:
+            return [(self.name + _format_labels(self.labelnames, k), v) for k, v in sorted(self._values.items())]
+
+
+class Histogram:
+    """Bucketed observations per label combination, cumulative as Prometheus expects"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            items = sorted((k, list(v[0]), v[1]) for k, v in self._values.items())
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append((self.name + "_bucket" + _format_labels(self.labelnames, key, [("le", le)]),
+                              cumulative))
+            lines.append((self.name + "_sum" + _format_labels(self.labelnames, key), total))
+            lines.append((self.name + "_count" + _format_labels(self.labelnames, key), cumulative))
+        return lines
+
+
+_metrics = {}
+
+
+def counter(name, documentation, labelnames=()):
+    return _metrics.setdefault(name, Counter(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+    return _metrics.setdefault(name, Histogram(name, documentation, labelnames, buckets))
+
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics.values():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(f"{sample} {value:g}" for sample, value in metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = histogram("ser_stage_seconds", "Time spent in each request stage", ["stage"])
+REQUEST_SECONDS = histogram("ser_request_seconds", "End-to-end request handling time", ["endpoint"])
+REQUESTS = counter("ser_requests_total", "Requests handled", ["endpoint"])
+ERRORS = counter("ser_errors_total", "Requests answered with an error", ["endpoint"])
+DECODE_FALLBACKS = counter("ser_decode_fallbacks_total",
+                           "Decode attempts that failed and fell through to the next method", ["method"])
+CACHE_LOOKUPS = counter("ser_cache_lookups_total", "Feature cache lookups", ["result"])
+NO_SPEECH = counter("ser_no_speech_total", "Uploads the voice-activity gate found silent")
+
+# Context variables rather than thread-locals: each asyncio task sees only its
+# own trace, and threads started with ``copy_context().run`` share the caller's
+_trace = contextvars.ContextVar("ser_trace", default=None)
+_paused = contextvars.ContextVar("ser_metrics_paused", default=False)
+
+
+@contextmanager
+def trace():
+    """Collect the current context's stage timings and counter increments into a dict.
+
+    Used for per-request profiles, and to carry a worker process's
+    measurements back to the server process (see ``replay``).
+    """
+    current = {"stages": {}, "counts": []}
+    token = _trace.set(current)
+    try:
+        yield current
+    finally:
+        _trace.reset(token)
+
+
+@contextmanager
+def paused():
+    """Keep the current context's work (e.g. startup warm-up) out of the metrics"""
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+
+
+def record_stage(stage, seconds):
+    if _paused.get():
+        return
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    current = _trace.get()
+    if current is not None:
+        current["stages"][stage] = current["stages"].get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage_timer(stage):
+    """Time a block into ``ser_stage_seconds{stage=...}``"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - t0)
+
+
+def replay(recorded):
+    """Apply a trace recorded in another process to this process's metrics"""
+    for stage, seconds in recorded["stages"].items():
+        record_stage(stage, seconds)
+    for name, labels, amount in recorded["counts"]:
+        _metrics[name].inc(amount, **labels)
@@ -0,0 +1,164 @@
+from functools import lru_cache
+
+import numpy as np
+import scipy.fft
+
+
+class MFCCEngine:
+    """Batched MFCC extraction with precomputed window, mel and DCT matrices.
+
+    Reproduces ``librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc)`` with
+    librosa's defaults (centered Hann STFT with zero padding, power mel
+    spectrogram with Slaney filters, ``power_to_db`` with ``top_db=80`` and
+    an orthonormal DCT-II) but runs a whole stack of equal-length clips
+    through one strided STFT and two matrix multiplies.
+    """
+
+    def __init__(self, sr=22050, n_mfcc=40, n_fft=2048, hop_length=512, n_mels=128,
+                 top_db=80.0, amin=1e-10):
+        self.sr = sr
+        self.n_mfcc = n_mfcc
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mels = n_mels
+        self.top_db = top_db
+        self.amin = amin
+
+        # librosa and scipy.signal are only needed to build the matrices; importing
+        # them here keeps ``import mfcc_engine`` cheap until the first engine is made
+        import librosa
+        import scipy.signal
+
+        self.window = scipy.signal.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+        # (n_fft // 2 + 1, n_mels) so a frame-major power spectrum multiplies on the right
+        self.mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels).T.astype(np.float32)
+        self.dct_matrix = _dct_matrix(n_mels, n_mfcc)
+
+    def n_frames(self, n_samples):
+        """Number of STFT frames librosa produces for a centered signal"""
+        return 1 + n_samples // self.hop_length
+
+    def frame(self, y, center=True):
+        """Strided frame view: (..., n_samples) -> (..., n_frames, n_fft)"""
+        y = np.asarray(y, dtype=np.float32)
+        if center:
+            pad = self.n_fft // 2
+            y = np.pad(y, [(0, 0)] * (y.ndim - 1) + [(pad, pad)], mode="constant")
+        frames = np.lib.stride_tricks.sliding_window_view(y, self.n_fft, axis=-1)
+        return frames[..., ::self.hop_length, :]
+
+    def frame_power(self, frames):
+        """Windowed power spectrum of framed audio: (..., n_fft) -> (..., n_fft // 2 + 1)"""
+        spectrum = scipy.fft.rfft(frames * self.window, axis=-1)
+        return spectrum.real ** 2 + spectrum.imag ** 2
+
+    def power_spectrogram(self, y):
+        """Centered power STFT, frame-major: (..., n_samples) -> (..., n_frames, n_fft // 2 + 1)"""
+        return self.frame_power(self.frame(y))
+
+    def log_mel_frames(self, frames):
+        """Log-power mel of framed audio (before the ``top_db`` floor): (..., n_fft) -> (..., n_mels)"""
+        mel = self.frame_power(frames) @ self.mel_basis
+        return 10.0 * np.log10(np.maximum(mel, self.amin))
+
+    def log_mel(self, y):
+        """Log-power mel frames (before the ``top_db`` floor): (..., n_frames, n_mels)"""
+        return self.log_mel_frames(self.frame(y))
+
+    def mfcc_from_log_mel(self, log_mel):
+        """Apply the per-clip ``top_db`` floor and the DCT: (..., n_frames, n_mfcc)"""
+        if self.top_db is not None:
+            peak = log_mel.max(axis=(-2, -1), keepdims=True)
+            log_mel = np.maximum(log_mel, peak - self.top_db)
+        return log_mel @ self.dct_matrix
+
+    def mfcc(self, y):
+        """Frame-level MFCCs: (..., n_samples) -> (..., n_frames, n_mfcc)"""
+        return self.mfcc_from_log_mel(self.log_mel(y))
+
+    def mean_mfcc_batch(self, batch, chunk_size=64):
+        """Mean-pooled MFCCs for a (n_clips, n_samples) stack of equal-length clips"""
+        batch = np.asarray(batch, dtype=np.float32)
+        if batch.ndim != 2:
+            raise ValueError(f"Expected a (n_clips, n_samples) array, got shape {batch.shape}")
+
+        out = np.empty((len(batch), self.n_mfcc), dtype=np.float32)
+        # Chunking keeps the (clips, frames, n_fft) frame tensor bounded in memory
+        for start in range(0, len(batch), chunk_size):
+            chunk = batch[start:start + chunk_size]
+            out[start:start + len(chunk)] = self.mfcc(chunk).mean(axis=-2)
+        return out
+
+    def n_windows(self, n_samples, window_samples, hop_samples):
+        """Number of uncentered windows ``window_mean_mfcc`` yields for ``n_samples``"""
+        n_frames = 0 if n_samples < self.n_fft else 1 + (n_samples - self.n_fft) // self.hop_length
+        window_frames = 1 + (window_samples - self.n_fft) // self.hop_length
+        hop_frames = max(1, hop_samples // self.hop_length)
+        return max(0, (n_frames - window_frames) // hop_frames + 1)
+
+    def window_mean_mfcc(self, y, window_samples, hop_samples, normalize=False, keep=None):
+        """Mean MFCCs for overlapping windows of one clip from a single STFT pass.
+
+        Frames are computed once, uncentered, over the whole clip and pooled
+        into windows of ``window_samples`` advancing by ``hop_samples``
+        (both rounded to whole frames). The ``top_db`` floor is applied per
+        window, as if each window had been extracted on its own. With
+        ``normalize`` every window is scaled as ``librosa.util.normalize``
+        would, which only shifts the 0th coefficient. ``keep`` is an optional
+        boolean mask over windows; frames outside every kept window are never
+        transformed. Returns ``(features, window_starts)`` with starts in
+        samples.
+        """
+        frames = self.frame(y, center=False)
+        window_frames = 1 + (window_samples - self.n_fft) // self.hop_length
+        hop_frames = max(1, hop_samples // self.hop_length)
+        if len(frames) < window_frames:
+            raise ValueError("Clip is shorter than one window")
+
+        starts = np.arange(0, len(frames) - window_frames + 1, hop_frames)
+        if keep is not None:
+            starts = starts[np.asarray(keep, dtype=bool)]
+        idx = starts[:, np.newaxis] + np.arange(window_frames)
+        if keep is None:
+            log_mel = self.log_mel_frames(frames)
+        else:
+            needed = np.unique(idx)
+            log_mel = np.zeros((len(frames), self.n_mels), dtype=np.float32)
+            log_mel[needed] = self.log_mel_frames(frames[needed])
+        features = self.mfcc_from_log_mel(log_mel[idx]).mean(axis=-2)
+
+        if normalize:
+            peaks = np.abs(frames).max(axis=-1)[idx].max(axis=-1)
+            shift = 20.0 * np.log10(np.maximum(peaks, 1e-12)) * np.sqrt(self.n_mels)
+            features[:, 0] -= np.where(peaks > 0, shift, 0.0)
+
+        return features, starts * self.hop_length
+
+    def mean_mfcc(self, y):
+        """Mean-pooled MFCC vector for a single clip, like ``np.mean(mfcc.T, axis=0)``"""
+        return self.mean_mfcc_batch(np.asarray(y)[np.newaxis, :])[0]
+
+
+def _dct_matrix(n_mels, n_mfcc):
+    """Orthonormal DCT-II basis restricted to the first ``n_mfcc`` outputs, (n_mels, n_mfcc)"""
+    n = np.arange(n_mels)
+    k = np.arange(n_mfcc)[:, np.newaxis]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)) * np.sqrt(2.0 / n_mels)
+    basis[0] *= np.sqrt(0.5)
+    return basis.T.astype(np.float32)
+
+
+@lru_cache(maxsize=None)
+def get_engine(sr=22050, n_mfcc=40, n_fft=2048, hop_length=512, n_mels=128):
+    """Shared engine per configuration so the matrices are built only once"""
+    return MFCCEngine(sr=sr, n_mfcc=n_mfcc, n_fft=n_fft, hop_length=hop_length, n_mels=n_mels)
+
+
+def mean_mfcc(y, sr=22050, n_mfcc=40):
+    """Drop-in for ``np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc).T, axis=0)``"""
+    return get_engine(sr=sr, n_mfcc=n_mfcc).mean_mfcc(y)
+
+
+def mean_mfcc_batch(batch, sr=22050, n_mfcc=40):
+    """Mean-pooled MFCCs for a stack of equal-length clips"""
+    return get_engine(sr=sr, n_mfcc=n_mfcc).mean_mfcc_batch(batch)
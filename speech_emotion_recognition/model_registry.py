@@ -0,0 +1,386 @@
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from audio_features import SERVING_SPEC
+from feature_spec import STRICT, FeatureSpec
+from inference_backends import exported_model_path, load_backend
+from inference_batcher import InferenceBatcher
+
+
+def metadata_path(model_path):
+    """Sidecar next to a model file: ``model/emotion_model.h5`` -> ``model/emotion_model.json``"""
+    return os.path.splitext(model_path)[0] + ".json"
+
+
+def save_model_metadata(model_path, labels, name=None, version=1, input_shape=None, feature_spec=None, **extra):
+    """Write the sidecar the registry needs to serve ``model_path``.
+
+    ``labels`` must be in the order of the model's output units and
+    ``feature_spec`` is the ``FeatureSpec`` the training features were
+    extracted with. The file is replaced atomically so a watching registry
+    never reads half of it.
+    """
+    metadata = {
+        "name": name or os.path.splitext(os.path.basename(model_path))[0],
+        "version": str(version),
+        "file": os.path.basename(model_path),
+        "labels": list(labels),
+    }
+    if input_shape is not None:
+        metadata["input_shape"] = [int(d) for d in input_shape]
+    if feature_spec is not None:
+        metadata["feature_spec"] = feature_spec.to_dict()
+    metadata.update(extra)
+
+    path = metadata_path(model_path)
+    with open(path + ".tmp", "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(path + ".tmp", path)
+    return metadata
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _version_key(version):
+    parts = str(version).split(".")
+    return tuple((0, int(p), "") if p.isdigit() else (1, 0, p) for p in parts)
+
+
+class ModelEntry:
+    """One loaded model version with its own labels, input shape, feature spec and batcher.
+
+    Requests hold an entry between ``acquire`` and ``release``. A retired
+    entry (replaced by a newer file, or deleted) keeps serving those
+    requests and closes its batcher when the last one releases it.
+    """
+
+    def __init__(self, source_path, metadata, signature, backend="keras", quantize=None,
+                 batcher_kwargs=None, num_threads=None, runtime_spec=SERVING_SPEC):
+        self.source_path = source_path
+        self.metadata = metadata
+        self.signature = signature
+        self.name = metadata["name"]
+        self.version = str(metadata.get("version", "1"))
+        self.labels = list(metadata["labels"])
+        self.backend = backend
+        self.path = exported_model_path(source_path, backend, quantize)
+
+        stat = os.stat(self.path)
+        self.model_id = f"{os.path.abspath(self.path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        self.runner = load_backend(backend, self.path, num_threads=num_threads)
+        self.input_shape = tuple(self.runner.input_shape)
+
+        declared = metadata.get("input_shape")
+        if declared is not None and tuple(declared) != tuple(self.input_shape[1:]):
+            raise ValueError(f"{self.path}: sidecar input_shape {tuple(declared)} "
+                             f"does not match the model's {tuple(self.input_shape[1:])}")
+        n_outputs = np.asarray(self.runner.predict_batch(np.zeros((1, self.n_features)))).shape[-1]
+        if n_outputs != len(self.labels):
+            raise ValueError(f"{self.path}: {n_outputs} outputs but {len(self.labels)} labels")
+        self.feature_spec = self._load_feature_spec(runtime_spec)
+
+        self.batcher_kwargs = batcher_kwargs or {}
+        self.batcher = InferenceBatcher(self.runner.predict_batch, **self.batcher_kwargs)
+        self.loaded_at = time.time()
+        self._active = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    def _load_feature_spec(self, runtime_spec):
+        """The sidecar's spec, checked against the model and the runtime; older sidecars get ``runtime_spec``"""
+        declared = self.metadata.get("feature_spec")
+        try:
+            spec = FeatureSpec.from_dict(declared) if declared is not None else runtime_spec
+            spec.check_servable(self.n_features)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{self.path}: {e}")
+        differences = spec.differences(runtime_spec)
+        if differences:
+            summary = ", ".join(f"{field}={mine} (runtime {theirs})" for field, (mine, theirs) in differences.items())
+            if STRICT:
+                raise ValueError(f"{self.path}: feature spec differs from the runtime's: {summary}")
+            print(f"Model {self.key} is served with its own feature spec: {summary}")
+        elif declared is None:
+            print(f"Model {self.key} has no feature_spec in its sidecar; assuming the runtime's")
+        return spec
+
+    @property
+    def n_features(self):
+        return int(np.prod(self.input_shape[1:]))
+
+    @property
+    def key(self):
+        return f"{self.name}@{self.version}"
+
+    def warm_up(self, batch_sizes):
+        """Trace every batch size the batcher can produce before taking traffic"""
+        for batch_size in batch_sizes:
+            if batch_size <= self.batcher.max_batch_size:
+                self.runner.predict_batch(np.zeros((batch_size, self.n_features), dtype=np.float32))
+
+    def after_fork(self):
+        """The batcher's worker thread does not survive fork(); start a new one"""
+        self._lock = threading.Lock()
+        self._active = 0
+        self.batcher = InferenceBatcher(self.runner.predict_batch, **self.batcher_kwargs)
+
+    def acquire(self):
+        with self._lock:
+            self._active += 1
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            idle = self._retired and self._active == 0
+        if idle:
+            self.batcher.close()
+
+    def retire(self):
+        with self._lock:
+            self._retired = True
+            idle = self._active == 0
+        if idle:
+            self.batcher.close()
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "labels": self.labels,
+            "input_shape": list(self.input_shape[1:]),
+            "feature_spec": self.feature_spec.to_dict(),
+            "backend": self.backend,
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+        }
+
+
+class ModelRegistry:
+    """Every model in ``model_dir`` that has a JSON sidecar, served side by side.
+
+    Models are chosen by name (the highest version wins) or by name and
+    version. ``start_watching`` polls the directory: new, changed and
+    deleted files are picked up in the background. A replacement is fully
+    loaded and warmed before it is swapped in under the lock, so requests
+    never wait for a reload, and requests already running finish on the
+    version they started with. Each model's sidecar ``feature_spec`` is
+    validated on load; a model whose spec the serving path cannot follow
+    (or, with ``SER_STRICT_FEATURE_SPEC=1``, any that differs from
+    ``runtime_spec``) is refused like any other load failure.
+    """
+
+    def __init__(self, model_dir, default_name=None, backend="keras", quantize=None,
+                 batcher_kwargs=None, warmup_batch_sizes=(), num_threads=None, runtime_spec=SERVING_SPEC):
+        self.model_dir = model_dir
+        self.default_name = default_name
+        self.backend = backend
+        self.quantize = quantize
+        self.batcher_kwargs = batcher_kwargs or {}
+        self.warmup_batch_sizes = tuple(warmup_batch_sizes)
+        self.num_threads = num_threads
+        self.runtime_spec = runtime_spec
+
+        self._entries = {}  # source path -> ModelEntry
+        self._pending = {}  # source path -> signature seen on the previous poll
+        self._failed = {}  # source path -> signature that failed to load
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def _discover(self):
+        """(source model path, metadata) for every sidecar whose model file exists"""
+        found = {}
+        for sidecar in sorted(glob.glob(os.path.join(self.model_dir, "*.json"))):
+            try:
+                with open(sidecar) as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(metadata, dict) or "labels" not in metadata:
+                continue  # e.g. export reports
+            stem = os.path.splitext(sidecar)[0]
+            source = os.path.join(self.model_dir, metadata.get("file", os.path.basename(stem) + ".h5"))
+            metadata.setdefault("name", os.path.basename(stem))
+            if os.path.exists(exported_model_path(source, self.backend, self.quantize)):
+                found[source] = metadata
+        return found
+
+    def sources(self):
+        """Source model paths this registry's backend would serve, without loading any of them"""
+        return sorted(self._discover())
+
+    def _signature(self, source_path):
+        return (
+            _file_signature(metadata_path(source_path)),
+            _file_signature(exported_model_path(source_path, self.backend, self.quantize)),
+        )
+
+    def scan(self, wait_for_stable=False, warm_up=True):
+        """Load new or changed models and retire deleted ones; returns the keys that changed.
+
+        With ``wait_for_stable`` a file must look the same on two consecutive
+        scans before it is loaded, so a copy that is still being written is
+        not picked up halfway. ``warm_up=False`` leaves tracing to the caller,
+        e.g. a startup warm-up that runs in the background.
+        """
+        changed = []
+        found = self._discover()
+        for source_path, metadata in found.items():
+            signature = self._signature(source_path)
+            current = self._entries.get(source_path)
+            if current is not None and current.signature == signature:
+                continue
+            if wait_for_stable and self._pending.get(source_path) != signature:
+                self._pending[source_path] = signature
+                continue
+            self._pending.pop(source_path, None)
+            if self._failed.get(source_path) == signature:
+                continue
+
+            try:
+                entry = ModelEntry(source_path, metadata, signature, backend=self.backend,
+                                   quantize=self.quantize, batcher_kwargs=self.batcher_kwargs,
+                                   num_threads=self.num_threads, runtime_spec=self.runtime_spec)
+                if warm_up:
+                    entry.warm_up(self.warmup_batch_sizes)
+            except Exception as e:
+                print(f"Could not load model {source_path}: {e}")
+                self._failed[source_path] = signature
+                continue
+
+            with self._lock:
+                old = self._entries.get(source_path)
+                self._entries[source_path] = entry
+            if old is not None:
+                old.retire()
+                print(f"Swapped model {old.key} -> {entry.key} ({entry.path})")
+            else:
+                print(f"Loaded model {entry.key} ({entry.path}, labels {entry.labels})")
+            changed.append(entry.key)
+
+        for source_path in list(self._entries):
+            if source_path not in found:
+                with self._lock:
+                    old = self._entries.pop(source_path)
+                old.retire()
+                print(f"Removed model {old.key}")
+                changed.append(old.key)
+        return changed
+
+    def start_watching(self, interval_seconds=5.0):
+        """Poll ``model_dir`` for model changes on a daemon thread"""
+        def watch():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.scan(wait_for_stable=True)
+                except Exception as e:
+                    print(f"Model watcher error: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def after_fork(self):
+        """Reset threads and locks in a worker forked from a process that loaded the models.
+
+        Call before ``start_watching``; the parent's watcher is not inherited.
+        """
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        for entry in self._entries.values():
+            entry.after_fork()
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+        for entry in entries:
+            entry.retire()
+
+    def _parse_key(self, name=None, version=None):
+        """``(name, version)`` from a ``name`` or ``name@version`` and an optional version"""
+        if name and "@" in name:
+            name, version = name.split("@", 1)
+        return name or self.default_name, None if version is None else str(version)
+
+    def _resolve(self, name=None, version=None):
+        name, version = self._parse_key(name, version)
+        candidates = [e for e in self._entries.values()
+                      if (name is None or e.name == name) and (version is None or e.version == version)]
+        if not candidates:
+            wanted = f"{name}@{version}" if version else name
+            raise KeyError(f"Unknown model: {wanted}")
+        return max(candidates, key=lambda e: _version_key(e.version))
+
+    def load(self, name=None, version=None):
+        """Load only the selected model, without warm-up; for one-shot tools like batch_score.
+
+        Every sidecar is read to find it, but no other model file is opened.
+        """
+        name, version = self._parse_key(name, version)
+        candidates = [(source, metadata) for source, metadata in self._discover().items()
+                      if (name is None or metadata["name"] == name)
+                      and (version is None or str(metadata.get("version", "1")) == version)]
+        if not candidates:
+            wanted = f"{name}@{version}" if version else name
+            raise KeyError(f"Unknown model: {wanted}")
+        source_path, metadata = max(candidates, key=lambda c: _version_key(str(c[1].get("version", "1"))))
+        entry = ModelEntry(source_path, metadata, self._signature(source_path), backend=self.backend,
+                           quantize=self.quantize, batcher_kwargs=self.batcher_kwargs,
+                           num_threads=self.num_threads, runtime_spec=self.runtime_spec)
+        with self._lock:
+            self._entries[source_path] = entry
+        return entry
+
+    def acquire(self, name=None, version=None):
+        """Select a model and hold it; pair with ``entry.release()``"""
+        with self._lock:
+            entry = self._resolve(name, version)
+            entry.acquire()
+        return entry
+
+    @contextmanager
+    def use(self, name=None, version=None):
+        """Hold the selected model for the duration of a request"""
+        entry = self.acquire(name, version)
+        try:
+            yield entry
+        finally:
+            entry.release()
+
+    def get(self, name=None, version=None):
+        """The currently selected entry, without holding it"""
+        with self._lock:
+            return self._resolve(name, version)
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries.values())
+
+    def describe(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            try:
+                default = self._resolve().key
+            except KeyError:
+                # The default model failed to load or was deleted; the others still serve
+                default = None
+        return {
+            "default": default,
+            "models": [dict(e.describe(), default=(e.key == default))
+                       for e in sorted(entries, key=lambda e: (e.name, _version_key(e.version)))],
+        }
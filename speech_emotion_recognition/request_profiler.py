@@ -0,0 +1,127 @@
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import time
+import uuid
+
+import metrics
+
+# Profiling is off unless an admin token is configured
+ADMIN_TOKEN = os.environ.get("SER_ADMIN_TOKEN")
+PROFILE_DIR = os.environ.get("SER_PROFILE_DIR", "profiles")
+TOP_FUNCTIONS = 30
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class ProfilingDenied(Exception):
+    """Profiling was asked for without a valid admin token"""
+
+
+def is_admin(headers):
+    """The token is only read from the ``X-Admin-Token`` header, so it does not end up in access logs"""
+    token = headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def profiling_requested(headers, args):
+    """True for an admin's ``X-Profile: 1`` header or ``?profile=1``; ``ProfilingDenied`` for anyone else"""
+    if headers.get("X-Profile", args.get("profile", "0")) in ("", "0", "false"):
+        return False
+    if not is_admin(headers):
+        raise ProfilingDenied("Profiling requires SER_ADMIN_TOKEN and a matching X-Admin-Token header")
+    return True
+
+
+def profile_path(request_id, suffix=".prof"):
+    if not _REQUEST_ID.match(request_id):
+        raise ValueError(f"Invalid request id: {request_id}")
+    return os.path.join(PROFILE_DIR, request_id + suffix)
+
+
+class RequestProfile:
+    """cProfile plus per-stage timings for one request.
+
+    cProfile only sees the thread it runs in: time the request spends
+    waiting on the inference batcher shows up as a lock wait, and the
+    ``inference`` stage says how long that was. Profiles from decode worker
+    processes and pool threads can be merged in with ``add_stats``; an
+    event loop serving other requests meanwhile passes ``profile_thread=False``.
+    """
+
+    def __init__(self, request_id=None, profile_thread=True):
+        if request_id is None or not _REQUEST_ID.match(request_id):
+            request_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+        self.request_id = request_id
+        self.profiler = cProfile.Profile()
+        self.profile_thread = profile_thread
+        self.extra_stats = []
+        self.stages = {}
+        self.total_seconds = None
+
+    def __enter__(self):
+        self._trace = metrics.trace()
+        self._recorded = self._trace.__enter__()
+        self._began = time.perf_counter()
+        if self.profile_thread:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile_thread:
+            self.profiler.disable()
+        self.total_seconds = time.perf_counter() - self._began
+        self._trace.__exit__(*exc_info)
+        self.stages = dict(self._recorded["stages"])
+        return False
+
+    def add_stats(self, path):
+        """Merge a profile another thread or process dumped to ``path``"""
+        if os.path.exists(path):
+            self.extra_stats.append(path)
+
+    def stats(self, stream=None):
+        stats = pstats.Stats(self.profiler, stream=stream) if self.profile_thread else pstats.Stats(stream=stream)
+        for path in self.extra_stats:
+            stats.add(path)
+        return stats
+
+    def report(self, top=TOP_FUNCTIONS):
+        buffer = io.StringIO()
+        self.stats(stream=buffer).sort_stats("cumulative").print_stats(top)
+        accounted = sum(self.stages.values())
+        return {
+            "request_id": self.request_id,
+            "total_ms": round(self.total_seconds * 1000, 3),
+            "stages_ms": {stage: round(s * 1000, 3) for stage, s in
+                          sorted(self.stages.items(), key=lambda item: -item[1])},
+            "other_ms": round((self.total_seconds - accounted) * 1000, 3),
+            "top_functions": buffer.getvalue(),
+        }
+
+    def save(self, report=None):
+        """Write ``<request_id>.prof`` (pstats/snakeviz) and ``<request_id>.json``"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        report = report or self.report()
+        self.stats().dump_stats(profile_path(self.request_id))
+        for path in self.extra_stats:
+            os.unlink(path)
+        self.extra_stats = []
+        with open(profile_path(self.request_id, ".json"), "w") as f:
+            json.dump(report, f, indent=2)
+        return profile_path(self.request_id)
+
+
+def run_profiled(dump_path, fn, *args):
+    """Run ``fn`` under cProfile in a pool thread or worker process and dump the stats to ``dump_path``"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return fn(*args)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(dump_path)
@@ -0,0 +1,212 @@
+import argparse
+import gc
+import multiprocessing as mp
+import os
+import signal
+import socket
+import time
+import traceback
+
+# Read by OpenMP/BLAS, numba and TensorFlow when they start, so they are set
+# before any of them is imported
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                   "NUMBA_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "SER_BACKEND_THREADS")
+REPORT_SECONDS = 10.0
+RESPAWN_DELAY_SECONDS = 1.0
+BACKENDS = ("keras", "tflite", "onnx")
+
+
+def configure_threads(threads_per_worker, inter_op_threads=1):
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads_per_worker)
+    os.environ["TF_NUM_INTEROP_THREADS"] = str(inter_op_threads)
+
+
+def choose_backend(model_dir, quantize=None):
+    """tflite when every model in ``model_dir`` has a TFLite export, else keras.
+
+    Only exported models are loaded once in the master and shared
+    copy-on-write; keras models are loaded again in every worker.
+    """
+    from model_registry import ModelRegistry
+
+    keras = ModelRegistry(model_dir).sources()
+    if keras and ModelRegistry(model_dir, backend="tflite", quantize=quantize).sources() == keras:
+        return "tflite"
+    return "keras"
+
+
+def memory_mb(pid):
+    """(RSS, PSS) of a process in MB. PSS charges each shared page to the
+    processes sharing it, so summing PSS over workers shows what copy-on-write saves.
+    """
+    rss = pss = None
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1]) / 1024
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return rss, pss
+
+
+class CountingMiddleware:
+    """Count /predict requests per worker in memory shared with the master"""
+
+    def __init__(self, app, counts, index):
+        self.app = app
+        self.counts = counts
+        self.index = index
+
+    def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO", "").startswith("/predict"):
+            with self.counts.get_lock():
+                self.counts[self.index] += 1
+        return self.app(environ, start_response)
+
+
+def run_worker(index, listener, ser, counts, preloaded):
+    """Body of a forked worker; never returns"""
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the master stops workers with SIGTERM
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if preloaded:
+        # Models were loaded in the master and are shared; only threads are per worker
+        ser.registry.after_fork()
+        if ser.MODEL_POLL_SECONDS > 0:
+            ser.registry.start_watching(ser.MODEL_POLL_SECONDS)
+    else:
+        ser.start()
+    host, port = listener.getsockname()[:2]
+    server = make_server(host, port, CountingMiddleware(ser.app, counts, index),
+                         threaded=True, fd=listener.fileno())
+    print(f"Worker {index} (pid {os.getpid()}) serving")
+    server.serve_forever()
+    os._exit(0)
+
+
+def print_report(pids, counts, last_counts, elapsed):
+    print(f"\n{'worker':<7} {'pid':>7} {'requests':>9} {'req/s':>7} {'RSS MB':>8} {'PSS MB':>8}")
+    total_rss = total_pss = total_rate = 0.0
+    rows = [("master", os.getpid(), None)] + [(str(i), pid, i) for i, pid in sorted(pids.items())]
+    for name, pid, index in rows:
+        rss, pss = memory_mb(pid)
+        total_rss += rss or 0.0
+        total_pss += pss or 0.0
+        if index is None:
+            requests, rate = "", ""
+        else:
+            rate_value = (counts[index] - last_counts[index]) / elapsed
+            total_rate += rate_value
+            requests, rate = counts[index], f"{rate_value:.1f}"
+        print(f"{name:<7} {pid:>7} {requests:>9} {rate:>7} {rss or 0:>8.0f} {pss or 0:>8.0f}")
+    print(f"{'total':<7} {'':>7} {sum(counts):>9} {total_rate:>7.1f} {total_rss:>8.0f} {total_pss:>8.0f}")
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Pre-fork server: load once, fork workers that share the models")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=cpus)
+    parser.add_argument("--threads", type=int,
+                        help="intra-op/BLAS/numba threads per worker (default: CPUs / workers)")
+    parser.add_argument("--inter-op-threads", type=int, default=1)
+    parser.add_argument("--backend", choices=BACKENDS, default=os.environ.get("SER_INFERENCE_BACKEND"),
+                        help="tflite/onnx models are loaded once and shared by every worker; keras models "
+                             "cannot be, each worker loads its own copy (default: tflite when every model "
+                             "has a TFLite export from export_model.py, else keras)")
+    parser.add_argument("--report-seconds", type=float, default=REPORT_SECONDS)
+    args = parser.parse_args()
+
+    threads = args.threads or max(1, cpus // args.workers)
+    configure_threads(threads, args.inter_op_threads)
+    # Workers accept connections only once they are warm
+    os.environ.setdefault("SER_WARMUP", "blocking")
+    os.environ["SER_DEFER_START"] = "1"
+    # Read by app.py on import; SER_MODEL_DIR defaults to app.py's model/ directory
+    os.environ["SER_INFERENCE_BACKEND"] = args.backend or choose_backend(
+        os.environ.get("SER_MODEL_DIR", "model"), os.environ.get("SER_INFERENCE_QUANTIZE"))
+
+    listener = socket.create_server((args.host, args.port), backlog=128)
+
+    import app as ser
+    from audio_features import warm_up_features
+
+    preloaded = ser.INFERENCE_BACKEND != "keras"
+    if preloaded:
+        # ONNX Runtime and TFLite keep working in a forked child, so load and warm once
+        ser.start(watch=False)
+    else:
+        # A TensorFlow runtime that has run anything deadlocks after fork(); share
+        # its imports here and load the models in each worker, so nothing of the
+        # models themselves is shared and memory grows with --workers
+        print("Backend keras: every worker loads its own copy of the models; "
+              "export them with export_model.py and use --backend tflite to share one")
+        import metrics
+        import tensorflow  # noqa: F401
+
+        with metrics.paused():
+            warm_up_features()
+    # Keep the garbage collector from touching (and so copying) the preloaded objects
+    gc.collect()
+    gc.freeze()
+
+    counts = mp.Array("q", args.workers)
+    pids = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(index, listener, ser, counts, preloaded)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(1)
+        pids[index] = pid
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for index in range(args.workers):
+        spawn(index)
+    print(f"Pre-fork server on {args.host}:{args.port}: {args.workers} workers x {threads} threads "
+          f"({cpus} CPUs), backend {ser.INFERENCE_BACKEND}, "
+          f"models {'shared from the master' if preloaded else 'loaded per worker'}")
+
+    started = last_report = time.perf_counter()
+    last_counts = list(counts)
+    while not stopping:
+        time.sleep(0.5)
+        for index, pid in list(pids.items()):
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done and not stopping:
+                print(f"Worker {index} (pid {pid}) exited with status {status}; restarting")
+                time.sleep(RESPAWN_DELAY_SECONDS)
+                spawn(index)
+        elapsed = time.perf_counter() - last_report
+        if elapsed >= args.report_seconds and list(counts) != last_counts:
+            print_report(pids, counts, last_counts, elapsed)
+            last_counts = list(counts)
+            last_report = time.perf_counter()
+
+    print("\nSince startup:")
+    print_report(pids, counts, [0] * args.workers, time.perf_counter() - started)
+    for pid in pids.values():
+        os.kill(pid, signal.SIGTERM)
+    for pid in pids.values():
+        os.waitpid(pid, 0)
+
+
+if __name__ == "__main__":
+    main()
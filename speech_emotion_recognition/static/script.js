@@ -4,6 +4,11 @@ let audioChunks = [];
 let isRecording = false;
 let recordedBlob = null;
 let uploadedFile = null;
+let liveSocket = null;
+let livePending = [];
+
+// MediaRecorder chunk length for live streaming (ms)
+const LIVE_TIMESLICE_MS = 250;
 
 // DOM elements
 const recordBtn = document.getElementById('recordBtn');
@@ -68,10 +73,12 @@ async function startRecording() {
         });
         
         audioChunks = [];
+        openLiveSocket();
         
         mediaRecorder.ondataavailable = (event) => {
             if (event.data.size > 0) {
                 audioChunks.push(event.data);
+                sendLiveChunk(event.data);
             }
         };
         
@@ -79,12 +86,14 @@ async function startRecording() {
             recordedBlob = new Blob(audioChunks, { type: 'audio/webm' });
             uploadedFile = null; // Clear uploaded file
             enableAnalyzeButton();
+            closeLiveSocket();
             
             // Stop all tracks to release microphone
             stream.getTracks().forEach(track => track.stop());
         };
         
-        mediaRecorder.start();
+        // Emit chunks while recording so the server can analyze them live
+        mediaRecorder.start(LIVE_TIMESLICE_MS);
         isRecording = true;
         
         // Update UI
@@ -117,6 +126,60 @@ function stopRecording() {
     }
 }
 
+function openLiveSocket() {
+    if (!('WebSocket' in window)) {
+        return;
+    }
+    
+    livePending = [];
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    
+    try {
+        liveSocket = new WebSocket(`${protocol}//${window.location.host}/stream`);
+    } catch (error) {
+        console.warn('Live streaming unavailable:', error);
+        liveSocket = null;
+        return;
+    }
+    
+    liveSocket.onopen = () => {
+        liveSocket.send(JSON.stringify({ type: 'start', format: 'webm' }));
+        livePending.forEach(chunk => liveSocket.send(chunk));
+        livePending = [];
+    };
+    
+    liveSocket.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.type === 'update') {
+            displayResult(message, { scroll: false });
+        } else if (message.type === 'done' || message.type === 'error') {
+            liveSocket.close();
+        }
+    };
+    
+    liveSocket.onerror = () => {
+        console.warn('Live streaming connection failed; use Analyze after recording.');
+    };
+}
+
+function sendLiveChunk(chunk) {
+    if (!liveSocket) {
+        return;
+    }
+    if (liveSocket.readyState === WebSocket.CONNECTING) {
+        livePending.push(chunk);
+    } else if (liveSocket.readyState === WebSocket.OPEN) {
+        liveSocket.send(chunk);
+    }
+}
+
+function closeLiveSocket() {
+    if (liveSocket && liveSocket.readyState === WebSocket.OPEN) {
+        // The server flushes the remaining windows, sends "done" and we close then
+        liveSocket.send(JSON.stringify({ type: 'stop' }));
+    }
+}
+
 function handleFileUpload(event) {
     const file = event.target.files[0];
     if (file) {
@@ -184,7 +247,7 @@ async function convertToWav(webmBlob) {
     return webmBlob;
 }
 
-function displayResult(result) {
+function displayResult(result, options = {}) {
     const emotionEmoji = document.getElementById('emotionEmoji');
     const emotionName = document.getElementById('emotionName');
     const confidenceScore = document.getElementById('confidenceScore');
@@ -198,7 +261,8 @@ function displayResult(result) {
         'Neutral': '😐',
         'Fear': '😨',
         'Disgust': '🤢',
-        'Surprise': '😲'
+        'Surprise': '😲',
+        'No speech': '🤫'
     };
     
     // Update main result
@@ -215,8 +279,10 @@ function displayResult(result) {
     // Show result section
     resultSection.style.display = 'block';
     
-    // Scroll to result
-    resultSection.scrollIntoView({ behavior: 'smooth' });
+    // Scroll to result (live updates leave the page where it is)
+    if (options.scroll !== false) {
+        resultSection.scrollIntoView({ behavior: 'smooth' });
+    }
 }
 
 function updateEmotionBreakdown(probabilities) {
@@ -0,0 +1,307 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from feature_spec import FeatureSpec
+from mfcc_engine import get_engine
+
+# Input a model without a sidecar spec was trained on: 16 kHz, 40 MFCCs, no normalization
+DEFAULT_SPEC = FeatureSpec(sample_rate=16000)
+
+
+class RingBuffer:
+    """Single-producer / single-consumer sample ring addressed by absolute position.
+
+    The producer (the audio callback) copies samples in and then publishes
+    the new total with a single attribute store, so it never takes a lock
+    and never blocks. The consumer reads any range that has not yet been
+    overwritten.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=np.float32)
+        self.written = 0
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if len(samples) > self.capacity:
+            samples = samples[-self.capacity:]
+        start = self.written % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:len(samples) - first] = samples[first:]
+        # Publishing the new position last makes the samples visible atomically
+        self.written += len(samples)
+
+    def read(self, start, count):
+        """Copy ``count`` samples beginning at absolute position ``start``"""
+        if start < self.written - self.capacity:
+            raise IndexError("Requested samples were already overwritten")
+        if start + count > self.written:
+            raise IndexError("Requested samples have not been written yet")
+        idx = (np.arange(start, start + count) % self.capacity)
+        return self._data[idx]
+
+
+class StreamingEmotionEngine:
+    """Gap-free emotion detection over overlapping sliding windows.
+
+    ``audio_callback`` (sounddevice ``InputStream`` signature) only copies
+    samples into a ring buffer and wakes the worker thread, so the
+    microphone keeps recording while features and inference run. The
+    worker computes each STFT frame once as soon as its samples are
+    available, keeps the log-mel frames in a second ring, and turns every
+    ``window_seconds`` span (advancing by ``hop_seconds``) into one mean
+    MFCC vector. Windows that become ready together are predicted in one
+    batch.
+
+    Sample rate, MFCC and STFT settings come from the model's ``FeatureSpec``
+    (``spec``). Frames are not centered, so window edges differ slightly from
+    ``librosa.feature.mfcc`` on the same span; everything in between matches.
+    ``trim`` does not apply to a continuous stream; callers size the windows
+    with the spec's ``fixed_duration``/``duration``.
+
+    With ``spec.normalize`` each window is treated as if it had gone through
+    ``librosa.util.normalize`` first. Peak scaling only shifts every log-mel
+    bin by the same amount, so this is applied to the 0th coefficient
+    instead of recomputing the frames.
+
+    With a ``VoiceActivityDetector`` as ``vad`` each frame is also flagged as
+    speech or silence when it is computed. Windows with too little speech
+    skip MFCC pooling and the model and are reported with ``speech=False``.
+    """
+
+    def __init__(self, predict_fn, labels, spec=DEFAULT_SPEC, window_seconds=2.0, hop_seconds=0.5,
+                 on_result=None, buffer_seconds=30.0, vad=None):
+        self.predict_fn = predict_fn
+        self.labels = list(labels)
+        self.spec = spec
+        self.sr = sr = spec.sample_rate
+        self.on_result = on_result or _print_result
+        self.normalize = spec.normalize
+        self.vad = vad
+
+        self.engine = get_engine(sr=sr, n_mfcc=spec.n_mfcc, n_fft=spec.n_fft,
+                                 hop_length=spec.hop_length, n_mels=spec.n_mels)
+        self.n_fft = self.engine.n_fft
+        self.hop_length = self.engine.hop_length
+
+        self.window_samples = int(window_seconds * sr)
+        self.hop_samples = int(hop_seconds * sr)
+        self.window_frames = 1 + (self.window_samples - self.n_fft) // self.hop_length
+        # The hop is rounded down to whole STFT frames so windows share frames exactly
+        self.hop_frames = max(1, self.hop_samples // self.hop_length)
+
+        self.samples = RingBuffer(int(buffer_seconds * sr))
+        frame_capacity = self.window_frames + 4 * self.hop_frames + int(buffer_seconds * sr) // self.hop_length
+        self._log_mel = np.zeros((frame_capacity, self.engine.n_mels), dtype=np.float32)
+        self._frame_peak = np.zeros(frame_capacity, dtype=np.float32)
+        self._frame_speech = np.ones(frame_capacity, dtype=bool)
+        self._frame_capacity = frame_capacity
+        self._frames_done = 0
+        self._valid_from = 0
+        self._next_window = 0
+
+        # (end_sample_position, arrival_time) for each callback block, for latency
+        self._arrivals = deque(maxlen=4096)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="streaming-engine", daemon=True)
+
+        self.latencies_ms = []
+        self.overflows = 0
+        self.windows_skipped = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def audio_callback(self, indata, frames, time_info, status):
+        """Producer side: copy the block into the ring and wake the worker"""
+        if status:
+            self.overflows += 1
+        block = indata[:, 0] if getattr(indata, "ndim", 1) > 1 else indata
+        self.samples.write(block)
+        self._arrivals.append((self.samples.written, time.perf_counter()))
+        self._wakeup.set()
+
+    def stop(self, drain=True):
+        """Stop the worker; with ``drain`` every complete window is still processed"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if drain:
+            self._process_available()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            self._process_available()
+
+    def _update_frames(self):
+        """Compute log-mel for every frame whose samples have fully arrived"""
+        written = self.samples.written
+        available = 0 if written < self.n_fft else 1 + (written - self.n_fft) // self.hop_length
+        if available <= self._frames_done:
+            return
+
+        # Frames whose samples already fell out of the ring are skipped, not recomputed
+        first = max(self._frames_done, (written - self.samples.capacity) // self.hop_length + 1)
+        if first > self._frames_done:
+            self._valid_from = first
+        start = first * self.hop_length
+        span = (available - 1) * self.hop_length + self.n_fft - start
+        audio = self.samples.read(start, span)
+        frames = self.engine.frame(audio, center=False)
+        log_mel = self.engine.log_mel_frames(frames)
+
+        idx = np.arange(first, first + len(log_mel)) % self._frame_capacity
+        self._log_mel[idx] = log_mel
+        self._frame_peak[idx] = np.abs(frames).max(axis=-1)
+        if self.vad is not None:
+            self._frame_speech[idx] = self.vad.frame_activity(frames)
+        self._frames_done = available
+
+    def _process_available(self):
+        self._update_frames()
+
+        windows = []
+        while self._next_window + self.window_frames <= self._frames_done:
+            windows.append(self._next_window)
+            self._next_window += self.hop_frames
+        # If the worker fell far behind, skip to windows whose frames are all still valid
+        oldest = max(self._valid_from, self._frames_done - self._frame_capacity)
+        windows = [w for w in windows if w >= oldest]
+        if not windows:
+            return
+
+        speech = [self._window_has_speech(w) for w in windows]
+        voiced = [w for w, has_speech in zip(windows, speech) if has_speech]
+        if self.vad is not None:
+            self.vad.record_windows(len(windows), len(windows) - len(voiced))
+            self.windows_skipped += len(windows) - len(voiced)
+
+        probabilities = iter([])
+        if voiced:
+            features = np.stack([self._window_features(w) for w in voiced])
+            probabilities = iter(np.asarray(self.predict_fn(features)))
+        now = time.perf_counter()
+
+        for first_frame, has_speech in zip(windows, speech):
+            start = first_frame * self.hop_length
+            end = start + (self.window_frames - 1) * self.hop_length + self.n_fft
+            latency_ms = (now - self._arrival_time(end)) * 1000.0
+            self.latencies_ms.append(latency_ms)
+            if has_speech:
+                probs = next(probabilities)
+                idx = int(np.argmax(probs))
+                emotion, confidence = self.labels[idx], float(probs[idx])
+            else:
+                probs = np.zeros(len(self.labels))
+                emotion, confidence = "No speech", 0.0
+            self.on_result({
+                "start": start / self.sr,
+                "end": end / self.sr,
+                "emotion": emotion,
+                "confidence": confidence,
+                "probabilities": {label: float(p) for label, p in zip(self.labels, probs)},
+                "latency_ms": latency_ms,
+                "speech": has_speech,
+            })
+
+    def _window_has_speech(self, first_frame):
+        if self.vad is None:
+            return True
+        idx = np.arange(first_frame, first_frame + self.window_frames) % self._frame_capacity
+        return bool(self._frame_speech[idx].mean() >= self.vad.min_speech_fraction)
+
+    def _window_features(self, first_frame):
+        idx = np.arange(first_frame, first_frame + self.window_frames) % self._frame_capacity
+        features = self.engine.mfcc_from_log_mel(self._log_mel[idx]).mean(axis=0)
+        if self.normalize:
+            # Frames tile the window, so the window peak is the largest frame peak
+            peak = float(self._frame_peak[idx].max())
+            if peak > 0:
+                features[0] -= 20.0 * np.log10(peak) * np.sqrt(self.engine.n_mels)
+        return features
+
+    def _arrival_time(self, end_position):
+        """Arrival time of the callback block that delivered sample ``end_position``"""
+        # list() snapshots the deque in one step while the callback keeps appending
+        for position, arrived in list(self._arrivals):
+            if position >= end_position:
+                return arrived
+        return time.perf_counter()
+
+    def latency_summary(self):
+        if not self.latencies_ms:
+            return {"windows": 0}
+        lat = np.asarray(self.latencies_ms)
+        return {
+            "windows": int(lat.size),
+            "windows_skipped": self.windows_skipped,
+            "mean_ms": float(lat.mean()),
+            "p50_ms": float(np.percentile(lat, 50)),
+            "p95_ms": float(np.percentile(lat, 95)),
+            "max_ms": float(lat.max()),
+        }
+
+
+def _print_result(result):
+    print(f"[{result['start']:6.2f}s - {result['end']:6.2f}s] {result['emotion']:<10} "
+          f"{result['confidence'] * 100:5.1f}%  latency {result['latency_ms']:.1f} ms")
+
+
+def run_microphone(engine, block_seconds=0.1):
+    """Feed the engine from the default microphone until Ctrl+C"""
+    import sounddevice as sd
+
+    engine.start()
+    try:
+        with sd.InputStream(samplerate=engine.sr, channels=1, dtype="float32",
+                            blocksize=int(block_seconds * engine.sr),
+                            callback=engine.audio_callback):
+            while True:
+                time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop(drain=False)
+
+
+def run_wav_file(engine, path, block_seconds=0.1, realtime=True):
+    """Feed the engine from a WAV file as if it were a microphone.
+
+    With ``realtime`` blocks are delivered at the file's own pace, so the
+    reported latencies are what a live stream would see.
+    """
+    import librosa
+    import soundfile as sf
+
+    engine.start()
+    block = int(block_seconds * engine.sr)
+    with sf.SoundFile(path) as f:
+        audio = f.read(dtype="float32", always_2d=True).mean(axis=1)
+        if f.samplerate != engine.sr:
+            audio = librosa.resample(audio, orig_sr=f.samplerate, target_sr=engine.sr,
+                                     res_type=engine.spec.res_type)
+
+    t0 = time.perf_counter()
+    for i, start in enumerate(range(0, len(audio), block)):
+        if realtime:
+            delay = t0 + (start + block) / engine.sr - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        chunk = audio[start:start + block]
+        engine.audio_callback(chunk[:, np.newaxis], len(chunk), None, None)
+
+    # Give the worker a moment to pick up the final block before draining
+    time.sleep(0.05)
+    engine.stop(drain=True)
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from aiohttp import FormData
+from aiohttp.test_utils import TestClient, TestServer
+
+import async_server
+import request_profiler
+from batch_uploads import MAX_FILES
+from request_profiler import RequestProfile
+
+CLIP = b"RIFF" + bytes(1020)
+
+
+class FakeModel:
+    key = "fake:1"
+    feature_spec = None
+    batcher = SimpleNamespace(max_batch_size=8)
+
+    def release(self):
+        pass
+
+
+class FakeSummary:
+    def __init__(self, n_files):
+        self.counts = {"files": n_files, "succeeded": 0, "failed": 0, "inference_calls": 0}
+
+    def line(self, index, name, result):
+        self.counts["succeeded" if result.get("success") else "failed"] += 1
+        return json.dumps(dict(result, index=index, file=name)) + "\n"
+
+    def done(self):
+        return json.dumps(dict(self.counts, done=True)) + "\n"
+
+
+def fake_ser(cached=()):
+    """The parts of app.py that /predict_batch uses; names in ``cached`` are cache hits"""
+    return SimpleNamespace(
+        registry=SimpleNamespace(acquire=lambda name, version: FakeModel()),
+        BatchSummary=FakeSummary,
+        batch_lookup=lambda audio_bytes, model: (audio_bytes, {"success": True, "cached": True}
+                                                 if audio_bytes in cached else None),
+        score_batch_rows=lambda ready, model: [(index, name, {"success": True}) for index, name, *_ in ready],
+    )
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Records the most decodes ever in flight at once"""
+    state = {"running": 0, "peak": 0, "calls": 0}
+    lock = threading.Lock()
+
+    def extract(audio_bytes, extension, spec):
+        with lock:
+            state["running"] += 1
+            state["calls"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.01)
+        with lock:
+            state["running"] -= 1
+        return np.zeros(4), {}, None, {"stages": {}, "counts": []}
+
+    monkeypatch.setattr(async_server, "extract_features_traced", extract)
+    return state
+
+
+def post_batch(server, files):
+    async def run():
+        server.decode_pool.shutdown()
+        # Threads stand in for the spawned decode processes
+        server.decode_pool = ThreadPoolExecutor(max_workers=8)
+        async with TestClient(TestServer(server.make_app())) as client:
+            form = FormData()
+            for name, data in files:
+                form.add_field("files", data, filename=name)
+            response = await client.post("/predict_batch", data=form)
+            return response.status, [json.loads(line) for line in (await response.text()).splitlines()]
+    return asyncio.run(run())
+
+
+def test_batch_larger_than_max_pending_is_admitted_file_by_file(decodes):
+    server = async_server.AsyncServer(fake_ser(), decode_workers=1, inference_threads=1, max_pending=4)
+    files = [(f"clip{i}.wav", CLIP + bytes([i])) for i in range(MAX_FILES)]
+    status, lines = post_batch(server, files)
+    assert status == 200
+    assert lines[-1]["done"] and lines[-1]["succeeded"] == MAX_FILES
+    assert decodes["calls"] == MAX_FILES
+    assert 1 <= decodes["peak"] <= 4
+    assert server.pending == 0
+
+
+def test_cache_hits_take_no_decode_slot(decodes):
+    hits = {CLIP + bytes([i]) for i in range(3)}
+    server = async_server.AsyncServer(fake_ser(hits), decode_workers=1, inference_threads=1, max_pending=1)
+    status, lines = post_batch(server, [(f"clip{i}.wav", CLIP + bytes([i])) for i in range(5)])
+    assert status == 200
+    assert sum(1 for line in lines if line.get("cached")) == 3
+    assert lines[-1]["succeeded"] == 5
+    assert decodes["calls"] == 2
+
+
+def test_profiled_pool_work_accepts_the_longest_request_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(request_profiler, "PROFILE_DIR", str(tmp_path))
+    server = async_server.AsyncServer(fake_ser(), decode_workers=1, inference_threads=1)
+    request_id = "r" * 64
+
+    async def run():
+        with RequestProfile(request_id, profile_thread=False) as profile:
+            first = await server._run(server.inference_pool, sum, [1, 2], profile=profile)
+            second = await server._run(server.inference_pool, max, [1, 2], profile=profile)
+        return profile, first, second
+
+    try:
+        profile, first, second = asyncio.run(run())
+    finally:
+        server.decode_pool.shutdown()
+        server.inference_pool.shutdown()
+    assert (first, second) == (3, 2)
+    assert profile.request_id == request_id
+    assert len(profile.extra_stats) == 2
+    assert profile.save().endswith(request_id + ".prof")
+    assert sorted(p.name for p in tmp_path.iterdir()) == [request_id + ".json", request_id + ".prof"]
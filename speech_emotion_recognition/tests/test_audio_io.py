@@ -0,0 +1,79 @@
+import io
+
+import numpy as np
+import pytest
+
+from audio_io import decode_in_memory, decode_window
+from create_test_audio import create_corpus
+
+pytest.importorskip("av")
+
+FORMATS = ("wav", "mp3", "mp4", "webm")
+CLIP_SECONDS = 10
+# (offset, duration): from the start, before and past the seek threshold, to the end
+WINDOWS = [(0.0, 3.0), (0.5, 3.0), (2.0, 3.0), (4.25, 2.5), (8.0, None)]
+
+
+@pytest.fixture(scope="module")
+def clips(tmp_path_factory):
+    paths = create_corpus(str(tmp_path_factory.mktemp("corpus")), durations=(CLIP_SECONDS,), formats=FORMATS)
+    return {fmt: open(path, "rb").read() for fmt, path in zip(FORMATS, paths)}
+
+
+def full_slice(data, offset, duration):
+    full, sr, _ = decode_window(data, sr=None)
+    start = int(round(offset * sr))
+    stop = None if duration is None else start + int(round(duration * sr))
+    return full[start:stop]
+
+
+# Windows are cut at the native rate; resampled ones follow librosa.load, tested below
+@pytest.mark.parametrize("fmt", FORMATS)
+@pytest.mark.parametrize("offset, duration", WINDOWS)
+def test_native_window_matches_full_decode(clips, fmt, offset, duration):
+    window, window_sr, info = decode_window(clips[fmt], sr=None, offset=offset, duration=duration)
+    expected = full_slice(clips[fmt], offset, duration)
+
+    assert window_sr == info["sample_rate"]
+    assert len(window) == len(expected)
+    np.testing.assert_allclose(window, expected, atol=1e-6)
+
+
+# libsndfile reads MP3 but not MP4 or WebM, so those have no librosa.load to compare with
+@pytest.mark.parametrize("fmt", ["wav", "mp3"])
+@pytest.mark.parametrize("res_type", ["soxr_hq", "polyphase"])
+@pytest.mark.parametrize("offset, duration", WINDOWS)
+def test_resampled_window_matches_librosa_load(clips, fmt, res_type, offset, duration):
+    librosa = pytest.importorskip("librosa")
+    window, _, info = decode_window(clips[fmt], sr=16000, offset=offset, duration=duration, res_type=res_type)
+    # librosa.load's own window, cut from a full decode: libsndfile seeks MP3
+    # without refilling the bit reservoir, so its first frames after a seek are off
+    native, native_sr = librosa.load(io.BytesIO(clips[fmt]), sr=None)
+    start = int(round(offset * native_sr))
+    stop = None if duration is None else start + int(round(duration * native_sr))
+    expected = librosa.resample(native[start:stop], orig_sr=native_sr, target_sr=16000, res_type=res_type)
+
+    assert info["resampler"] == res_type
+
+    assert len(window) == len(expected)
+    np.testing.assert_allclose(window, expected, atol=1e-6)
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_late_window_seeks_instead_of_decoding_the_clip(clips, fmt):
+    _, _, info = decode_window(clips[fmt], sr=16000, offset=8.0, duration=1.0)
+    assert info["seeked"]
+    assert info["decoded_seconds"] < 3.0
+
+
+def test_path_and_bytes_decode_the_same(clips, tmp_path):
+    path = tmp_path / "clip.mp3"
+    path.write_bytes(clips["mp3"])
+    from_path, _, _ = decode_window(str(path), sr=16000, offset=2.0, duration=3.0)
+    from_bytes, _, _ = decode_in_memory(clips["mp3"], sr=16000, offset=2.0, duration=3.0)
+    np.testing.assert_array_equal(from_path, from_bytes)
+
+
+def test_unsniffable_bytes_are_refused():
+    with pytest.raises(ValueError):
+        decode_in_memory(b"definitely not audio" * 10)
@@ -0,0 +1,109 @@
+import io
+import random
+import tarfile
+import zipfile
+
+import pytest
+
+from batch_uploads import BatchTooLarge, unpack_uploads
+
+CLIP = b"RIFF" + bytes(1020)
+# Incompressible, so cutting an archive in half always cuts into member data
+NOISE = random.Random(0).randbytes(64 * 1024)
+
+
+def make_zip(members, compression=zipfile.ZIP_DEFLATED):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def make_tar(members, mode="w:gz", links=()):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+        for name, target in links:
+            info = tarfile.TarInfo(name)
+            info.type = tarfile.SYMTYPE
+            info.linkname = target
+            archive.addfile(info)
+    return buffer.getvalue()
+
+
+def test_plain_uploads_pass_through():
+    items = unpack_uploads([("a.wav", CLIP), ("b.mp3", b"ID3" + bytes(100))])
+    assert [name for name, _ in items] == ["a.wav", "b.mp3"]
+    assert items[0][1] == CLIP
+
+
+@pytest.mark.parametrize("make", [make_zip, make_tar])
+def test_archives_keep_only_audio_members(make):
+    archive = make({
+        "clips/a.wav": CLIP,
+        "clips/b.FLAC": CLIP,
+        "clips/notes.txt": b"not audio",
+        "clips/.hidden.wav": CLIP,
+        "__MACOSX/clips/._a.wav": CLIP,
+    })
+    items = unpack_uploads([("clips.archive", archive)])
+    assert sorted(name for name, _ in items) == ["clips/a.wav", "clips/b.FLAC"]
+    assert all(data == CLIP for _, data in items)
+
+
+def test_tar_links_are_not_followed():
+    archive = make_tar({"a.wav": CLIP}, links=[("link.wav", "/etc/passwd")])
+    assert [name for name, _ in unpack_uploads([("clips.tgz", archive)])] == ["a.wav"]
+
+
+def test_member_count_is_limited_across_uploads():
+    archive = make_zip({f"{i}.wav": CLIP for i in range(3)})
+    assert len(unpack_uploads([("one.zip", archive), ("x.wav", CLIP)], max_files=4)) == 4
+    with pytest.raises(BatchTooLarge, match="More than 3 files"):
+        unpack_uploads([("one.zip", archive), ("x.wav", CLIP)], max_files=3)
+
+
+@pytest.mark.parametrize("make", [make_zip, make_tar])
+def test_byte_budget_counts_extracted_sizes(make):
+    # Highly compressible members: the archive is small, the contents are not
+    archive = make({f"{i}.wav": bytes(400 * 1024) for i in range(3)})
+    assert len(archive) < 100 * 1024
+    assert len(unpack_uploads([("big.archive", archive)], max_total_mb=1.5)) == 3
+    with pytest.raises(BatchTooLarge, match="larger than 1 MB"):
+        unpack_uploads([("big.archive", archive)], max_total_mb=1)
+
+
+def test_understated_zip_member_size_is_rejected():
+    archive = bytearray(make_zip({"a.wav": bytes(300 * 1024)}, compression=zipfile.ZIP_STORED))
+    # Rewrite the central directory's uncompressed size to claim a 1 KB member
+    central = archive.rindex(b"PK\x01\x02")
+    archive[central + 24:central + 28] = (1024).to_bytes(4, "little")
+    with pytest.raises(ValueError, match="liar.zip: corrupt member a.wav"):
+        unpack_uploads([("liar.zip", bytes(archive))], max_total_mb=0.25)
+
+
+def test_corrupt_zip_member_is_a_value_error():
+    archive = bytearray(make_zip({"a.wav": bytes(range(256)) * 256, "b.wav": CLIP}))
+    data_start = 30 + len("a.wav")
+    archive[data_start:data_start + 32] = b"\xff" * 32
+    with pytest.raises(ValueError, match="bad.zip: corrupt member a.wav") as raised:
+        unpack_uploads([("bad.zip", bytes(archive))])
+    assert not isinstance(raised.value, BatchTooLarge)
+
+
+@pytest.mark.parametrize("name, make, kwargs", [
+    ("cut.zip", make_zip, {}),
+    ("cut.tar", make_tar, {"mode": "w"}),
+    ("cut.tgz", make_tar, {"mode": "w:gz"}),
+    ("cut.tbz", make_tar, {"mode": "w:bz2"}),
+    ("cut.txz", make_tar, {"mode": "w:xz"}),
+])
+def test_truncated_archives_are_value_errors(name, make, kwargs):
+    archive = make({"a.wav": NOISE, "b.wav": NOISE}, **kwargs)
+    with pytest.raises(ValueError, match=name) as raised:
+        unpack_uploads([(name, archive[:len(archive) // 2])])
+    assert not isinstance(raised.value, BatchTooLarge)
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from export_model import load_cached_features
+from feature_shards import write_shards
+from feature_spec import FeatureSpec
+
+# What Preprocess.py writes, and a model trained on the old 22050 Hz serving features
+PREPROCESS_SPEC = FeatureSpec(sample_rate=16000, trim=True, normalize=True, fixed_duration=3)
+SERVING_SPEC = FeatureSpec(sample_rate=22050, offset=0.5, duration=3, normalize=True)
+
+
+@pytest.fixture
+def shards(tmp_path):
+    X = np.random.default_rng(0).standard_normal((10, 40)).astype(np.float32)
+    write_shards(str(tmp_path), X, np.zeros(10, dtype=np.int64), PREPROCESS_SPEC.to_config())
+    return str(tmp_path), X
+
+
+def test_shards_with_the_model_spec_are_loaded(shards):
+    path, X = shards
+    np.testing.assert_array_equal(load_cached_features(path, 40, PREPROCESS_SPEC), X)
+
+
+def test_shards_with_another_spec_are_refused(shards):
+    path, _ = shards
+    with pytest.raises(ValueError, match="sample_rate=16000 \\(model 22050\\)"):
+        load_cached_features(path, 40, SERVING_SPEC)
+
+
+def test_only_database_rows_of_the_model_spec_are_read(tmp_path):
+    feature_store = pytest.importorskip("feature_store")
+    db = str(tmp_path / "features.db")
+    clip = tmp_path / "clip.wav"
+    clip.write_bytes(b"")
+    with feature_store.FeatureStore(db) as store:
+        store.put_many([(str(clip), clip.stat(), np.ones(40))], PREPROCESS_SPEC.to_config())
+        store.put_many([(str(clip), clip.stat(), np.zeros(40))], SERVING_SPEC.to_config())
+
+    np.testing.assert_array_equal(load_cached_features(db, 40, PREPROCESS_SPEC), np.ones((1, 40)))
+    with pytest.raises(ValueError, match="no features"):
+        load_cached_features(db, 40, FeatureSpec(n_mfcc=13))
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+import feature_cache
+from feature_cache import FeatureCache, make_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(feature_cache.time, "monotonic", clock)
+    return clock
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = FeatureCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", np.zeros(2), np.zeros(3))
+    cache.put("b", np.ones(2), np.ones(3))
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    cache.put("c", np.full(2, 2.0), np.full(3, 2.0))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    np.testing.assert_array_equal(cache.get("c").features, [2.0, 2.0])
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 2
+
+
+def test_putting_an_existing_key_refreshes_it():
+    cache = FeatureCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", np.zeros(2), np.zeros(3))
+    cache.put("b", np.zeros(2), np.zeros(3))
+    cache.put("a", np.ones(2), np.ones(3))
+    cache.put("c", np.zeros(2), np.zeros(3))
+
+    assert cache.get("b") is None
+    np.testing.assert_array_equal(cache.get("a").probabilities, np.ones(3))
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = FeatureCache(max_entries=10, ttl_seconds=30)
+    cache.put("a", np.zeros(2), np.zeros(3))
+
+    clock.now += 29
+    assert cache.get("a") is not None
+    clock.now += 1
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["evictions"]) == (0, 1, 1, 1)
+
+
+def test_reading_an_entry_does_not_extend_its_ttl(clock):
+    cache = FeatureCache(max_entries=10, ttl_seconds=30)
+    cache.put("a", np.zeros(2), np.zeros(3))
+    for _ in range(3):
+        clock.now += 10
+        cache.get("a")
+    assert cache.get("a") is None
+
+
+def test_zero_max_entries_disables_caching():
+    cache = FeatureCache(max_entries=0)
+    cache.put("a", np.zeros(2), np.zeros(3))
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_cache_key_covers_bytes_params_and_model():
+    params = {"sample_rate": 22050, "n_mfcc": 40}
+    key = make_cache_key(b"clip", params, "model:1")
+
+    assert key == make_cache_key(b"clip", dict(reversed(list(params.items()))), "model:1")
+    assert key != make_cache_key(b"clip2", params, "model:1")
+    assert key != make_cache_key(b"clip", dict(params, n_mfcc=20), "model:1")
+    assert key != make_cache_key(b"clip", params, "model:2")
@@ -0,0 +1,68 @@
+import pytest
+
+from feature_spec import SPEC_VERSION, FeatureSpec
+
+
+def test_config_round_trip():
+    spec = FeatureSpec(sample_rate=16000, offset=0.5, duration=3, trim=True, normalize=True,
+                       fixed_duration=3, n_mfcc=20, pooling="frames")
+    config = spec.to_config()
+    assert config == {"sr": 16000, "offset": 0.5, "duration": 3, "trim": True, "normalize": True,
+                      "fixed_duration": 3, "n_mfcc": 20, "pooling": "frames"}
+    assert FeatureSpec.from_config(config) == spec
+
+
+def test_to_config_drops_unset_values():
+    config = FeatureSpec(sample_rate=16000).to_config()
+    assert "duration" not in config and "fixed_duration" not in config
+    assert FeatureSpec.from_config(config) == FeatureSpec(sample_rate=16000)
+
+
+def test_from_config_keeps_defaults_for_missing_keys_and_applies_overrides():
+    spec = FeatureSpec.from_config({"sr": 16000, "n_mfcc": 40, "unrelated": 1}, n_fft=1024)
+    assert spec == FeatureSpec(sample_rate=16000, n_mfcc=40, n_fft=1024)
+
+
+def test_dict_round_trip():
+    spec = FeatureSpec(sample_rate=44100, n_fft=4096, hop_length=1024, res_type="soxr_vhq")
+    assert FeatureSpec.from_dict(spec.to_dict()) == spec
+    assert spec.to_dict()["version"] == SPEC_VERSION
+
+
+def test_from_dict_refuses_other_versions_and_unknown_fields():
+    with pytest.raises(ValueError, match="version"):
+        FeatureSpec.from_dict(dict(FeatureSpec().to_dict(), version=SPEC_VERSION + 1))
+    with pytest.raises(ValueError, match="center"):
+        FeatureSpec.from_dict(dict(FeatureSpec().to_dict(), center=True))
+
+
+def test_check_servable_accepts_a_matching_model():
+    FeatureSpec(n_mfcc=40).check_servable(40)
+
+
+@pytest.mark.parametrize("spec, n_features, message", [
+    (FeatureSpec(n_mfcc=40), 20, "40 MFCCs but the model takes 20"),
+    (FeatureSpec(pooling="frames"), 40, "pooling 'frames' cannot be served"),
+    (FeatureSpec(n_mfcc=80, n_mels=64), 80, "80 MFCCs from 64 mel bands"),
+])
+def test_check_servable_refuses(spec, n_features, message):
+    with pytest.raises(ValueError, match=message):
+        spec.check_servable(n_features)
+
+
+@pytest.mark.parametrize("spec, seconds", [
+    (FeatureSpec(duration=3), 3),
+    (FeatureSpec(duration=3, fixed_duration=5), 3),
+    (FeatureSpec(fixed_duration=4), 4),
+    (FeatureSpec(fixed_duration=4, trim=True), None),
+    (FeatureSpec(fixed_duration=4, normalize=True), None),
+    (FeatureSpec(), None),
+])
+def test_decode_seconds(spec, seconds):
+    assert spec.decode_seconds() == seconds
+
+
+def test_differences():
+    assert FeatureSpec().differences(FeatureSpec()) == {}
+    assert FeatureSpec(n_mfcc=40).differences(FeatureSpec(n_mfcc=20, trim=True)) == {
+        "n_mfcc": (40, 20), "trim": (False, True)}
@@ -0,0 +1,102 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from inference_batcher import InferenceBatcher
+
+
+class RecordingModel:
+    """Stand-in model: returns each row's sum and remembers every batch size"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, inputs):
+        self.batch_sizes.append(len(inputs))
+        return inputs.sum(axis=1, keepdims=True)
+
+
+def test_full_batch_flushes_without_waiting():
+    model = RecordingModel()
+    batcher = InferenceBatcher(model, max_batch_size=4, max_wait_ms=10000)
+    try:
+        began = time.perf_counter()
+        out = batcher.predict_batch(np.arange(8, dtype=np.float32).reshape(4, 2))
+        assert time.perf_counter() - began < 5.0
+    finally:
+        batcher.close()
+    assert model.batch_sizes == [4]
+    np.testing.assert_allclose(out[:, 0], [1, 5, 9, 13])
+
+
+def test_rows_beyond_max_batch_size_go_to_the_next_batch():
+    model = RecordingModel()
+    batcher = InferenceBatcher(model, max_batch_size=3, max_wait_ms=50)
+    try:
+        out = batcher.predict_batch(np.ones((7, 2)))
+    finally:
+        batcher.close()
+    assert model.batch_sizes == [3, 3, 1]
+    assert out.shape == (7, 1)
+
+
+def test_partial_batch_flushes_after_max_wait():
+    model = RecordingModel()
+    batcher = InferenceBatcher(model, max_batch_size=32, max_wait_ms=100)
+    try:
+        began = time.perf_counter()
+        result = batcher.predict(np.array([1.0, 2.0]))
+        elapsed = time.perf_counter() - began
+    finally:
+        batcher.close()
+    assert model.batch_sizes == [1]
+    assert result[0] == pytest.approx(3.0)
+    assert elapsed >= 0.09
+
+
+def test_concurrent_rows_within_max_wait_share_a_batch():
+    model = RecordingModel()
+    batcher = InferenceBatcher(model, max_batch_size=32, max_wait_ms=500)
+    results = {}
+
+    def call(i):
+        results[i] = batcher.predict(np.full(2, float(i)))
+
+    try:
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        batcher.close()
+    assert sum(model.batch_sizes) == 5
+    assert len(model.batch_sizes) < 5
+    assert {i: float(r[0]) for i, r in results.items()} == {i: 2.0 * i for i in range(5)}
+
+
+def test_model_errors_reach_every_caller_in_the_batch():
+    def broken(inputs):
+        raise RuntimeError("model exploded")
+
+    batcher = InferenceBatcher(broken, max_batch_size=4, max_wait_ms=1)
+    try:
+        with pytest.raises(RuntimeError, match="model exploded"):
+            batcher.predict_batch(np.ones((2, 2)))
+    finally:
+        batcher.close()
+
+
+def test_closed_batcher_refuses_new_rows():
+    batcher = InferenceBatcher(RecordingModel(), max_batch_size=4, max_wait_ms=1)
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.predict(np.ones(2))
+
+
+@pytest.mark.parametrize("kwargs", [{"max_batch_size": 0}, {"max_wait_ms": -1}])
+def test_invalid_limits(kwargs):
+    with pytest.raises(ValueError):
+        InferenceBatcher(RecordingModel(), **kwargs)
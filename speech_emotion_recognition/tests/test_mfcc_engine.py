@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from feature_spec import FeatureSpec
+from mfcc_engine import get_engine
+
+librosa = pytest.importorskip("librosa")
+# librosa warns about the clip shorter than n_fft, which it still pads and transforms
+pytestmark = pytest.mark.filterwarnings("ignore:n_fft=.* is too large:UserWarning")
+
+SPECS = [FeatureSpec(), FeatureSpec(sample_rate=16000, n_mfcc=13)]
+# Shorter than one FFT frame, a partial last hop, and whole seconds
+LENGTHS = [1000, 2048, 22050 + 137, 3 * 22050]
+
+
+def clip(n_samples, seed=0):
+    """A tone over noise, so both the spectral peak and the top_db floor matter"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_samples) / 22050
+    return (0.5 * np.sin(2 * np.pi * 440 * t) + 0.05 * rng.standard_normal(n_samples)).astype(np.float32)
+
+
+def engine_for(spec):
+    return get_engine(sr=spec.sample_rate, n_mfcc=spec.n_mfcc, n_fft=spec.n_fft,
+                      hop_length=spec.hop_length, n_mels=spec.n_mels)
+
+
+def librosa_mfcc(y, spec):
+    return librosa.feature.mfcc(y=y, sr=spec.sample_rate, n_mfcc=spec.n_mfcc, n_fft=spec.n_fft,
+                                hop_length=spec.hop_length, n_mels=spec.n_mels)
+
+
+@pytest.mark.parametrize("spec", SPECS)
+@pytest.mark.parametrize("n_samples", LENGTHS)
+def test_frames_match_librosa(spec, n_samples):
+    y = clip(n_samples)
+    ours = engine_for(spec).mfcc(y)
+    expected = librosa_mfcc(y, spec).T
+
+    assert ours.shape == expected.shape
+    assert np.allclose(ours, expected, rtol=1e-5, atol=2e-4)
+
+
+@pytest.mark.parametrize("spec", SPECS)
+@pytest.mark.parametrize("n_samples", LENGTHS)
+def test_mean_mfcc_matches_librosa(spec, n_samples):
+    y = clip(n_samples)
+    expected = np.mean(librosa_mfcc(y, spec).T, axis=0)
+    assert np.allclose(engine_for(spec).mean_mfcc(y), expected, rtol=1e-5, atol=2e-4)
+
+
+@pytest.mark.parametrize("spec", SPECS)
+def test_batch_matches_clip_by_clip(spec):
+    batch = np.stack([clip(22050, seed) for seed in range(5)])
+    # A chunk size that leaves a partial last chunk
+    ours = engine_for(spec).mean_mfcc_batch(batch, chunk_size=2)
+    expected = np.stack([np.mean(librosa_mfcc(y, spec).T, axis=0) for y in batch])
+
+    assert ours.shape == (5, spec.n_mfcc)
+    assert np.allclose(ours, expected, rtol=1e-5, atol=2e-4)
+
+
+def test_silence_stays_finite():
+    spec = SPECS[0]
+    y = np.zeros(22050, dtype=np.float32)
+    assert np.allclose(engine_for(spec).mean_mfcc(y), np.mean(librosa_mfcc(y, spec).T, axis=0), atol=2e-4)
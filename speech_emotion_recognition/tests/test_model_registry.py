@@ -0,0 +1,34 @@
+from model_registry import ModelRegistry
+
+
+class FakeEntry:
+    def __init__(self, name, version):
+        self.name = name
+        self.version = version
+        self.key = f"{name}@{version}"
+
+    def describe(self):
+        return {"name": self.name, "version": self.version}
+
+
+def registry_with(default_name, *keys):
+    registry = ModelRegistry("unused", default_name=default_name)
+    for key in keys:
+        registry._entries[key] = FakeEntry(*key.split("@"))
+    return registry
+
+
+def test_describe_marks_the_highest_version_of_the_default():
+    described = registry_with("a", "a@1", "a@2", "b@1").describe()
+    assert described["default"] == "a@2"
+    assert [m["default"] for m in described["models"]] == [False, True, False]
+
+
+def test_describe_without_the_default_model_loaded():
+    described = registry_with("missing", "b@1").describe()
+    assert described["default"] is None
+    assert described["models"] == [{"name": "b", "version": "1", "default": False}]
+
+
+def test_describe_an_empty_registry():
+    assert registry_with("a").describe() == {"default": None, "models": []}
@@ -1,11 +1,12 @@
 import os
-import librosa
-import numpy as np
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, Dropout
-from tensorflow.keras.utils import to_categorical
 from sklearn.model_selection import train_test_split
 
+from feature_spec import FeatureSpec
+from input_pipeline import ThroughputCallback, file_dataset
+from model_registry import save_model_metadata
+
 emotions = {
     "angry": 0,
     "happy": 1,
@@ -13,25 +14,28 @@ emotions = {
     "neutral": 3
 }
 
-X = []
+files = []
 y = []
 
-def extract(file):
-    audio, sr = librosa.load(file, duration=3, offset=0.5)
-    mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=40)
-    return np.mean(mfcc.T, axis=0)
+# Features are extracted on the fly by tf.data, in parallel with training;
+# the spec is saved with the model so serving extracts the same features
+FEATURE_SPEC = FeatureSpec(sample_rate=22050, n_mfcc=40, offset=0.5, duration=3)
+FEATURE_CONFIG = FEATURE_SPEC.to_config()
+BATCH_SIZE = 32
 
 for emotion in emotions:
     path = os.path.join("dataset", emotion)
     for file in os.listdir(path):
-        features = extract(os.path.join(path, file))
-        X.append(features)
+        files.append(os.path.join(path, file))
         y.append(emotions[emotion])
 
-X = np.array(X)
-y = to_categorical(y)
+files_train, files_test, y_train, y_test = train_test_split(files, y, test_size=0.2)
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2)
+train_ds = file_dataset(files_train, y_train, FEATURE_CONFIG, batch_size=BATCH_SIZE,
+                        num_classes=len(emotions))
+# Held out from training and extracted once, only for the final evaluation
+test_ds = file_dataset(files_test, y_test, FEATURE_CONFIG, batch_size=BATCH_SIZE,
+                       num_classes=len(emotions), shuffle_buffer=0, cache=False)
 
 model = Sequential([
     Dense(256, activation="relu", input_shape=(40,)),
@@ -46,8 +50,19 @@ model.compile(
     metrics=["accuracy"]
 )
 
-model.fit(X_train, y_train, epochs=30, batch_size=32)
+model.fit(train_ds, epochs=30, callbacks=[ThroughputCallback(BATCH_SIZE, n_samples=len(files_train))])
+
+test_loss, test_accuracy = model.evaluate(test_ds, verbose=0)
+print(f"Test accuracy: {test_accuracy:.4f} (loss {test_loss:.4f}) on {len(files_test)} files")
 
 model.save("model/emotion_model.h5")
+# Sidecar with the label order, so app.py can serve the model by name
+save_model_metadata(
+    "model/emotion_model.h5",
+    [name.capitalize() for name in sorted(emotions, key=emotions.get)],
+    name="emotion_4class",
+    input_shape=model.input_shape[1:],
+    feature_spec=FEATURE_SPEC,
+)
 
 print("MODEL SAVED SUCCESSFULLY")
@@ -0,0 +1,127 @@
+import threading
+
+import numpy as np
+
+
+class NoSpeechError(Exception):
+    """Raised when a clip has too little speech to be worth a prediction"""
+
+    def __init__(self, vad_info):
+        super().__init__("No speech detected")
+        self.vad_info = vad_info
+
+    def __reduce__(self):
+        # Survive the trip back from a process pool with vad_info intact
+        return NoSpeechError, (self.vad_info,)
+
+
+class VoiceActivityDetector:
+    """Energy / zero-crossing voice-activity detector over STFT-sized frames.
+
+    A frame counts as speech when its RMS level is above
+    ``energy_threshold_db`` (dBFS), or when it is at most ``weak_margin_db``
+    below that and crosses zero often (``zcr_threshold`` per sample), which
+    keeps quiet fricatives. Levels are measured on the raw signal, so run
+    this before any peak normalization: normalizing first would lift
+    background noise to speech level.
+
+    Everything is vectorized over frames, so gating a clip costs a fraction
+    of the MFCC extraction it can save. Callers report what they skipped
+    with ``record_clip`` and ``record_windows``; ``stats()`` sums it since
+    startup.
+    """
+
+    def __init__(self, energy_threshold_db=-45.0, weak_margin_db=10.0, zcr_threshold=0.25,
+                 frame_length=2048, hop_length=512, hangover_frames=4, min_speech_fraction=0.1):
+        self.energy_threshold_db = energy_threshold_db
+        self.weak_margin_db = weak_margin_db
+        self.zcr_threshold = zcr_threshold
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.hangover_frames = hangover_frames
+        self.min_speech_fraction = min_speech_fraction
+
+        self._lock = threading.Lock()
+        self._audio_seconds = 0.0
+        self._speech_seconds = 0.0
+        self._clips = 0
+        self._clips_skipped = 0
+        self._windows = 0
+        self._windows_skipped = 0
+
+    def frame_activity(self, frames):
+        """Speech flag per frame: (..., n_frames, frame_length) -> (..., n_frames) bool"""
+        frames = np.asarray(frames, dtype=np.float32)
+        rms_db = 10.0 * np.log10(np.mean(frames ** 2, axis=-1) + 1e-12)
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[..., 1:] != signs[..., :-1], axis=-1)
+        strong = rms_db > self.energy_threshold_db
+        weak = (rms_db > self.energy_threshold_db - self.weak_margin_db) & (zcr > self.zcr_threshold)
+        return strong | weak
+
+    def speech_mask(self, y):
+        """Per-sample speech mask, with ``hangover_frames`` of padding around each run"""
+        y = np.asarray(y, dtype=np.float32)
+        mask = np.zeros(len(y), dtype=bool)
+        if len(y) < self.frame_length:
+            frames = y[np.newaxis, :]
+        else:
+            frames = np.lib.stride_tricks.sliding_window_view(y, self.frame_length)[::self.hop_length]
+        active = self.frame_activity(frames)
+        if self.hangover_frames:
+            # Dilate active frames so word onsets and tails are not clipped
+            width = 2 * self.hangover_frames + 1
+            active = np.convolve(active.astype(np.int32), np.ones(width, dtype=np.int32), mode="same") > 0
+
+        # Mark each active frame's span with a +1/-1 difference array
+        starts = np.flatnonzero(active) * self.hop_length
+        edges = np.zeros(len(y) + 1, dtype=np.int32)
+        np.add.at(edges, starts, 1)
+        np.add.at(edges, np.minimum(starts + self.frame_length, len(y)), -1)
+        mask[:] = np.cumsum(edges[:-1]) > 0
+        return mask
+
+    def voiced_audio(self, y, sr):
+        """Keep only the voiced samples of ``y``; returns ``(voiced, vad_info)``"""
+        mask = self.speech_mask(y)
+        voiced = np.asarray(y)[mask]
+        info = {
+            "audio_seconds": round(len(y) / sr, 3),
+            "speech_seconds": round(len(voiced) / sr, 3),
+            "skipped_seconds": round((len(y) - len(voiced)) / sr, 3),
+        }
+        return voiced, info
+
+    def window_speech(self, active, window_frames, hop_frames, n_windows=None):
+        """Which sliding windows over per-frame ``active`` flags contain enough speech"""
+        counts = np.concatenate([[0], np.cumsum(active, dtype=np.int64)])
+        if n_windows is None:
+            n_windows = max(0, (len(active) - window_frames) // hop_frames + 1)
+        starts = np.arange(n_windows) * hop_frames
+        fraction = (counts[starts + window_frames] - counts[starts]) / window_frames
+        return fraction >= self.min_speech_fraction
+
+    def record_windows(self, total, skipped):
+        with self._lock:
+            self._windows += int(total)
+            self._windows_skipped += int(skipped)
+
+    def record_clip(self, vad_info, skipped):
+        """Count one gated clip; ``skipped`` is whether the caller dropped it as silent"""
+        with self._lock:
+            self._clips += 1
+            self._clips_skipped += int(skipped)
+            self._audio_seconds += vad_info["audio_seconds"]
+            self._speech_seconds += vad_info["speech_seconds"]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "clips": self._clips,
+                "clips_skipped": self._clips_skipped,
+                "audio_seconds": round(self._audio_seconds, 3),
+                "speech_seconds": round(self._speech_seconds, 3),
+                "skipped_seconds": round(self._audio_seconds - self._speech_seconds, 3),
+                "windows": self._windows,
+                "windows_skipped": self._windows_skipped,
+            }